@@ -596,7 +596,8 @@ def load_results_data():
         
         # Display data table
         summary += "📋 **Chi tiết dữ liệu:**\n\n"
-        summary += df.to_string(index=False, max_rows=50)
+        with pd.option_context("display.max_colwidth", None):
+            summary += df.to_string(index=False, max_rows=50)
         
         return summary
         
@@ -648,7 +649,9 @@ def chat_with_ai(message: str, history: list):
             if csv_path.exists():
                 df = pd.read_csv(csv_path, encoding="utf-8-sig")
                 if not df.empty:
-                    context = f"Dữ liệu CV hiện có ({len(df)} bản CV):\n{df.head(10).to_string()}\n\n"
+                    with pd.option_context("display.max_colwidth", None):
+                        table = df.head(10).to_string()
+                    context = f"Dữ liệu CV hiện có ({len(df)} bản CV):\n{table}\n\n"
         except Exception:
             context = ""
         
@@ -4,7 +4,10 @@ import sys
 from pathlib import Path
 import logging
 import traceback
-import time
+import importlib.util
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from typing import Optional, Dict, Any
 
 # Đưa thư mục gốc (chứa `modules/`) vào sys.path để import modules
@@ -31,11 +34,13 @@ if __package__ is None:
     __package__ = "main_engine"
 
 import streamlit as st
-from .utils import handle_error, safe_session_state_get, safe_session_state_set
+from .utils import handle_error, safe_session_state_get, safe_session_state_set, logo_path_str, css_text, keyhash
 from .chat import render_enhanced_chat_tab
 from .sidebar import render_sidebar, render_email_config
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from datetime import datetime
 from dotenv import set_key, load_dotenv
@@ -51,6 +56,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Session HTTP dùng chung để các lần dò API tái sử dụng kết nối TLS (keep-alive)
+_http_session = requests.Session()
+_http_session.mount(
+    "https://",
+    HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=0)),
+)
+
 # Import cấu hình và modules with error handling
 try:
     from modules.config import (
@@ -91,24 +103,30 @@ except ImportError as e:
 
 
 # --- Configuration validation ---
+@st.cache_data(ttl=30, show_spinner=False)  # Bố cục file và modules hầu như không đổi giữa các lần rerun
 def validate_configuration() -> Dict[str, bool]:
     """Validate application configuration"""
-    config_status = {
+    return {
         "env_file": (ROOT / ".env").exists(),
         "config_module": True,
         "static_files": (ROOT / "static").exists(),
         "modules": True,
+        # Check if required modules are importable (không chạy code của module)
+        "qa_module": _module_available("modules.qa_chatbot"),
     }
 
-    # Check if required modules are importable
+
+def _module_available(name: str) -> bool:
+    """Check whether a module can be imported without executing it."""
     try:
-        import modules.qa_chatbot  # noqa: F401
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # ValueError: module đã có trong sys.modules nhưng không có __spec__
+        return name in sys.modules
 
-        config_status["qa_module"] = True
-    except ImportError:
-        config_status["qa_module"] = False
 
-    return config_status
+# Số log tối đa giữ trong session_state
+LOG_BUFFER_SIZE = 500
 
 
 # --- Initialize session state with defaults ---
@@ -127,7 +145,7 @@ def initialize_session_state():
         "app_initialized": False,
         "last_error": None,
         "error_count": 0,
-        "logs": [],
+        "logs": deque(maxlen=LOG_BUFFER_SIZE),
     }
 
     for key, value in defaults.items():
@@ -136,6 +154,7 @@ def initialize_session_state():
 
 
 # --- Enhanced Streamlit logging handler ---
+
 class StreamlitLogHandler(logging.Handler):
     def emit(self, record: logging.LogRecord) -> None:
         try:
@@ -145,12 +164,13 @@ class StreamlitLogHandler(logging.Handler):
                 return
 
             msg = self.format(record)
-            logs = safe_session_state_get("logs", [])
-
-            # Limit log size to prevent memory issues
-            if len(logs) > 500:
-                logs = logs[-400:]  # Keep last 400 entries
+            logs = safe_session_state_get("logs")
+            if not isinstance(logs, deque):
+                # deque giới hạn kích thước: append O(1), tự bỏ log cũ nhất
+                logs = deque(logs or (), maxlen=LOG_BUFFER_SIZE)
+                safe_session_state_set("logs", logs)
 
+            # Cập nhật tại chỗ, không cần ghi lại session_state
             logs.append(
                 {
                     "timestamp": datetime.now().strftime("%H:%M:%S"),
@@ -159,12 +179,11 @@ class StreamlitLogHandler(logging.Handler):
                     "module": record.module,
                 }
             )
-            safe_session_state_set("logs", logs)
 
             # Cập nhật overlay log realtime nếu có
             overlay_updater = safe_session_state_get("log_overlay_updater")
             if callable(overlay_updater):
-                recent_logs = logs[-10:]
+                recent_logs = list(islice(reversed(logs), 10))[::-1]
                 log_text = "\n".join(
                     f"[{e.get('timestamp','')}] {e.get('level','')}: {e.get('message','')}" for e in recent_logs
                 )
@@ -215,7 +234,7 @@ def update_log_display(container):
         return
 
     # Display recent logs with color coding
-    recent_logs = logs[-50:]  # Show last 50 logs
+    recent_logs = list(islice(reversed(logs), 50))[::-1]  # Show last 50 logs
     log_text = ""
 
     for log_entry in recent_logs:
@@ -237,7 +256,7 @@ def configure_streamlit_page():
     try:
         st.set_page_config(
             page_title="Hoàn Cầu AI CV Processor",
-            page_icon=str(ROOT / "static" / "logo.png"),
+            page_icon=logo_path_str(),
             layout="wide",
             initial_sidebar_state="expanded",
         )
@@ -249,6 +268,14 @@ def configure_streamlit_page():
 
 
 # --- Enhanced platform detection ---
+# Prefix (đã viết thường) của API key theo từng platform
+_PLATFORM_PREFIXES = {
+    "openrouter": ("sk-or-", "or-"),
+    "google": ("aiza",),
+    "vectorshift": ("vs-", "vectorshift"),
+}
+
+
 @handle_error
 def detect_platform(api_key: str) -> Optional[str]:
     """Enhanced platform detection with better error handling"""
@@ -257,18 +284,41 @@ def detect_platform(api_key: str) -> Optional[str]:
 
     api_key = api_key.strip()
 
-    # Pattern-based detection
-    patterns = {
-        "openrouter": ["sk-or-", "or-"],
-        "google": ["AIza"],
-        "vectorshift": ["vs-", "vectorshift"],
-    }
-
-    for platform, prefixes in patterns.items():
-        if any(api_key.lower().startswith(prefix.lower()) for prefix in prefixes):
+    # Pattern-based detection: chuyển key về chữ thường một lần,
+    # startswith(tuple) so khớp mọi prefix trong một lệnh gọi
+    key_lower = api_key.lower()
+    for platform, prefixes in _PLATFORM_PREFIXES.items():
+        if key_lower.startswith(prefixes):
             logger.info(f"Detected platform: {platform}")
             return platform
 
+    # Prefix không khớp: dò qua API (kết quả được cache theo key)
+    try:
+        platform = _probe_platform(api_key)
+    except _ProbeUnavailable as e:
+        logger.debug(f"Platform probe unavailable: {e}")
+        platform = None
+    if platform is None:
+        logger.warning(f"Could not detect platform for API key: {api_key[:10]}...")
+    return platform
+
+
+class _ProbeUnavailable(Exception):
+    """Probe failed for a transient reason (timeout, network error, 429/5xx)."""
+
+
+@st.cache_data(
+    ttl=600,
+    max_entries=64,
+    show_spinner=False,
+    hash_funcs={str: keyhash},
+)
+def _probe_platform(api_key: str) -> Optional[str]:
+    """
+    Probe provider endpoints to find which one accepts the key (cached for 10 minutes).
+    Raises ``_ProbeUnavailable`` on transient failures so that st.cache_data
+    does not keep a ``None`` result after a single network hiccup.
+    """
     # API-based detection with timeout and retry
     endpoints = [
         (
@@ -283,66 +333,73 @@ def detect_platform(api_key: str) -> Optional[str]:
         ),
     ]
 
-    for platform, url, headers in endpoints:
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
+    # Gửi song song các lần dò: thời gian chờ là max(t1, t2) thay vì t1 + t2
+    executor = ThreadPoolExecutor(max_workers=len(endpoints))
+    futures = [executor.submit(_probe, *endpoint) for endpoint in endpoints]
+    transient = False  # có endpoint chưa trả lời dứt khoát (lỗi mạng, 429, 5xx)
+    try:
+        for future in as_completed(futures, timeout=6):
+            platform, status_code = future.result()
+            if status_code == 200:
                 logger.info(f"API verification successful for platform: {platform}")
                 return platform
-        except requests.RequestException as e:
-            logger.debug(f"API check failed for {platform}: {e}")
-            continue
-
-    logger.warning(f"Could not detect platform for API key: {api_key[:10]}...")
+            if status_code is None or status_code == 429 or status_code >= 500:
+                transient = True
+    except FuturesTimeout:
+        logger.debug("Platform probes timed out")
+        transient = True
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    if transient:
+        # Ném lỗi thay vì trả None: st.cache_data không cache ngoại lệ
+        raise _ProbeUnavailable("platform probes did not get a definitive answer")
     return None
 
 
+def _probe(platform: str, url: str, headers: Dict[str, str]) -> tuple:
+    """Call one provider endpoint and return ``(platform, status_code)``."""
+    try:
+        response = _http_session.get(url, headers=headers, timeout=5)
+        return platform, response.status_code
+    except requests.RequestException as e:
+        logger.debug(f"API check failed for {platform}: {e}")
+        return platform, None
+
+
 # --- Enhanced CSS loading ---
 @handle_error
 def load_css():
     """Load CSS with enhanced error handling"""
-    css_path = ROOT / "static" / "style.css"
-
-    if css_path.exists():
-        try:
-            css_content = css_path.read_text(encoding="utf-8")
-            st.markdown(f"<style>{css_content}</style>", unsafe_allow_html=True)
-            logger.info("Custom CSS loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load CSS: {e}")
-            st.warning(f"Không thể tải CSS: {e}")
+    css_content = css_text()  # Đọc file một lần, các lần rerun dùng cache
+    if css_content:
+        st.markdown(f"<style>{css_content}</style>", unsafe_allow_html=True)
     else:
-        logger.info(f"CSS file not found at: {css_path}")
+        logger.info("CSS file not found in static directory")
 
 
 # --- Enhanced model management ---
-@handle_error
-def get_available_models(provider: str, api_key: str) -> list:
-    """Get available models with caching and error handling"""
-    cache_key = f"models_{provider}_{hash(api_key) if api_key else 'none'}"
-    cached_models = safe_session_state_get(cache_key, None)
+# Model mặc định khi không lấy được danh sách từ API
+_FALLBACK_MODELS = (LLM_CONFIG.get("model", "gemini-2.5-flash-lite-preview-06-17"),)
 
-    # Use cached models if available and recent
-    if cached_models and isinstance(cached_models, dict):
-        cache_time = cached_models.get("timestamp", 0)
-        if time.time() - cache_time < 300:  # 5 minutes cache
-            return cached_models.get("models", [])
 
+@st.cache_data(
+    ttl=300,  # 5 minutes cache
+    max_entries=32,
+    show_spinner=False,
+    hash_funcs={str: keyhash},
+)
+def get_available_models(provider: str, api_key: str) -> list:
+    """Get available models, cached process-wide for 5 minutes per (provider, key)."""
     try:
-        models = get_models_for_provider(provider, api_key)
-        if models:
-            # Cache the results
-            safe_session_state_set(
-                cache_key, {"models": models, "timestamp": time.time()}
-            )
-            logger.info(f"Retrieved {len(models)} models for {provider}")
-            return models
+        models = get_models_for_provider(provider, api_key, session=_http_session)
     except Exception as e:
         logger.error(f"Failed to get models for {provider}: {e}")
-
+        models = None
     # Fallback to default model
-    default_model = LLM_CONFIG.get("model", "gemini-2.5-flash-lite-preview-06-17")
-    return [default_model]
+    return models or list(_FALLBACK_MODELS)
 
 
 initialize_session_state()
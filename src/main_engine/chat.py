@@ -4,7 +4,6 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
-import pandas as pd
 import streamlit as st
 
 from modules.config import OUTPUT_CSV
@@ -13,7 +12,7 @@ try:
     from modules.qa_chatbot import QAChatbot
 except Exception:  # pragma: no cover - optional dependency may be missing
     QAChatbot = None
-from .utils import handle_error, safe_session_state_get
+from .utils import handle_error, safe_session_state_get, csv_stat, read_csv_cached, csv_text_cached
 
 logger = logging.getLogger(__name__)
 
@@ -23,17 +22,20 @@ def load_dataset_for_chat():
     """Load CV dataset for chat context."""
     try:
         csv_path = Path(OUTPUT_CSV)
-        if not csv_path.exists():
+        stat = csv_stat(csv_path)
+        if stat is None:
             return None
-        df = pd.read_csv(csv_path, encoding="utf-8-sig")
+        cache_key = (str(csv_path), stat.st_mtime, stat.st_size)
+        df = read_csv_cached(*cache_key)
         if df.empty:
             return None
-        modified_time = datetime.fromtimestamp(csv_path.stat().st_mtime)
+        modified_time = datetime.fromtimestamp(stat.st_mtime)
         return {
             "count": len(df),
             "file": csv_path.name,
             "modified": modified_time.strftime("%Y-%m-%d %H:%M:%S"),
             "data": df,
+            "csv_text": csv_text_cached(*cache_key),
         }
     except Exception as e:
         logger.error("Error loading dataset for chat: %s", e)
@@ -65,56 +67,102 @@ def render_chat_statistics():
                 st.metric("Bắt đầu lúc", first_message[:19] if first_message != "N/A" else "N/A")
 
 
-@handle_error
-def render_chat_history():
-    """Render chat conversation history."""
-    history = st.session_state.get("conversation_history", [])
-    if not history:
-        st.info("💬 Bắt đầu cuộc trò chuyện bằng cách gửi tin nhắn bên dưới!")
-        return
-    for message in history:
-        role = message.get("role", "user")
-        content = message.get("content", "")
-        timestamp = message.get("timestamp", "")
-        if role == "user":
-            st.markdown(
-                f"""
+# Template HTML dựng sẵn cho từng vai trò; chỉ màu, nội dung và thời gian thay đổi
+_USER_MESSAGE_TEMPLATE = """
                 <div style="display: flex; justify-content: flex-end; margin: 10px 0;">
                     <div class="chat-message" style="
-                        background: linear-gradient(135deg, {st.session_state.get('accent_color', '#d4af37')} 0%, {st.session_state.get('secondary_color', '#ffeacc')} 100%);
+                        background: {user_bg};
                         color: white;
                         margin-left: 20%;
                     ">
                         <strong>👤 Bạn:</strong><br>
                         {content}
                         <div style="font-size: 0.8em; opacity: 0.8; margin-top:5px;">
-                            {timestamp[:19] if timestamp else ''}
+                            {timestamp}
                         </div>
                     </div>
                 </div>
-                """,
-                unsafe_allow_html=True,
-            )
-        else:
-            st.markdown(
-                f"""
+                """
+_AI_MESSAGE_TEMPLATE = """
                 <div style="display: flex; justify-content: flex-start; margin:10px 0;">
                     <div class="chat-message" style="
-                        background: linear-gradient(135deg, {st.session_state.get('background_color', '#fff7e6')} 0%, {st.session_state.get('secondary_color', '#ffeacc')}44 100%);
-                        color: {st.session_state.get('text_color', '#222222')};
-                        border: 2px solid {st.session_state.get('secondary_color', '#ffeacc')};
+                        background: {ai_bg};
+                        color: {text};
+                        border: 2px solid {secondary};
                         margin-right: 20%;
                     ">
                         <strong>🤖 AI:</strong><br>
                         {content}
                         <div style="font-size: 0.8em; opacity: 0.7; margin-top:5px;">
-                            {timestamp[:19] if timestamp else ''}
+                            {timestamp}
                         </div>
                     </div>
                 </div>
-                """,
-                unsafe_allow_html=True,
-            )
+                """
+
+
+def _chat_theme() -> dict:
+    """Read theme colors once and prebuild the gradient strings for chat bubbles."""
+    ss = st.session_state
+    accent = ss.get("accent_color", "#d4af37")
+    secondary = ss.get("secondary_color", "#ffeacc")
+    background = ss.get("background_color", "#fff7e6")
+    text = ss.get("text_color", "#222222")
+    return {
+        "user_bg": f"linear-gradient(135deg, {accent} 0%, {secondary} 100%)",
+        "ai_bg": f"linear-gradient(135deg, {background} 0%, {secondary}44 100%)",
+        "text": text,
+        "secondary": secondary,
+    }
+
+
+def _render_message_html(message: dict, theme: dict) -> str:
+    """Build the HTML block for a single chat message."""
+    timestamp = message.get("timestamp", "")
+    template = _USER_MESSAGE_TEMPLATE if message.get("role", "user") == "user" else _AI_MESSAGE_TEMPLATE
+    return template.format(
+        content=message.get("content", ""),
+        timestamp=timestamp[:19] if timestamp else "",
+        **theme,
+    )
+
+
+def reset_chat_render_cache() -> None:
+    """Drop the cached chat HTML so the next render rebuilds it from scratch."""
+    st.session_state["chat_html_buf"] = []
+    st.session_state["last_rendered_idx"] = 0
+
+
+@handle_error
+def render_chat_history():
+    """Render chat conversation history.
+
+    HTML for each message is built once and kept in ``chat_html_buf``; on a
+    rerun only messages added since ``last_rendered_idx`` are formatted and the
+    whole buffer is emitted with a single ``st.markdown`` call.
+    """
+    history = st.session_state.get("conversation_history", [])
+    if not history:
+        reset_chat_render_cache()
+        st.info("💬 Bắt đầu cuộc trò chuyện bằng cách gửi tin nhắn bên dưới!")
+        return
+    theme = _chat_theme()
+    buf = st.session_state.setdefault("chat_html_buf", [])
+    last_rendered = st.session_state.setdefault("last_rendered_idx", 0)
+    if (
+        last_rendered > len(history)
+        or len(buf) != last_rendered
+        or st.session_state.get("chat_html_theme") != theme
+    ):
+        # Lịch sử hoặc màu giao diện bị thay đổi: dựng lại toàn bộ
+        reset_chat_render_cache()
+        st.session_state["chat_html_theme"] = theme
+        buf = st.session_state["chat_html_buf"]
+        last_rendered = 0
+    for message in history[last_rendered:]:
+        buf.append(_render_message_html(message, theme))
+    st.session_state["last_rendered_idx"] = len(history)
+    st.markdown("".join(buf), unsafe_allow_html=True)
 
 
 @handle_error
@@ -168,7 +216,9 @@ def process_chat_message(user_input: str):
             conversation_context.append({"role": msg["role"], "content": msg["content"]})
         context = {"history": conversation_context} if conversation_context else None
         progress_bar.update(1, "Đang gửi câu hỏi...")
-        response = chatbot.ask_question(user_input, df, context=context)
+        response = chatbot.ask_question(
+            user_input, df, context=context, data_csv=dataset_info.get("csv_text")
+        )
         if response:
             st.session_state.setdefault("conversation_history", []).append({
                 "role": "assistant",
@@ -277,6 +327,7 @@ def render_enhanced_chat_tab():
     with col2:
         if st.button("🗑️ Xóa lịch sử", help="Xóa toàn bộ lịch sử chat"):
             st.session_state["conversation_history"] = []
+            reset_chat_render_cache()
             st.success("Đã xóa lịch sử chat!")
             st.rerun()
     with col3:
@@ -294,6 +345,7 @@ __all__ = [
     "load_dataset_for_chat",
     "render_chat_statistics",
     "render_chat_history",
+    "reset_chat_render_cache",
     "render_chat_input_form",
     "process_chat_message",
     "export_chat_history",
@@ -13,8 +13,8 @@ for path in (ROOT, SRC_DIR):
         sys.path.insert(0, path)
 
 import click                               # CLI framework
-from modules.config import LLM_CONFIG, get_model_price       # cấu hình LLM
-from modules.model_fetcher import ModelFetcher  # fetch list models
+# modules.config / modules.model_fetcher được import bên trong từng lệnh
+# để `--help` không phải tải SDK và gọi API lấy models khi khởi động
 
 @click.group()
 def cli():
@@ -24,20 +24,26 @@ def cli():
 @cli.command()
 def info():
     """Hiển thị cấu hình LLM hiện tại."""
+    from modules.config import LLM_CONFIG, LLM_PROVIDER_UPPER, get_llm_config, get_model_price  # cấu hình LLM
     click.echo("="*60)
-    click.echo(f"Provider:      {LLM_CONFIG['provider'].upper()}")
+    click.echo(f"Provider:      {LLM_PROVIDER_UPPER}")
     price = get_model_price(LLM_CONFIG['model'])
     model_label = f"{LLM_CONFIG['model']} ({price})" if price != 'unknown' else LLM_CONFIG['model']
     click.echo(f"Model:         {model_label}")
     key_status = "OK" if LLM_CONFIG.get("api_key") else "Không"
     click.echo(f"API Key set:   {key_status}")
-    count = len(LLM_CONFIG.get("available_models", []))
+    config = get_llm_config()
+    count = len(config.get("available_models", []))
     click.echo(f"Models avail.: {count}")
+    for provider, models in config.get("models_by_provider", {}).items():
+        click.echo(f"  - {provider}: {len(models)}")
     click.echo("="*60)
 
 @cli.command('list-models')
 def list_models():
     """Liệt kê chi tiết các models khả dụng."""
+    from modules.config import LLM_CONFIG, get_model_price  # cấu hình LLM
+    from modules.model_fetcher import ModelFetcher  # fetch list models
     provider = LLM_CONFIG["provider"]
     api_key = LLM_CONFIG.get("api_key")
     if provider == "google":
@@ -21,7 +21,7 @@ for path in (ROOT, SRC_DIR):
 import gradio as gr
 import pandas as pd
 import requests
-from dotenv import set_key, load_dotenv
+from dotenv import set_key
 
 # Import cấu hình và modules
 from modules.config import (
@@ -32,6 +32,7 @@ from modules.config import (
     OUTPUT_EXCEL,
     GOOGLE_API_KEY,
     OPENROUTER_API_KEY,
+    PROVIDER_KEY_ENV_VARS,
     EMAIL_HOST,
     EMAIL_PORT,
     EMAIL_USER,
@@ -166,7 +167,8 @@ def update_provider_and_models(provider: str, api_key: str):
             app_state.provider = detected_provider
             provider = detected_provider
         
-        save_env_config(f"{provider.upper()}_API_KEY", api_key)
+        env_var = PROVIDER_KEY_ENV_VARS.get(provider) or f"{provider.upper()}_API_KEY"
+        save_env_config(env_var, api_key)
     
     # Get available models
     app_state.available_models = get_available_models(provider, api_key)
@@ -258,12 +260,15 @@ def fetch_and_process_cvs(from_date: str, to_date: str, unseen_only: bool, progr
                 progress_value = 0.2 + (current / total) * 0.8
                 progress(progress_value, desc=f"{message} ({current}/{total})")
         
-        results = processor.fetch_and_process(
-            since=since,
-            before=before,
-            unseen_only=unseen_only,
-            progress_callback=progress_callback
-        )
+        try:
+            results = processor.fetch_and_process(
+                since=since,
+                before=before,
+                unseen_only=unseen_only,
+                progress_callback=progress_callback
+            )
+        finally:
+            fetcher.close()  # trả kết nối IMAP về pool
         
         progress(1.0, desc="✅ Hoàn thành!")
         
@@ -328,8 +333,9 @@ def load_results_data():
         if df.empty:
             return "File kết quả trống."
         
-        # Format for display
-        return df.to_string(index=False, max_rows=50)
+        # Format for display (hiển thị đầy đủ nội dung các cột)
+        with pd.option_context("display.max_colwidth", None):
+            return df.to_string(index=False, max_rows=50)
         
     except Exception as e:
         logger.error(f"Error loading results: {e}")
@@ -351,7 +357,9 @@ def chat_with_ai(message: str, history: list):
             if csv_path.exists():
                 df = pd.read_csv(csv_path, encoding="utf-8-sig")
                 if not df.empty:
-                    context = f"Dữ liệu CV hiện có ({len(df)} bản CV):\n{df.to_string(max_rows=10)}\n\n"
+                    with pd.option_context("display.max_colwidth", None):
+                        table = df.to_string(max_rows=10)
+                    context = f"Dữ liệu CV hiện có ({len(df)} bản CV):\n{table}\n\n"
         except Exception:
             context = ""
         
@@ -691,8 +699,7 @@ def main():
     """Main application entry point"""
     logger.info("Starting Gradio CV Processor App")
     
-    # Load environment variables
-    load_dotenv(ROOT / ".env")
+    # .env đã được modules.config nạp một lần khi import; không đọc lại ở đây
     
     # Initialize app state with environment values
     app_state.api_key = GOOGLE_API_KEY or OPENROUTER_API_KEY or ""
@@ -2,6 +2,7 @@
 
 # --- Thư viện chuẩn ---
 import logging  # quản lý log
+from functools import lru_cache  # ghi nhớ nhãn model
 from pathlib import Path  # thao tác đường dẫn tệp
 
 # --- Thư viện bên thứ ba ---
@@ -21,19 +22,31 @@ from modules.config import (
     EMAIL_UNSEEN_ONLY,
 )
 from modules.progress_manager import StreamlitProgressBar
-from .utils import handle_error, safe_session_state_get, safe_session_state_set
+from .utils import handle_error, safe_session_state_get, safe_session_state_set, logo_path_str, keyhash
 
 # Logger cho file này
 logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1024)
+def format_model_option(model: str) -> str:
+    """Hiển thị giá model (nếu có) bên cạnh tên"""
+    try:
+        price = get_model_price(model)
+        return f"{model} ({price})" if price != "unknown" else model
+    except Exception:
+        return model
+
+
 @handle_error
 def render_sidebar(validate_configuration, detect_platform, get_available_models):
     """Render the sidebar with provider and model selection."""
     # Đường dẫn tới logo trong thư mục static
-    logo_path = Path(__file__).resolve().parents[2] / "static" / "logo.png"
-    if logo_path.exists():
+    logo_path = logo_path_str()  # Đã cache, không stat lại file mỗi lần rerun
+    if logo_path:
         try:
             # Hiển thị logo ở sidebar
-            st.sidebar.image(str(logo_path), use_container_width=True, caption="Hoàn Cầu AI CV Processor")
+            st.sidebar.image(logo_path, use_container_width=True, caption="Hoàn Cầu AI CV Processor")
         except Exception as e:
             # Nếu lỗi, ghi log và chỉ hiển thị text thay thế
             logger.warning("Failed to load logo: %s", e)
@@ -81,6 +94,9 @@ def render_sidebar(validate_configuration, detect_platform, get_available_models
         elif detected_platform == provider:
             st.sidebar.success(f"✅ API key hợp lệ cho {provider}")
 
+    # Danh sách models trong session_state gắn với (provider, hash của API key)
+    models_for = (provider, keyhash(api_key))
+
     # Hai cột: nút lấy models và xóa cache
     col1, col2 = st.sidebar.columns([2, 1])
     with col1:
@@ -95,51 +111,50 @@ def render_sidebar(validate_configuration, detect_platform, get_available_models
                 models = get_available_models(provider, api_key)
                 if models:
                     safe_session_state_set("available_models", models)
+                    safe_session_state_set("available_models_for", models_for)
                     progress_bar.finish(f"✅ Đã lấy {len(models)} models")
                 else:
                     progress_bar.finish("❌ Không thể lấy models")
     with col2:
         # Nút xóa cache models
         if st.button("🗑️", help="Xóa cache models"):
-            cache_key = f"models_{provider}_{hash(api_key) if api_key else 'none'}"
-            if cache_key in st.session_state:
-                del st.session_state[cache_key]
+            # get_available_models được cache bằng st.cache_data -> xóa trực tiếp
+            clear_cache = getattr(get_available_models, "clear", None)
+            if callable(clear_cache):
+                clear_cache()
+            st.session_state.pop("available_models", None)
             st.sidebar.info("Cache đã được xóa")
 
-    # Lấy danh sách models từ cache hoặc API
-    models = safe_session_state_get("available_models", get_available_models(provider, api_key))
+    # Lấy danh sách models từ session_state; chỉ gọi get_available_models khi
+    # chưa có hoặc provider/API key đã đổi (không tính default một cách eager)
+    models = safe_session_state_get("available_models")
+    if not models or safe_session_state_get("available_models_for") != models_for:
+        models = get_available_models(provider, api_key)
+        safe_session_state_set("available_models", models)
+        safe_session_state_set("available_models_for", models_for)
     if not models:
         st.sidebar.error("❌ Không lấy được models, vui lòng kiểm tra API Key.")
         models = [LLM_CONFIG.get("model", "gemini-2.5-flash-lite-preview-06-17")]
 
     # Đặt model mặc định nếu model hiện tại không nằm trong danh sách
     default_model = LLM_CONFIG.get("model", "gemini-2.5-flash-lite-preview-06-17")
-    if default_model not in models and models:
+    model_set = frozenset(models)  # kiểm tra thành viên O(1) thay vì quét list
+    if default_model not in model_set and models:
         default_model = models[0]
-    if not safe_session_state_get("selected_model") or safe_session_state_get("selected_model") not in models:
+    if not safe_session_state_get("selected_model") or safe_session_state_get("selected_model") not in model_set:
         safe_session_state_set("selected_model", default_model)
 
-    def format_model_option(model: str) -> str:
-        """Hiển thị giá model (nếu có) bên cạnh tên"""
-        try:
-            price = get_model_price(model)
-            return f"{model} ({price})" if price != "unknown" else model
-        except Exception:
-            return model
-
+    # Tính nhãn một lần cho mỗi lần render thay vì gọi lại cho từng option
+    labels = {m: format_model_option(m) for m in models}
     model = st.sidebar.selectbox(
         "🤖 Model",
         options=models,
         key="selected_model",
         help="Chọn mô hình LLM",
-        format_func=format_model_option,
+        format_func=labels.get,
     )
 
-    try:
-        price = get_model_price(model)
-        label = f"{model} ({price})" if price != "unknown" else model
-    except Exception:
-        label = model
+    label = labels.get(model) or format_model_option(model)
     st.sidebar.markdown(f"**🎯 Đang dùng:** `{provider}` / `{label}`")
     return provider, api_key, model
 
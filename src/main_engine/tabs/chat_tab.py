@@ -2,14 +2,13 @@
 
 # Import các thư viện cần thiết
 import logging  # Thư viện ghi log để theo dõi hoạt động của ứng dụng
-import os  # Thư viện để thao tác với hệ điều hành và file system
-import pandas as pd  # Thư viện xử lý dữ liệu dạng bảng (DataFrame)
 import streamlit as st  # Framework tạo ứng dụng web
 from typing import cast  # Hàm cast để ép kiểu dữ liệu
 from modules.progress_manager import StreamlitProgressBar  # Module quản lý thanh tiến trình
 
 from modules.qa_chatbot import QAChatbot  # Module chatbot hỏi đáp
 from modules.config import OUTPUT_CSV  # Import đường dẫn file CSV output
+from ..utils import csv_stat, read_csv_cached, csv_text_cached  # Đọc CSV có cache theo mtime/size
 
 
 def render(provider: str, model: str, api_key: str) -> None:
@@ -32,16 +31,18 @@ def render(provider: str, model: str, api_key: str) -> None:
     # Kiểm tra nếu có trigger để xử lý câu hỏi AI
     if st.session_state.trigger_ai:
         st.session_state.trigger_ai = False  # Reset flag sau khi xử lý
+        stat = csv_stat(OUTPUT_CSV)  # None nếu chưa có file CSV
         
         # Kiểm tra nếu câu hỏi trống
         if not question.strip():
             st.warning("Vui lòng nhập câu hỏi trước khi gửi.")  # Hiển thị cảnh báo
         # Kiểm tra nếu file CSV không tồn tại
-        elif not os.path.exists(OUTPUT_CSV):
+        elif stat is None:
             st.warning("Chưa có dữ liệu CSV để hỏi.")  # Hiển thị cảnh báo
         else:
-            # Đọc dữ liệu từ file CSV với encoding UTF-8
-            df = pd.read_csv(OUTPUT_CSV, encoding="utf-8-sig")
+            # Đọc dữ liệu từ file CSV (cache theo mtime/size, chỉ đọc lại khi file đổi)
+            cache_key = (str(OUTPUT_CSV), stat.st_mtime, stat.st_size)
+            df = read_csv_cached(*cache_key)
             
             # Khởi tạo chatbot với các tham số được truyền vào
             chatbot = QAChatbot(
@@ -60,7 +61,9 @@ def render(provider: str, model: str, api_key: str) -> None:
                 progress_bar.update(1, "Đang chờ phản hồi...")  # Cập nhật bước 1
                 
                 # Gửi câu hỏi tới chatbot và nhận câu trả lời
-                answer = chatbot.ask_question(question, df)
+                answer = chatbot.ask_question(
+                    question, df, data_csv=csv_text_cached(*cache_key)
+                )
                 progress_bar.finish("✅ Đã nhận câu trả lời")  # Hoàn thành thanh tiến trình
                 
                 # Hiển thị câu trả lời (cho phép HTML)
@@ -6,6 +6,7 @@ from typing import List  # Type hints cho danh sách
 from pathlib import Path  # Thư viện xử lý đường dẫn file/folder hiện đại
 from datetime import datetime, time, timezone, date  # Thư viện xử lý ngày tháng và thời gian
 import base64  # Thư viện mã hóa/giải mã base64 cho file download
+import hashlib  # Băm danh sách file để nhận biết bảng attachments không đổi
 
 # Import module quản lý thanh tiến trình
 from modules.progress_manager import StreamlitProgressBar
@@ -180,6 +181,10 @@ def render(
                     st.error(f"❌ Lỗi khi fetch email: {e}")  # Hiển thị lỗi
                     logging.error(f"Fetch error: {e}")  # Ghi log lỗi
 
+    # Trả kết nối IMAP về pool để lần rerun sau không phải đăng nhập lại
+    if fetcher:
+        fetcher.close()
+
     # Xử lý khi nhấn nút Process
     if process_button:
         logging.info("Bắt đầu process CV đã tải về")  # Ghi log bắt đầu xử lý
@@ -258,54 +263,68 @@ def render(
     # Nếu có file attachments
     if attachments:
         sent_map = load_sent_times()  # Load map thời gian gửi từ file
+        stats = {p: p.stat() for p in attachments}  # stat một lần cho mỗi file
 
-        # Hàm tạo key để sắp xếp file theo thời gian
-        def sort_key(p: Path) -> float:
-            ts = sent_map.get(p.name)  # Lấy timestamp từ map
-            if ts:
-                try:
-                    # Chuyển đổi ISO string thành timestamp
-                    return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
-                except Exception:
-                    pass
-            # Nếu không có thời gian gửi, dùng thời gian modify file
-            return p.stat().st_mtime
+        # Chữ ký của danh sách file + thời gian gửi: nếu không đổi thì dùng lại bảng HTML đã dựng
+        signature = hashlib.blake2b(
+            repr((
+                sorted((p.name, st_.st_mtime_ns, st_.st_size) for p, st_ in stats.items()),
+                sorted(sent_map.items()),
+            )).encode(),
+            digest_size=8,
+        ).digest()
+        cache = st.session_state.get("attachments_table_cache")
+        if cache and cache[0] == signature:
+            styled_html = cache[1]
+        else:
+            # Hàm tạo key để sắp xếp file theo thời gian
+            def sort_key(p: Path) -> float:
+                ts = sent_map.get(p.name)  # Lấy timestamp từ map
+                if ts:
+                    try:
+                        # Chuyển đổi ISO string thành timestamp
+                        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+                    except Exception:
+                        pass
+                # Nếu không có thời gian gửi, dùng thời gian modify file
+                return stats[p].st_mtime
 
-        # Sắp xếp file theo thời gian giảm dần (mới nhất trước)
-        attachments.sort(key=sort_key, reverse=True)
+            # Sắp xếp file theo thời gian giảm dần (mới nhất trước)
+            attachments.sort(key=sort_key, reverse=True)
 
-        # Hàm tạo link download cho file
-        def make_link(path: Path) -> str:
-            data = base64.b64encode(path.read_bytes()).decode()  # Mã hóa file thành base64
-            # Xác định MIME type theo extension
-            mime = (
-                "application/pdf"
-                if path.suffix.lower() == ".pdf"
-                else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            )
-            # Tạo link download HTML
-            return f'<a download="{path.name}" href="data:{mime};base64,{data}">{path.name}</a>'
+            # Hàm tạo link download cho file
+            def make_link(path: Path) -> str:
+                data = base64.b64encode(path.read_bytes()).decode()  # Mã hóa file thành base64
+                # Xác định MIME type theo extension
+                mime = (
+                    "application/pdf"
+                    if path.suffix.lower() == ".pdf"
+                    else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )
+                # Tạo link download HTML
+                return f'<a download="{path.name}" href="data:{mime};base64,{data}">{path.name}</a>'
 
-        # Tạo danh sách dữ liệu cho bảng
-        rows = []
-        for p in attachments:
-            sent = format_sent_time_display(sent_map.get(p.name, ""))  # Format thời gian gửi
-            size_kb = p.stat().st_size / 1024  # Tính kích thước file (KB)
-            rows.append({
-                "File": make_link(p),  # Link download
-                "Dung lượng": f"{size_kb:.1f} KB",  # Kích thước file
-                "Gửi lúc": sent,  # Thời gian gửi
-            })
+            # Tạo danh sách dữ liệu cho bảng
+            rows = []
+            for p in attachments:
+                sent = format_sent_time_display(sent_map.get(p.name, ""))  # Format thời gian gửi
+                size_kb = stats[p].st_size / 1024  # Tính kích thước file (KB)
+                rows.append({
+                    "File": make_link(p),  # Link download
+                    "Dung lượng": f"{size_kb:.1f} KB",  # Kích thước file
+                    "Gửi lúc": sent,  # Thời gian gửi
+                })
 
-        # Tạo DataFrame và chuyển thành HTML table
-        df = pd.DataFrame(rows, columns=["File", "Dung lượng", "Gửi lúc"])
-        table_html = df.to_html(escape=False, index=False)  # Không escape HTML để link hoạt động
-        # Tạo container có scroll cho bảng
-        styled_html = (
-            "<div class='attachments-table-container' style='max-height: 400px; overflow:auto;'>"
-            f"{table_html}"
-            "</div>"
-        )
+            # Tạo DataFrame và chuyển thành HTML table
+            df = pd.DataFrame(rows, columns=["File", "Dung lượng", "Gửi lúc"])
+            table_html = df.to_html(escape=False, index=False)  # Không escape HTML để link hoạt động
+            # Tạo container có scroll cho bảng
+            styled_html = (
+                "<div class='attachments-table-container' style='max-height: 400px; overflow:auto;'>"
+                f"{table_html}"
+                "</div>"
+            )
+            st.session_state["attachments_table_cache"] = (signature, styled_html)
         st.markdown(styled_html, unsafe_allow_html=True)  # Hiển thị bảng
     else:
         st.info("Chưa có CV nào được tải về.")  # Thông báo nếu chưa có file
@@ -322,12 +341,14 @@ def render(
         # Cột 1: Nút xác nhận xóa
         with col1:
             if st.button("Xác nhận xoá", key="confirm_delete_btn"):
-                attachments = list(ATTACHMENT_DIR.iterdir())  # Lấy danh sách tất cả file trong thư mục
-                count = sum(1 for f in attachments if f.is_file())  # Đếm số file
-                # Xóa từng file
-                for f in attachments:
+                # Chỉ xoá file CV (PDF/DOCX); giữ các file trạng thái/cache trong thư mục
+                count = 0
+                for f in ATTACHMENT_DIR.glob("*"):
+                    if not (f.is_file() and f.suffix.lower() in (".pdf", ".docx")):
+                        continue
                     try:
                         f.unlink()  # Xóa file
+                        count += 1
                     except Exception:
                         pass  # Bỏ qua nếu có lỗi
                 logging.info(f"Đã xóa {count} file trong attachments")  # Ghi log
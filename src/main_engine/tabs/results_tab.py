@@ -1,6 +1,8 @@
 """Tab xem và tải kết quả phân tích CV."""  # Mô tả chức năng của module
 
 # Import các thư viện cần thiết
+import io  # Buffer bytes trong bộ nhớ cho file tải xuống
+import codecs  # Writer mã hóa UTF-8 (kèm BOM) ghi thẳng vào buffer bytes
 import os  # Thư viện để thao tác với file system và kiểm tra file tồn tại
 
 import pandas as pd  # Thư viện xử lý dữ liệu dạng bảng (DataFrame)
@@ -8,16 +10,18 @@ import streamlit as st  # Framework tạo ứng dụng web
 
 # Import các đường dẫn file từ cấu hình
 from modules.config import ATTACHMENT_DIR, OUTPUT_CSV, OUTPUT_EXCEL
+from ..utils import csv_stat, read_csv_cached  # Stat + đọc CSV có cache
 
 
 def render() -> None:
     """Render UI for viewing and downloading results."""  # Hàm hiển thị giao diện xem và tải kết quả
     st.subheader("Xem và tải kết quả")  # Hiển thị tiêu đề phụ
     
-    # Kiểm tra xem file CSV kết quả có tồn tại hay không
-    if os.path.exists(OUTPUT_CSV):
+    # Kiểm tra xem file CSV kết quả có tồn tại hay không (một lần stat, dùng luôn làm cache key)
+    stat = csv_stat(OUTPUT_CSV)
+    if stat is not None:
         # Đọc dữ liệu từ file CSV với encoding UTF-8 và giữ nguyên giá trị rỗng
-        df = pd.read_csv(OUTPUT_CSV, encoding="utf-8-sig", keep_default_na=False)
+        df = read_csv_cached(str(OUTPUT_CSV), stat.st_mtime, stat.st_size, keep_default_na=False)
         df.fillna("", inplace=True)  # Thay thế các giá trị NaN bằng chuỗi rỗng để hiển thị
 
         # Hàm tạo link download an toàn cho các file CV
@@ -61,8 +65,11 @@ def render() -> None:
         )
         st.markdown(styled_html, unsafe_allow_html=True)  # Hiển thị bảng với HTML
         
-        # Tạo dữ liệu CSV để download
-        csv_bytes = df.to_csv(index=False, encoding="utf-8-sig").encode()
+        # Tạo dữ liệu CSV để download: ghi thẳng vào buffer bytes (UTF-8 BOM),
+        # tránh tạo chuỗi str trung gian rồi encode thêm một bản nữa
+        buf = io.BytesIO()
+        df.to_csv(codecs.getwriter("utf-8-sig")(buf), index=False)
+        csv_bytes = buf.getvalue()
         # Tạo nút download file CSV
         st.download_button(
             label="Tải xuống CSV",  # Nhãn nút
@@ -2,6 +2,7 @@
 
 # Import các thư viện cần thiết
 import logging  # Thư viện ghi log để theo dõi hoạt động của ứng dụng
+import shutil  # Sao chép luồng dữ liệu theo từng khối
 from pathlib import Path  # Thư viện xử lý đường dẫn file/folder hiện đại
 import streamlit as st  # Framework tạo ứng dụng web
 
@@ -12,6 +13,18 @@ from modules.dynamic_llm_client import DynamicLLMClient  # Client kết nối v
 from modules.progress_manager import StreamlitProgressBar  # Module quản lý thanh tiến trình
 
 
+@st.cache_resource(show_spinner=False)
+def _get_processor(provider: str, model: str, api_key: str) -> CVProcessor:
+    """Tạo CVProcessor một lần cho mỗi bộ (provider, model, api_key) và tái sử dụng giữa các lần upload."""
+    return CVProcessor(
+        llm_client=DynamicLLMClient(
+            provider=provider,  # Nhà cung cấp AI
+            model=model,  # Model AI sử dụng
+            api_key=api_key,  # API key để xác thực
+        )
+    )
+
+
 def render(provider: str, model: str, api_key: str, root: Path) -> None:
     """Render UI for processing a single CV file."""  # Hàm hiển thị giao diện xử lý file CV đơn lẻ
     st.subheader("Xử lý một CV đơn lẻ")  # Hiển thị tiêu đề phụ
@@ -32,33 +45,31 @@ def render(provider: str, model: str, api_key: str, root: Path) -> None:
     if uploaded:
         # Tạo file tạm thời trong thư mục root với prefix "tmp_"
         tmp_file = root / f"tmp_{uploaded.name}"
-        tmp_file.write_bytes(uploaded.getbuffer())  # Ghi nội dung file upload vào file tạm
-        
-        # Khởi tạo thanh tiến trình
-        progress_bar = StreamlitProgressBar()
-        progress_bar.initialize(2, f"Đang trích xuất & phân tích... (LLM: {provider}/{label})")  # Khởi tạo với 2 bước
-        
-        logging.info(f"Xử lý file đơn {uploaded.name}")  # Ghi log thông tin xử lý file
-        
-        # Khởi tạo CV processor với LLM client
-        proc = CVProcessor(
-            llm_client=DynamicLLMClient(
-                provider=provider,  # Nhà cung cấp AI
-                model=model,  # Model AI sử dụng
-                api_key=api_key,  # API key để xác thực
-            )
-        )
-        
-        # Bước 1: Trích xuất text từ file CV
-        text = proc.extract_text(str(tmp_file))
-        progress_bar.update(1, "Đang phân tích với LLM...")  # Cập nhật tiến trình bước 1
-        
-        # Bước 2: Phân tích thông tin CV bằng LLM
-        info = proc.extract_info_with_llm(text)
-        progress_bar.finish("✅ Hoàn tất")  # Hoàn thành thanh tiến trình
-        
-        # Hiển thị kết quả phân tích dưới dạng JSON
-        st.json(info)
+        uploaded.seek(0)  # Đọc lại từ đầu nếu file đã được đọc ở lần rerun trước
+        with open(tmp_file, "wb") as fh:
+            # Ghi theo từng khối 1MB thay vì tạo thêm một bản sao toàn bộ file trong bộ nhớ
+            shutil.copyfileobj(uploaded, fh, length=1 << 20)
         
-        # Xóa file tạm thời (missing_ok=True để không lỗi nếu file không tồn tại)
-        tmp_file.unlink(missing_ok=True)
+        try:
+            # Khởi tạo thanh tiến trình
+            progress_bar = StreamlitProgressBar()
+            progress_bar.initialize(2, f"Đang trích xuất & phân tích... (LLM: {provider}/{label})")  # Khởi tạo với 2 bước
+            
+            logging.info(f"Xử lý file đơn {uploaded.name}")  # Ghi log thông tin xử lý file
+            
+            # Lấy CV processor đã cache (giữ lại kết nối HTTP của LLM client)
+            proc = _get_processor(provider, model, api_key)
+            
+            # Bước 1: Trích xuất text từ file CV
+            text = proc.extract_text(str(tmp_file))
+            progress_bar.update(1, "Đang phân tích với LLM...")  # Cập nhật tiến trình bước 1
+            
+            # Bước 2: Phân tích thông tin CV bằng LLM
+            info = proc.extract_info_with_llm(text)
+            progress_bar.finish("✅ Hoàn tất")  # Hoàn thành thanh tiến trình
+            
+            # Hiển thị kết quả phân tích dưới dạng JSON
+            st.json(info)
+        finally:
+            # Luôn xóa file tạm kể cả khi xử lý lỗi (missing_ok=True để không lỗi nếu file không tồn tại)
+            tmp_file.unlink(missing_ok=True)
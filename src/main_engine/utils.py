@@ -1,11 +1,17 @@
 # Thư viện logging chuẩn của Python
 import logging
 
-# traceback để in stack trace khi gặp lỗi
-import traceback
+# functools.wraps giữ nguyên tên/docstring của hàm được bọc
+import functools
 
 # Kiểu dữ liệu cho typing
-from typing import Any
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+# pandas để đọc file CSV kết quả
+import pandas as pd
 
 # Streamlit dùng cho giao diện Web
 import streamlit as st
@@ -13,19 +19,36 @@ import streamlit as st
 # Tạo logger theo tên module
 logger = logging.getLogger(__name__)
 
+# Thư mục chứa logo và CSS của giao diện
+STATIC_DIR = Path(__file__).resolve().parents[2] / "static"
+
+
+def _has_script_run_ctx() -> bool:
+    """Return ``False`` only when we are sure no Streamlit script is running."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except Exception:
+        return True
+    try:
+        return get_script_run_ctx(suppress_warning=True) is not None
+    except TypeError:
+        return get_script_run_ctx() is not None
+
 
 def handle_error(func):
     """Decorator for error handling"""
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
             # Gọi hàm gốc
             return func(*args, **kwargs)
         except Exception as e:
-            # Log và hiển thị lỗi
-            logger.error(f"Error in {func.__name__}: {e}")
-            logger.error(traceback.format_exc())
-            st.error(f"Lỗi trong {func.__name__}: {e}")
+            # logger.exception ghi kèm traceback, chỉ định dạng khi handler cần
+            logger.exception("Error in %s: %s", func.__name__, e)
+            # Chỉ hiển thị lỗi lên UI khi đang ở trong luồng script Streamlit
+            if _has_script_run_ctx():
+                st.error(f"Lỗi trong {func.__name__}: {e}")
             return None
 
     return wrapper
@@ -53,9 +76,65 @@ def safe_session_state_set(key: str, value: Any) -> bool:
         logger.warning(f"Error setting session state key '{key}': {e}")
         return False
 
+
+def keyhash(value: str) -> str:
+    """Return a short, process-independent digest of a secret for use as a cache key.
+
+    Unlike the built-in ``hash`` (randomized per process by ``PYTHONHASHSEED``)
+    the digest is stable, so invalidation hits the entry that was written.
+    """
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest() if value else "none"
+
+
+def csv_stat(path: "os.PathLike[str] | str") -> Optional[os.stat_result]:
+    """Return ``os.stat`` of the file or ``None`` if it does not exist.
+
+    One syscall replaces the ``exists()`` + ``stat()`` pair and the result
+    also provides the cache key for :func:`read_csv_cached`.
+    """
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_data(show_spinner=False)
+def read_csv_cached(path: str, mtime: float, size: int, keep_default_na: bool = True) -> pd.DataFrame:
+    """Read a results CSV once per (path, mtime, size) combination."""
+    # mtime và size chỉ dùng làm cache key: file đổi thì đọc lại
+    return pd.read_csv(path, encoding="utf-8-sig", keep_default_na=keep_default_na)
+
+
+@st.cache_data(show_spinner=False)
+def csv_text_cached(path: str, mtime: float, size: int) -> str:
+    """Return the dataset serialized as CSV text, computed once per file version."""
+    return read_csv_cached(path, mtime, size).to_csv(index=False)
+
+
+
+@st.cache_resource(show_spinner=False)
+def logo_path_str() -> Optional[str]:
+    """Return the logo path as a string, or ``None`` when it is missing (checked once)."""
+    logo_path = STATIC_DIR / "logo.png"
+    return str(logo_path) if logo_path.exists() else None
+
+
+@st.cache_data(show_spinner=False)
+def css_text() -> str:
+    """Return the custom stylesheet contents, read from disk only once."""
+    css_path = STATIC_DIR / "style.css"
+    return css_path.read_text(encoding="utf-8") if css_path.exists() else ""
+
+
 # Chỉ xuất ra những hàm hỗ trợ
 __all__ = [
     "handle_error",
     "safe_session_state_get",
     "safe_session_state_set",
+    "keyhash",
+    "csv_stat",
+    "read_csv_cached",
+    "csv_text_cached",
+    "logo_path_str",
+    "css_text",
 ]
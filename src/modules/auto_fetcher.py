@@ -1,16 +1,43 @@
 # modules/auto_fetcher.py
 """Chạy EmailFetcher liên tục với khoảng nghỉ tuỳ chọn."""
 
-import time
 import logging
 import argparse
 import imaplib
+import threading
 from datetime import date, datetime
 
 from .config import EMAIL_UNSEEN_ONLY
 
 from .email_fetcher import EmailFetcher
 
+# Thời lượng tối đa của một lệnh IDLE; server thường ngắt IDLE sau 29 phút
+# (RFC 2177), chia nhỏ để kiểm tra stop_event thường xuyên
+IDLE_SLICE = 60
+
+
+def _wait_for_mail(mail, interval: int, stop_event: threading.Event) -> bool:
+    """Chờ đến khi có thư mới (IMAP IDLE) hoặc hết ``interval`` nếu không hỗ trợ IDLE.
+
+    Trả về ``True`` nếu cần quét hộp thư, ``False`` nếu ``stop_event`` đã được set.
+    """
+    idle = getattr(mail, "idle", None)  # imaplib hỗ trợ IDLE từ Python 3.14
+    if idle is None:
+        return not stop_event.wait(interval)
+
+    slice_ = max(1, min(interval, IDLE_SLICE))
+    try:
+        while not stop_event.is_set():
+            with idle(duration=slice_) as responses:
+                for typ, _data in responses:
+                    if typ in ("EXISTS", "RECENT"):
+                        return True
+    except (imaplib.IMAP4.abort, imaplib.IMAP4.error) as e:
+        # IDLE lỗi: quay về polling cho chu kỳ này
+        logging.warning(f"IMAP IDLE lỗi, chuyển sang polling: {e}")
+        return not stop_event.wait(interval)
+    return False
+
 
 def watch_loop(
     interval: int,
@@ -21,14 +48,22 @@ def watch_loop(
     unseen_only: bool = EMAIL_UNSEEN_ONLY,
     since: date | None = None,
     before: date | None = None,
+    stop_event: threading.Event | None = None,
 ) -> None:
-    """Kết nối IMAP và gọi fetch_cv_attachments() liên tục."""
+    """Kết nối IMAP và gọi fetch_cv_attachments() liên tục.
+
+    Giữa các lần quét, dùng IMAP IDLE để chờ server báo thư mới; ``interval``
+    chỉ là chu kỳ chờ khi không hỗ trợ IDLE. ``stop_event`` cho phép luồng
+    khác dừng vòng lặp mà không phải chờ hết ``interval``.
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
     fetcher = EmailFetcher(host, port, user, password)
     fetcher.connect()
     logging.info(f"Bắt đầu auto fetch, interval={interval}s")
 
     try:
-        while True:
+        while not stop_event.is_set():
             try:
                 fetcher.fetch_cv_attachments(
                     since=since,
@@ -43,15 +78,15 @@ def watch_loop(
                     logging.error(f"Không thể kết nối lại: {e}")
             except Exception as e:  # bắt mọi lỗi để không dừng vòng lặp
                 logging.error(f"Lỗi fetch: {e}")
-            time.sleep(interval)
+            # Chờ thư mới qua IDLE (hoặc chờ trên Event khi không hỗ trợ IDLE):
+            # set() sẽ đánh thức ngay, không cần đợi hết interval
+            if not _wait_for_mail(fetcher.mail, interval, stop_event):
+                break
     except KeyboardInterrupt:
-        logging.info("Đã dừng auto fetch")
+        pass
     finally:
-        if fetcher.mail:
-            try:
-                fetcher.mail.logout()
-            except Exception:
-                pass
+        logging.info("Đã dừng auto fetch")
+        fetcher.close()  # trả kết nối về pool; atexit sẽ logout
 
 
 def main():
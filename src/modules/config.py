@@ -1,38 +1,84 @@
 # modules/config.py
 
 import os  # thư viện xử lý biến môi trường và hệ thống file
+import sys  # intern chuỗi provider
+import re  # biểu thức chính quy để làm sạch giá trị biến môi trường
 from pathlib import Path  # thư viện để thao tác đường dẫn hệ thống
-from typing import Dict, Any, List  # khai báo kiểu cho biến và hàm
+from typing import Dict, Any, List, Tuple  # khai báo kiểu cho biến và hàm
 from dotenv import load_dotenv  # thư viện để load file .env
 import logging  # thư viện quản lý log
 import shutil  # thao tác tệp và thư mục
+from concurrent.futures import Future, ThreadPoolExecutor  # gọi API song song / dùng chung kết quả
+import hashlib  # băm API key làm khóa single-flight
+import threading  # khóa bảo vệ bảng lời gọi đang chạy
+from functools import lru_cache  # memo kết quả tra cứu
+from itertools import chain  # nối danh sách models không tạo list trung gian
 
 # --- Tải biến môi trường từ file .env ở thư mục gốc ---
-load_dotenv()  # đọc và gán các biến trong .env vào môi trường hệ thống
+# Chỉ đọc .env một lần cho cả cây tiến trình: tiến trình con kế thừa môi
+# trường (kèm cờ đánh dấu) nên không cần đọc và parse lại file
+_DOTENV_LOADED_FLAG = "_HOANCAU_DOTENV_LOADED"
+if not os.environ.get(_DOTENV_LOADED_FLAG):
+    load_dotenv()  # đọc và gán các biến trong .env vào môi trường hệ thống
+    os.environ[_DOTENV_LOADED_FLAG] = "1"
 
 # --- Cấu hình logging cơ bản ---
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+# Chỉ gắn handler một lần: import lại module (reload, Streamlit rerun, test)
+# không được nhân đôi dòng log
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
 
 # Project root directory (parent của thư mục modules)
 BASE_DIR = Path(__file__).resolve().parents[2]
 
 
+# Làm sạch giá trị biến môi trường trong một lần match: bỏ khoảng trắng,
+# phần comment sau '#' và cặp dấu nháy bao quanh (nhóm 1: có nháy, nhóm 2: không)
+_ENV_VALUE_RE = re.compile(r"""\s*(?:["']([^#]*)["']|([^#]*?))\s*(?:#|$)""")
+
+
+@lru_cache(maxsize=None)
 def _get_env(varname: str, default: str = "") -> str:
-    """Đọc biến môi trường, bỏ comment và dấu nháy, trả về chuỗi."""
-    raw = os.getenv(varname, default)
-    cleaned = raw.split('#', 1)[0].strip()
-    if cleaned.startswith(('"', "'")) and cleaned.endswith(('"', "'")):
-        cleaned = cleaned[1:-1]
-    return cleaned
+    """Đọc biến môi trường, bỏ comment và dấu nháy, trả về chuỗi.
+
+    Kết quả được ghi nhớ theo (varname, default); gọi ``_get_env.cache_clear()``
+    nếu môi trường thay đổi (ví dụ trong test).
+    """
+    value = os.getenv(varname, default).strip()
+    # Đường nhanh: đa số giá trị không có comment hay dấu nháy, chỉ cần strip()
+    if "#" not in value and value[:1] not in ("'", '"'):
+        return value
+    m = _ENV_VALUE_RE.match(value)
+    return m.group(m.lastindex)
 
 # --- Nhà cung cấp (provider) và model mặc định ---
-LLM_PROVIDER = _get_env("LLM_PROVIDER", "google").lower()
+# sys.intern: giá trị provider được so sánh với các literal ("google", ...) ở
+# nhiều nơi; chuỗi đã intern dùng chung bộ nhớ và so sánh nhanh theo định danh
+LLM_PROVIDER = sys.intern(_get_env("LLM_PROVIDER", "google").lower())
+LLM_PROVIDER_UPPER = LLM_PROVIDER.upper()  # dạng in hoa để hiển thị, tính một lần
 LLM_MODEL = _get_env("LLM_MODEL", "gemini-2.5-flash-lite-preview-06-17")
+# Số request LLM tối đa mỗi phút (token bucket dùng chung khi trích xuất CV)
+_raw_rpm = _get_env("LLM_RPM", "60")
+LLM_RPM = float(_raw_rpm) if _raw_rpm.replace(".", "", 1).isdecimal() else 60.0
+
+# Số CV gửi LLM đồng thời khi xử lý hàng loạt
+_raw_workers = _get_env("CV_WORKERS", "4")
+CV_WORKERS = max(1, int(_raw_workers)) if _raw_workers.isdecimal() else 4
+# Số CV gộp vào một request LLM (1 = mỗi CV một request)
+_raw_batch = _get_env("CV_LLM_BATCH_SIZE", "1")
+CV_LLM_BATCH_SIZE = max(1, int(_raw_batch)) if _raw_batch.isdecimal() else 1
+
+# Thời gian sống (giây) của cache kết quả LLM; 0 = không hết hạn
+_raw_cache_ttl = _get_env("LLM_CACHE_TTL", "0")
+LLM_CACHE_TTL = float(_raw_cache_ttl) if _raw_cache_ttl.replace(".", "", 1).isdecimal() else 0.0
+
+# --- Thư viện đọc PDF ưu tiên: pymupdf | pdfminer | pypdf2 (rỗng = tự chọn) ---
+CV_PDF_BACKEND = _get_env("CV_PDF_BACKEND").lower()
 
 # --- Khóa API cho Google, OpenRouter và các platform khác (không bắt buộc) ---
 GOOGLE_API_KEY = _get_env("GOOGLE_API_KEY")
@@ -48,15 +94,12 @@ OPENROUTER_BASE_URL = _get_env(
 
 # --- Cấu hình email (không bắt buộc) ---
 EMAIL_HOST = _get_env("EMAIL_HOST", "imap.gmail.com")
-# EMAIL_PORT: làm sạch comment và chuyển sang int, mặc định 993
-_raw_port = os.getenv("EMAIL_PORT", "").split('#', 1)[0].strip()
-if _raw_port:
-    try:
-        EMAIL_PORT = int(_raw_port)
-    except ValueError:
-        raise RuntimeError(f"⚠️ EMAIL_PORT không hợp lệ: {_raw_port}")
-else:
-    EMAIL_PORT = 993
+# EMAIL_PORT: làm sạch comment và chuyển sang int, mặc định 993.
+# Kiểm tra isdecimal() trước nên int() chỉ chạy trên chuỗi hợp lệ, không cần try/except
+_raw_port = os.getenv("EMAIL_PORT", "").split('#', 1)[0].strip() or "993"
+if not _raw_port.isdecimal():
+    raise RuntimeError(f"⚠️ EMAIL_PORT không hợp lệ: {_raw_port}")
+EMAIL_PORT = int(_raw_port)
 
 EMAIL_USER = _get_env("EMAIL_USER")
 EMAIL_PASS = _get_env("EMAIL_PASS")
@@ -70,17 +113,17 @@ def _get_bool(varname: str, default: bool = True) -> bool:
     return cleaned not in ("0", "false", "no", "")
 
 EMAIL_UNSEEN_ONLY = _get_bool("EMAIL_UNSEEN_ONLY", True)
+# Lọc từ khóa ngay trên server (SEARCH OR SUBJECT/BODY); tắt mặc định vì email
+# chỉ có file tên "cv.pdf" mà không có từ khóa sẽ bị bỏ qua
+EMAIL_KEYWORD_SEARCH = _get_bool("EMAIL_KEYWORD_SEARCH", False)
 
 # --- Thư mục lưu file đính kèm và file xuất kết quả ---
+@lru_cache(maxsize=None)
 def _clean_path(varname: str, default: str) -> Path:
     """
     Lấy biến môi trường, loại bỏ comment và dấu nháy, trả về Path.
     """
-    raw = os.getenv(varname, default)
-    cleaned = raw.split('#', 1)[0].strip()
-    if cleaned.startswith(('"', "'")) and cleaned.endswith(('"', "'")):
-        cleaned = cleaned[1:-1]
-    path = Path(cleaned)
+    path = Path(_get_env(varname, default))
     if not path.is_absolute():
         path = BASE_DIR / path
     return path
@@ -90,6 +133,9 @@ LOG_DIR = _clean_path("LOG_DIR", "log")
 LOG_FILE = _clean_path("LOG_FILE", str(LOG_DIR / "app.log"))
 
 ATTACHMENT_DIR = _clean_path("ATTACHMENT_DIR", "attachments")
+# Thư mục cache nội bộ (cache kết quả LLM...), tách khỏi attachments để thao
+# tác xoá file đính kèm không xoá cache đang mở
+CACHE_DIR = _clean_path("CACHE_DIR", ".cache")
 OUTPUT_CSV = _clean_path("OUTPUT_CSV", "csv/cv_summary.csv")
 OUTPUT_EXCEL = _clean_path("OUTPUT_EXCEL", "excel/cv_summary.xlsx")
 # File lưu thời gian gửi email cho mỗi attachment
@@ -104,29 +150,36 @@ LAST_UID_FILE = _clean_path(
 )
 # File lưu log hội thoại chat
 CHAT_LOG_FILE = _clean_path("CHAT_LOG_FILE", str(LOG_DIR / "chat_log.json"))
-# tạo thư mục nếu chưa tồn tại
-ATTACHMENT_DIR.mkdir(parents=True, exist_ok=True)
-OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-OUTPUT_EXCEL.parent.mkdir(parents=True, exist_ok=True)
-SENT_TIME_FILE.parent.mkdir(parents=True, exist_ok=True)
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-CHAT_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-
-# --- Danh sách models dự phòng ---
-GOOGLE_FALLBACK_MODELS: List[str] = [
-    # Common Gemini models (flash, pro, vision) and extended variants
-    "gemini-1.0", "gemini-1.0-pro", "gemini-1.5-flash", "gemini-1.5-flash-latest",
-    "gemini-1.5-pro", "gemini-1.5-pro-latest", "gemini-pro", "gemini-pro-vision",
-    # Newer and experimental variants
-    "gemini-2.0-alpha", "gemini-2.0-vision", "gemini-2.0-vision-extended",
-    "gemini-2.0-flash", "gemini-2.5-flash-lite-preview-06-17",
-    "gemini-2.5-pro", "gemini-2.5-pro-latest"
-]
-OPENROUTER_FALLBACK_MODELS: List[str] = [
-    "anthropic/claude-3.5-sonnet", "anthropic/claude-3-haiku",
-    "openai/gpt-4o", "openai/gpt-4o-mini", "openai/gpt-3.5-turbo",
-]
+
+
+def _ensure_dir(path: Path) -> bool:
+    """Tạo thư mục nếu chưa có; trả về True nếu vừa tạo mới.
+
+    ``is_dir()`` chỉ tốn một lần ``stat`` nên khi thư mục đã tồn tại (trường hợp
+    thường gặp) không cần gọi ``mkdir`` rồi xử lý ``EEXIST``.
+    """
+    if path.is_dir():
+        return False
+    path.mkdir(parents=True, exist_ok=True)
+    return True
+
+
+# tạo thư mục nếu chưa tồn tại (dict.fromkeys bỏ các thư mục trùng, giữ thứ tự)
+for _dir in dict.fromkeys((
+    ATTACHMENT_DIR,
+    CACHE_DIR,
+    OUTPUT_CSV.parent,
+    OUTPUT_EXCEL.parent,
+    SENT_TIME_FILE.parent,
+    LOG_DIR,
+    CHAT_LOG_FILE.parent,
+    LOG_FILE.parent,
+)):
+    _ensure_dir(_dir)
+del _dir
+
+# --- Danh sách models dự phòng (định nghĩa trong modules.fallback_models) ---
+from .fallback_models import GOOGLE_FALLBACK_MODELS, OPENROUTER_FALLBACK_MODELS
 
 # --- Bảng giá tham khảo cho từng model ---
 MODEL_PRICES: Dict[str, str] = {
@@ -147,52 +200,148 @@ MODEL_PRICES: Dict[str, str] = {
     "openai/gpt-3.5-turbo": "variable",
 }
 
+@lru_cache(maxsize=128)
 def get_model_price(model: str) -> str:
     """Trả về giá (chuỗi) của model hoặc 'unknown' nếu không có."""
     return MODEL_PRICES.get(model, "unknown")
 
-from .model_fetcher import ModelFetcher
+# Các lời gọi lấy models đang chạy: (provider, sha256(api_key)) -> Future.
+# Nhiều thread cùng hỏi một key sẽ chờ chung một lời gọi HTTP (single-flight)
+_inflight: Dict[Tuple[str, str], Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def get_available_models(provider: str, api_key: str, session=None) -> List[str]:
+    """Lấy danh sách models từ API hoặc trả về rỗng nếu lỗi.
+
+    ``session`` (requests.Session, tuỳ chọn) được dùng lại cho các lời gọi HTTP.
+    Các lời gọi đồng thời với cùng provider/key dùng chung một request.
+    """
+    key = (provider, hashlib.sha256((api_key or "").encode()).hexdigest())
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return list(future.result())
+
+    try:
+        models = _fetch_available_models(provider, api_key, session)
+        future.set_result(models)
+        return models
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+# Import ModelFetcher lười trong từng hàm để ``import modules.config`` không kéo
+# theo SDK Google/requests
+def _fetch_google_models(api_key: str, session=None) -> List[str]:
+    from .model_fetcher import ModelFetcher
+    return ModelFetcher.get_google_models(api_key)
 
-def get_available_models(provider: str, api_key: str) -> List[str]:
-    """Lấy danh sách models từ API hoặc trả về rỗng nếu lỗi."""
+
+def _fetch_openrouter_models(api_key: str, session=None) -> List[str]:
+    from .model_fetcher import ModelFetcher
+    return ModelFetcher.get_simple_openrouter_model_ids(api_key, session=session)
+
+
+# Bảng dispatch provider -> hàm lấy models; thêm provider mới chỉ cần thêm một dòng
+_PROVIDER_FETCHERS = {
+    "google": _fetch_google_models,
+    "openrouter": _fetch_openrouter_models,
+}
+
+
+def _fetch_available_models(provider: str, api_key: str, session=None) -> List[str]:
+    """Gọi hàm lấy models của provider; trả về rỗng nếu provider lạ hoặc lỗi."""
+    fetch = _PROVIDER_FETCHERS.get(provider)
+    if fetch is None:
+        return []
     try:
-        if provider == "google":
-            return ModelFetcher.get_google_models(api_key)
-        if provider == "openrouter":
-            return ModelFetcher.get_simple_openrouter_model_ids(api_key)
+        return fetch(api_key, session)
     except Exception as e:
-        logger.warning(f"Không thể lấy models từ API {provider}: {e}")
+        logger.warning("Không thể lấy models từ API %s: %s", provider, e)
     return []
 
 
-def get_models_for_provider(provider: str, api_key: str) -> List[str]:
+def get_models_for_provider(provider: str, api_key: str, session=None) -> List[str]:
     """Lấy models từ API và kết hợp với fallback để đảm bảo đầy đủ các variant"""
-    available = get_available_models(provider, api_key)
+    available = get_available_models(provider, api_key, session=session)
     if provider == "google":
-        # Kết hợp API-fetched và fallback để bao gồm hết các Gemini variants
-        combined = list({*available, *GOOGLE_FALLBACK_MODELS})
-        sorted_models = sorted(combined)
-        logger.info(f"Sử dụng tổng cộng {len(sorted_models)} models Google (API + fallback)")
-        return sorted_models
+        # Kết hợp API-fetched và fallback để bao gồm hết các Gemini variants;
+        # dict.fromkeys loại trùng trong một lượt và giữ thứ tự API trả về
+        combined = list(dict.fromkeys(chain(available, GOOGLE_FALLBACK_MODELS)))
+        logger.info("Sử dụng tổng cộng %d models Google (API + fallback)", len(combined))
+        return combined
     else:
         # OpenRouter: nếu API gọi thành công, dùng API, ngược lại dùng fallback
         if available:
-            logger.info(f"Đã lấy {len(available)} models từ OpenRouter API")
+            logger.info("Đã lấy %d models từ OpenRouter API", len(available))
             return available
         logger.warning("Sử dụng fallback models cho OpenRouter")
-        return OPENROUTER_FALLBACK_MODELS
+        return list(OPENROUTER_FALLBACK_MODELS)
+
+# API key của từng provider, dùng khi cần lấy models cho nhiều provider
+PROVIDER_API_KEYS: Dict[str, str] = {
+    "google": GOOGLE_API_KEY,
+    "openrouter": OPENROUTER_API_KEY,
+}
+
+# Tên biến môi trường chứa API key của từng provider (tránh ghép provider.upper() mỗi lần lưu)
+PROVIDER_KEY_ENV_VARS: Dict[str, str] = {
+    "google": "GOOGLE_API_KEY",
+    "openrouter": "OPENROUTER_API_KEY",
+}
 
 # --- Cấu hình LLM mặc định ---
+# Chỉ chứa giá trị đọc từ môi trường; danh sách models cần gọi API nên
+# được lấy lười qua get_llm_config() thay vì chạy khi import module
 LLM_CONFIG = {
     "provider": LLM_PROVIDER,
     "model": LLM_MODEL,
-    "api_key": GOOGLE_API_KEY if LLM_PROVIDER == "google" else OPENROUTER_API_KEY,
-    "available_models": get_models_for_provider(
-        LLM_PROVIDER, 
-        GOOGLE_API_KEY if LLM_PROVIDER == "google" else OPENROUTER_API_KEY
-    ),
+    # provider khác google dùng key OpenRouter như trước
+    "api_key": PROVIDER_API_KEYS.get(LLM_PROVIDER, OPENROUTER_API_KEY),
 }
 
+
+def get_models_for_all_providers() -> Dict[str, List[str]]:
+    """Lấy models cho mọi provider có API key, gọi API song song.
+
+    Các lời gọi chủ yếu chờ mạng nên chạy trên thread pool: tổng thời gian
+    bằng lời gọi chậm nhất thay vì tổng các lời gọi.
+    """
+    providers = {p: key for p, key in PROVIDER_API_KEYS.items() if key}
+    if not providers:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+        futures = {
+            p: executor.submit(get_models_for_provider, p, key)
+            for p, key in providers.items()
+        }
+        return {p: future.result() for p, future in futures.items()}
+
+
+@lru_cache(maxsize=1)
+def get_llm_config() -> Dict[str, Any]:
+    """Trả về LLM_CONFIG kèm ``available_models`` (gọi API ở lần đầu tiên).
+
+    ``models_by_provider`` chứa models của mọi provider đã cấu hình key.
+    """
+    models_by_provider = get_models_for_all_providers()
+    available = models_by_provider.get(LLM_CONFIG["provider"])
+    if available is None:
+        available = get_models_for_provider(LLM_CONFIG["provider"], LLM_CONFIG["api_key"])
+    return {
+        **LLM_CONFIG,
+        "available_models": available,
+        "models_by_provider": models_by_provider,
+    }
+
 # --- Enhanced configuration validation ---
 def validate_api_key(api_key: str, provider: str) -> bool:
     """Validate API key format for different providers."""
@@ -246,6 +395,7 @@ def ensure_directories():
     """Ensure all required directories exist."""
     directories = [
         ATTACHMENT_DIR,
+        CACHE_DIR,
         OUTPUT_CSV.parent,
         LOG_DIR,
         CHAT_LOG_FILE.parent,
@@ -254,10 +404,10 @@ def ensure_directories():
     ]
     for directory in directories:
         try:
-            directory.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Directory ensured: {directory}")
+            if _ensure_dir(directory):
+                logger.info("Directory created: %s", directory)
         except Exception as e:
-            logger.error(f"Failed to create directory {directory}: {e}")
+            logger.error("Failed to create directory %s: %s", directory, e)
 
 def cleanup_legacy_log_dirs() -> None:
     """Move logs from old directories (.log, logs) into LOG_DIR."""
@@ -272,12 +422,12 @@ def cleanup_legacy_log_dirs() -> None:
                     if dest.exists():
                         dest = LOG_DIR / f"{alt_dir.name}_{item.name}"
                     shutil.move(str(item), dest)
-                    logger.info(f"Moved {item} to {dest}")
+                    logger.info("Moved %s to %s", item, dest)
                 except Exception as e:
-                    logger.warning(f"Could not move {item} from {alt_dir}: {e}")
+                    logger.warning("Could not move %s from %s: %s", item, alt_dir, e)
             try:
                 alt_dir.rmdir()
-                logger.info(f"Removed legacy log dir {alt_dir}")
+                logger.info("Removed legacy log dir %s", alt_dir)
             except Exception:
                 pass
 
@@ -3,58 +3,536 @@
 import os  # xử lý tương tác với hệ thống file và biến môi trường
 import re  # xử lý biểu thức chính quy
 import json  # parse và dump JSON
+import hashlib  # mã băm nội dung file cho cache text
+try:
+    # orjson (Rust) parse nhanh hơn json chuẩn; lỗi của nó kế thừa json.JSONDecodeError
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 import time  # xử lý thời gian và sleep retry
+import inspect  # kiểm tra tham số fetcher hỗ trợ
+import importlib  # nạp thư viện PDF theo cấu hình
 import logging  # ghi log
-from datetime import datetime, date  # định dạng thời gian hiển thị và lọc
-from typing import List, Dict, Optional, Callable  # khai báo kiểu
+from logging.handlers import RotatingFileHandler  # file log xoay vòng, không phình vô hạn
+import asyncio  # API bất đồng bộ cho caller async (FastAPI, ...)
+import atexit  # đóng pool tiến trình đọc file khi thoát
+import multiprocessing  # chọn cách tạo tiến trình con (forkserver/spawn)
+import threading  # khóa khi tạo pool tiến trình dùng chung
+import random  # jitter cho thời gian chờ retry
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed  # đọc file / gọi LLM song song
+from datetime import datetime, date, timezone  # định dạng thời gian hiển thị và lọc
+from email.utils import parsedate_to_datetime  # header Retry-After dạng HTTP-date
+from functools import lru_cache  # nhớ mã băm file trong tiến trình
+from itertools import islice  # giới hạn số trang PDF được đọc
+from pathlib import Path  # đường dẫn thư mục cache text
+from typing import List, Dict, Optional, Callable, Tuple  # khai báo kiểu
 
 import pandas as pd  # xử lý DataFrame
-pd.set_option("display.max_colwidth", None)  # hiển thị đầy đủ nội dung các cột
-import docx  # đọc file .docx
+import zipfile  # mở file .docx (zip) để đọc thẳng word/document.xml
+from xml.etree import ElementTree  # parse XML dạng stream (iterparse)
 from openpyxl.styles import Font, PatternFill  # định dạng Excel
-
-# --- Thiết lập logger cho module ---
-logger = logging.getLogger(__name__)  # lấy logger theo tên module
-logger.setLevel(logging.INFO)  # mức độ log tối thiểu INFO
-fmt = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")  # định dạng log
-# handler xuất log ra console
-stream_h = logging.StreamHandler()  
-stream_h.setFormatter(fmt)
-logger.addHandler(stream_h)
-# handler xuất log ra file trong thư mục log
-from .config import LOG_DIR
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-file_h = logging.FileHandler(LOG_DIR / "cv_processor.log", encoding="utf-8")
-file_h.setFormatter(fmt)
-logger.addHandler(file_h)
-
-# --- Cấu hình extractor PDF: pdfminer, PyPDF2 hoặc PyMuPDF ---
-_PDF_EX: Optional[str]
 try:
-    from pdfminer.high_level import extract_text
-    _PDF_EX = "pdfminer"  # ưu tiên pdfminer nếu cài đặt
+    # pyarrow có writer CSV viết bằng C++, nhanh hơn nhiều so với writer của pandas
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
 except ImportError:
-    try:
-        import PyPDF2  # noqa: F401
-        _PDF_EX = "pypdf2"  # fallback sang PyPDF2
-    except ImportError:
-        try:
-            import fitz  # noqa: F401  # PyMuPDF
-            _PDF_EX = "pymupdf"  # fallback sang PyMuPDF
-        except ImportError:
-            _PDF_EX = None  # không có thư viện PDF nào
+    pa = pacsv = None
 
-from .llm_client import LLMClient  # client LLM mặc định
-from typing import Union
-# Support both LLMClient and DynamicLLMClient
 from .config import (
     ATTACHMENT_DIR,
+    CACHE_DIR,
+    CV_PDF_BACKEND,
+    CV_WORKERS,
+    CV_LLM_BATCH_SIZE,
     OUTPUT_CSV,
     OUTPUT_EXCEL,
     EMAIL_UNSEEN_ONLY,
+    LLM_RPM,
+    LLM_CACHE_TTL,
+    LOG_DIR,
 )
+from .llm_client import LLMClient  # client LLM mặc định
 from .sent_time_store import load_sent_times
-from .prompts import CV_EXTRACTION_PROMPT  # prompt LLM để trích xuất CV
+from .llm_cache import LLMCache, cache_key
+from .rate_limiter import TokenBucket
+from .prompts import CV_EXTRACTION_PROMPT, CV_BATCH_EXTRACTION_PROMPT  # prompt LLM để trích xuất CV
+
+# --- Thiết lập logger cho module ---
+logger = logging.getLogger(__name__)  # lấy logger theo tên module
+logger.setLevel(logging.INFO)  # mức độ log tối thiểu INFO
+# Chỉ gắn handler ở lần import đầu; reload module không mở thêm file log
+if not logger.handlers:
+    fmt = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")  # định dạng log
+    # handler xuất log ra console
+    stream_h = logging.StreamHandler()
+    stream_h.setFormatter(fmt)
+    logger.addHandler(stream_h)
+    # handler xuất log ra file trong thư mục log (tối đa 10 MB x 3 bản sao lưu)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    file_h = RotatingFileHandler(
+        LOG_DIR / "cv_processor.log", maxBytes=10_000_000, backupCount=3, encoding="utf-8"
+    )
+    file_h.setFormatter(fmt)
+    logger.addHandler(file_h)
+
+# --- Cấu hình extractor PDF: PyMuPDF, pdfminer hoặc PyPDF2 ---
+# PyMuPDF (fitz) nhanh hơn pdfminer nhiều lần nên được ưu tiên; CV_PDF_BACKEND
+# chọn thư viện thử trước (để so sánh A/B), các thư viện còn lại làm fallback
+_PDF_MODULES = {
+    "pymupdf": "fitz",
+    "pdfminer": "pdfminer.high_level",
+    "pypdf2": "PyPDF2",
+}
+
+
+@lru_cache(maxsize=None)
+def _get_pdf_backend() -> Tuple[Optional[str], object]:
+    """Trả về ``(tên, module)`` thư viện PDF; chỉ import ở lần gọi đầu tiên.
+
+    Các thư viện PDF nặng (pdfminer, PyMuPDF) nên không import lúc nạp module:
+    UI/CLI không đọc PDF nào thì không phải trả thời gian import và bộ nhớ.
+    """
+    if CV_PDF_BACKEND and CV_PDF_BACKEND not in _PDF_MODULES:
+        logger.warning("CV_PDF_BACKEND=%s không hợp lệ, tự chọn thư viện PDF", CV_PDF_BACKEND)
+    for name in sorted(_PDF_MODULES, key=lambda n: n != CV_PDF_BACKEND):
+        try:
+            return name, importlib.import_module(_PDF_MODULES[name])
+        except ImportError:
+            continue
+    return None, None
+
+# --- Engine regex cho fallback: RE2 (google-re2, thời gian tuyến tính, không
+# backtracking) nếu có cài đặt, ngược lại dùng module re chuẩn ---
+try:
+    import re2  # type: ignore
+except ImportError:
+    re2 = None
+
+
+def _compile_fallback(pattern: str):
+    """Biên dịch regex fallback bằng RE2 nếu có, lỗi cú pháp RE2 thì dùng re."""
+    # Cờ không phân biệt hoa thường viết inline "(?i)" vì API cờ của re2 khác re
+    pattern = "(?i)" + pattern
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+# Cột của bảng kết quả và key tương ứng trong dict info trả về từ LLM/regex
+# (None: giá trị lấy từ metadata của file chứ không phải từ info)
+RESULT_FIELDS = (
+    ("Thời gian nhận", None),
+    ("Nguồn", None),
+    ("Vị trí", "vi_tri"),
+    ("Họ tên", "ten"),
+    ("Tuổi", "tuoi"),
+    ("Email", "email"),
+    ("Điện thoại", "dien_thoai"),
+    ("Địa chỉ", "dia_chi"),
+    ("Học vấn", "hoc_van"),
+    ("Kinh nghiệm", "kinh_nghiem"),
+    ("Kỹ năng", "ky_nang"),
+)
+# Kích thước bộ đệm khi ghi file CSV kết quả
+CSV_WRITE_BUFFER = 1 << 20
+
+# Số CV gửi LLM đồng thời (giới hạn theo hạn mức request của nhà cung cấp),
+# chỉnh qua biến môi trường CV_WORKERS
+DEFAULT_MAX_WORKERS = CV_WORKERS
+# Số CV gộp vào một request LLM, chỉnh qua biến môi trường CV_LLM_BATCH_SIZE
+DEFAULT_LLM_BATCH_SIZE = CV_LLM_BATCH_SIZE
+
+# Giới hạn tốc độ gọi LLM dùng chung cho mọi luồng: LLM_RPM request/phút, burst 10
+_RATE_BUCKET = TokenBucket(rate=LLM_RPM / 60.0, capacity=10)
+
+# Retry khi dính quota/rate limit: chờ 30s, mỗi lần x1.5, tối đa 60s mỗi lần
+# (cộng jitter 10% để các luồng không retry cùng lúc) và tổng chờ không quá 120s
+BACKOFF_INITIAL = 30.0
+BACKOFF_FACTOR = 1.5
+BACKOFF_CAP = 60.0
+MAX_TOTAL_WAIT = 120.0
+
+
+# Gợi ý thời gian chờ trong thông báo lỗi của Gemini ("retry_delay { seconds: 13 }"
+# hoặc "Please retry in 13.5s")
+_RETRY_DELAY_RX = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)|retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Số giây server yêu cầu chờ (header Retry-After của OpenRouter hoặc
+    ``retry_delay`` của Google), None nếu lỗi không có gợi ý này."""
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:  # dạng HTTP-date
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    m = _RETRY_DELAY_RX.search(str(exc))
+    if m:
+        return float(m.group(1) or m.group(2))
+    return None
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Thời gian chờ trước lần thử ``attempt + 1`` (exponential backoff + jitter).
+
+    Nếu server cho biết thời gian chờ (``retry_after``) thì chờ đúng chừng đó
+    cộng jitter tối đa 1s, thay vì đoán bằng backoff.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 1)
+    wait = min(BACKOFF_CAP, BACKOFF_INITIAL * BACKOFF_FACTOR ** (attempt - 1))
+    return wait + random.uniform(0, wait * 0.1)
+
+
+# Số ký tự tối đa của mỗi CV được gửi cho LLM (xem _prune_text_for_llm)
+LLM_TEXT_LIMIT = 4096
+# Phần đầu CV luôn được giữ (thường chứa tên và thông tin liên hệ)
+LLM_HEAD_CHARS = 1000
+# Dòng chứa thông tin cần trích xuất (email, số điện thoại, tiêu đề mục)
+_LLM_KEEP_RX = re.compile(
+    r"@|\+?\d[\d\-\s]{7,}\d|e-?mail|phone|điện thoại|sđt|tuổi|age|địa chỉ|address"
+    r"|vị trí|position|học vấn|education|kinh nghiệm|experience|kỹ năng|skills?",
+    re.IGNORECASE,
+)
+
+# Số trang PDF tối đa được đọc mỗi CV (CV thường 1-3 trang; LLM cũng chỉ nhận
+# LLM_TEXT_LIMIT ký tự nên các trang sau hầu như không được dùng)
+PDF_MAX_PAGES = 5
+
+# Thư mục con của ATTACHMENT_DIR chứa text đã trích xuất (khóa theo mã băm nội dung)
+TEXT_CACHE_DIRNAME = ".textcache"
+
+# Số tiến trình đọc PDF/DOCX song song (việc parse tốn CPU, bị GIL chặn nếu dùng thread)
+DEFAULT_EXTRACT_WORKERS = os.cpu_count() or 1
+# Số file chưa có trong cache text tối thiểu để dùng tiến trình con; ít hơn thì
+# đọc luôn trong các luồng xử lý (không đáng chi phí gửi việc sang tiến trình)
+MIN_PROCESS_POOL_FILES = 4
+
+# Pool tiến trình đọc file dùng chung, tạo lười ở lần đầu cần và giữ giữa các
+# lần process() (khởi động tiến trình con phải import lại pandas, thư viện PDF...)
+_EXTRACT_POOL: Optional[ProcessPoolExecutor] = None
+_EXTRACT_POOL_SIZE = 0
+_EXTRACT_POOL_LOCK = threading.Lock()
+
+
+def _get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    """Trả về pool tiến trình dùng chung có ít nhất ``workers`` tiến trình.
+
+    Dùng forkserver (hoặc spawn) thay vì fork: fork từ host nhiều luồng như
+    Streamlit hay threadpool của FastAPI có thể treo vì khóa bị sao chép.
+    """
+    global _EXTRACT_POOL, _EXTRACT_POOL_SIZE
+    with _EXTRACT_POOL_LOCK:
+        if _EXTRACT_POOL is None or _EXTRACT_POOL_SIZE < workers:
+            if _EXTRACT_POOL is not None:
+                _EXTRACT_POOL.shutdown(wait=False)
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _EXTRACT_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+            _EXTRACT_POOL_SIZE = workers
+        return _EXTRACT_POOL
+
+
+@atexit.register
+def _shutdown_extract_pool() -> None:
+    """Đóng pool tiến trình đọc file (nếu đã tạo)."""
+    global _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        pool, _EXTRACT_POOL = _EXTRACT_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# Regex fallback khi LLM lỗi: (key, nhãn đứng trước, giá trị cần lấy)
+_FALLBACK_SOURCES = (
+    ("ten", r"(?:(?:Họ tên|Tên)[:\-\s]+)", r"[^\n]+"),
+    ("tuoi", r"(?:(?:Tuổi|Age)[:\-\s]+)", r"\d{1,3}"),
+    ("email", "", r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"),
+    ("dien_thoai", "", r"\+?\d[\d\-\s]{7,}\d"),
+    ("vi_tri", r"(?:(?:Vị trí|Position)[:\-\s]+)", r"[^\n]+"),
+    ("hoc_van", r"(?:(?:Học vấn|Education)[:\-\s]+)", r"[^\n]+"),
+    ("kinh_nghiem", r"(?:(?:Kinh nghiệm|Experience)[:\-\s]+)", r"[^\n]+"),
+    ("dia_chi", r"(?:(?:Địa chỉ|Address)[:\-\s]+)", r"[^\n]+"),
+    ("ky_nang", r"(?:(?:Kỹ năng|Skills?)[:\-\s]+)", r"[^\n]+"),
+)
+# Một regex gộp (alternation + named group): quét text một lượt cho mọi trường
+_FALLBACK_RX = _compile_fallback(
+    "|".join(f"{label}(?P<{key}>{value})" for key, label, value in _FALLBACK_SOURCES)
+)
+# Regex riêng từng trường, chỉ dùng cho trường mà lượt quét chung chưa tìm thấy
+# (ví dụ email nằm trong dòng đã được nhãn khác lấy trọn)
+_FALLBACK_PATTERNS = tuple(
+    (key, _compile_fallback(f"{label}({value})"))
+    for key, label, value in _FALLBACK_SOURCES
+)
+# Regex đủ tin cậy để bỏ qua LLM khi tỉ lệ trường tìm thấy đạt ngưỡng này
+# và email khớp định dạng chặt
+REGEX_SKIP_RATIO = 0.9
+# Text ngắn hơn ngưỡng này (thường là PDF scan/ảnh trích được rất ít chữ)
+# chỉ dùng regex: LLM không có thêm dữ liệu để trích xuất
+LLM_MIN_TEXT_CHARS = 400
+_STRICT_EMAIL_RX = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+
+RESULT_COLUMNS = tuple(col for col, _ in RESULT_FIELDS)
+_INFO_FIELDS = tuple((col, key) for col, key in RESULT_FIELDS if key is not None)
+
+
+def _build_row(sent_time: str, fname: str, info: Dict) -> Tuple[str, ...]:
+    """Tạo một dòng kết quả: tuple giá trị theo đúng thứ tự RESULT_COLUMNS."""
+    return (sent_time, fname, *(info.get(key, "") for _, key in _INFO_FIELDS))
+
+
+def _scan_json_object(s: str, start: int) -> Optional[str]:
+    """Trả về object/array JSON bắt đầu tại ``s[start]`` (đếm ngoặc, bỏ qua chuỗi)."""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return s[start:i + 1]
+    return None
+
+
+def _first_json_object(s: str, opener: str = "{") -> Optional[str]:
+    """
+    Tìm object JSON đầu tiên (hoặc array nếu ``opener="["``) trong phản hồi LLM
+    bằng một lượt quét tuyến tính (không dùng regex tham lam ``\\{.*\\}`` dễ
+    backtrack trên phản hồi dài). Ưu tiên nội dung trong khối ```json ... ``` nếu có.
+    """
+    fence = s.find("```")
+    if fence != -1:
+        body_start = fence + 3
+        if s.startswith("json", body_start):
+            body_start += 4
+        body_end = s.find("```", body_start)
+        body = s[body_start:body_end] if body_end != -1 else s[body_start:]
+        idx = body.find(opener)
+        if idx != -1:
+            obj = _scan_json_object(body, idx)
+            if obj is not None:
+                return obj
+    idx = s.find(opener)
+    return _scan_json_object(s, idx) if idx != -1 else None
+
+
+# Số vị trí "{" tối đa thử raw_decode khi object đầu tiên không phải JSON hợp lệ
+MAX_JSON_DECODE_ATTEMPTS = 20
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _raw_decode_first_dict(s: str) -> Optional[Dict]:
+    """Thử ``raw_decode`` tại từng ``{`` (tối đa MAX_JSON_DECODE_ATTEMPTS lần), trả về dict đầu tiên."""
+    idx = s.find("{")
+    for _ in range(MAX_JSON_DECODE_ATTEMPTS):
+        if idx == -1:
+            return None
+        try:
+            obj, _end = _JSON_DECODER.raw_decode(s, idx)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        idx = s.find("{", idx + 1)
+    return None
+
+
+def _prune_text_for_llm(text: str, max_chars: int = LLM_TEXT_LIMIT) -> str:
+    """
+    Rút gọn text CV trước khi gửi LLM để giảm token: CV ngắn giữ nguyên; CV dài
+    giữ LLM_HEAD_CHARS ký tự đầu cộng các dòng khớp _LLM_KEEP_RX, tối đa max_chars.
+    """
+    if len(text) <= max_chars:
+        return text
+    head = text[:LLM_HEAD_CHARS]
+    parts = [head]
+    size = len(head)
+    for line in text[LLM_HEAD_CHARS:].splitlines():
+        line = line.strip()
+        if not line or not _LLM_KEEP_RX.search(line):
+            continue
+        if size + len(line) + 1 > max_chars:
+            break
+        parts.append(line)
+        size += len(line) + 1
+    return "\n".join(parts)
+
+
+def _extract_pdf(path: str) -> str:
+    """
+    Đọc text từ file PDF bằng thư viện tương ứng
+    Trả về chuỗi rỗng nếu không có library
+    """
+    pdf_ex, pdf_lib = _get_pdf_backend()
+    if pdf_ex == "pdfminer":
+        # caching=False tránh chi phí cache tài nguyên của pdfminer;
+        # maxpages chặn các file PDF dài bất thường
+        return pdf_lib.extract_text(path, maxpages=PDF_MAX_PAGES, caching=False)
+    elif pdf_ex == "pypdf2":
+        pages = islice(pdf_lib.PdfReader(path).pages, PDF_MAX_PAGES)
+        return "".join(p.extract_text() or "" for p in pages)
+    elif pdf_ex == "pymupdf":
+        # Chế độ "text" rõ ràng; with đóng file (giải phóng mmap) ngay cả khi lỗi
+        with pdf_lib.open(path) as doc:
+            return "".join(page.get_text("text") for page in islice(doc, PDF_MAX_PAGES))
+    logger.error("❌ Không có thư viện PDF phù hợp để trích xuất text.")
+    return ""
+
+
+def _file_digest(path: str) -> str:
+    """SHA-256 nội dung file (hashlib.file_digest trên Python 3.11+)."""
+    with open(path, "rb") as fh:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(fh, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def _cached_digest(path: str, size: int, mtime_ns: int) -> str:
+    """Mã băm nội dung file, nhớ theo (path, size, mtime) để không đọc lại file chưa đổi."""
+    return _file_digest(path)
+
+
+def _path_digest(path: str) -> str:
+    """Mã băm nội dung file, chỉ băm lại khi kích thước hoặc mtime thay đổi."""
+    st = os.stat(path)
+    return _cached_digest(path, st.st_size, st.st_mtime_ns)
+
+
+def _text_cache_file(path: str) -> Optional[Path]:
+    """File cache text của ``path`` (None nếu định dạng không được cache).
+    Có thể ném OSError khi không đọc được file để tính mã băm."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".pdf", ".docx"):
+        return None
+    return Path(ATTACHMENT_DIR) / TEXT_CACHE_DIRNAME / (
+        f"{_path_digest(path)}-{_get_pdf_backend()[0] if ext == '.pdf' else 'docxml'}-{PDF_MAX_PAGES}.txt"
+    )
+
+
+def _lookup_cached_text(path: str) -> Tuple[Optional[Path], Optional[str]]:
+    """(file cache, text đã cache) của ``path``; text là None nếu chưa có.
+    File cache là None nếu định dạng không cache hoặc không đọc được file."""
+    try:
+        cache_file = _text_cache_file(path)
+        if cache_file is not None and cache_file.is_file():
+            return cache_file, cache_file.read_text(encoding="utf-8")
+        return cache_file, None
+    except OSError:
+        return None, None
+
+
+def _extract_and_cache(path: str, cache_file: Optional[Path]) -> str:
+    """
+    Parse file và ghi kết quả vào ``cache_file`` (nếu có).
+    Chạy được trong tiến trình con: ``cache_file`` (chứa mã băm nội dung) do
+    tiến trình cha tính, nên bộ nhớ mã băm của tiến trình cha được dùng lại
+    giữa các lần chạy thay vì bị băm lại trong tiến trình con.
+    """
+    text = _extract_text_uncached(path)
+    if text and cache_file is not None:  # không cache kết quả rỗng (file lỗi / thiếu thư viện)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+            tmp_file.write_text(text, encoding="utf-8")
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"Không ghi được cache text cho {path}: {e}")
+    return text
+
+
+def extract_text_from_file(path: str) -> str:
+    """
+    Đọc văn bản từ file PDF hoặc DOCX, có cache trên đĩa.
+    Cache nằm ở ``ATTACHMENT_DIR/.textcache`` và được đặt khóa theo mã băm
+    nội dung file + extractor, nên file không đổi thì không phải parse lại.
+    Hàm cấp module để có thể pickle khi chạy trong ProcessPoolExecutor.
+    """
+    try:
+        cache_file = _text_cache_file(path)
+        if cache_file is None:
+            return _extract_text_uncached(path)
+        if cache_file.is_file():
+            return cache_file.read_text(encoding="utf-8")
+    except OSError as e:
+        logger.warning(f"Không dùng được cache text cho {path}: {e}")
+        return _extract_text_uncached(path)
+    return _extract_and_cache(path, cache_file)
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _extract_docx_fast(path: str) -> str:
+    """
+    Đọc text DOCX bằng cách stream ``word/document.xml`` (zipfile + iterparse),
+    không dựng DOM python-docx. Mỗi đoạn ``w:p`` thành một dòng, gồm cả các
+    đoạn nằm trong bảng.
+    """
+    paragraphs: List[str] = []
+    parts: List[str] = []
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as fh:
+        for _, el in ElementTree.iterparse(fh, events=("end",)):
+            tag = el.tag
+            if tag == _W_NS + "t":
+                parts.append(el.text or "")
+            elif tag == _W_NS + "tab":
+                parts.append("\t")
+            elif tag == _W_NS + "br" or tag == _W_NS + "cr":
+                parts.append("\n")
+            elif tag == _W_NS + "p":
+                paragraphs.append("".join(parts))
+                parts = []
+                el.clear()  # giải phóng các node con đã đọc
+    return "\n".join(paragraphs)
+
+
+def _extract_text_uncached(path: str) -> str:
+    """
+    Đọc văn bản từ file PDF hoặc DOCX
+    Trả về chuỗi text, log cảnh báo nếu định dạng không hỗ trợ.
+    """
+    ext = os.path.splitext(path)[1].lower()  # lấy phần mở rộng
+    try:
+        if ext == ".pdf":
+            return _extract_pdf(path)
+        if ext == ".docx":
+            try:
+                return _extract_docx_fast(path)
+            except Exception as e:
+                logger.warning(f"Đọc nhanh DOCX thất bại, dùng python-docx: {e}")
+            import docx  # chỉ import python-docx khi thật sự cần fallback
+            doc = docx.Document(path)
+            return "\n".join(p.text for p in doc.paragraphs)
+        logger.warning(f"⚠️ Định dạng không hỗ trợ: {path}")
+    except Exception as e:
+        logger.error(f"Lỗi khi đọc file {path}: {e}")
+    return ""
+
 
 def format_sent_time_display(ts: str) -> str:
     """Định dạng thời gian ISO sang dạng dễ đọc hơn."""
@@ -77,73 +555,118 @@ class CVProcessor:
     """
     Lớp xử lý file CV: đọc text, gọi LLM hoặc regex fallback, trả về DataFrame
     """
-    def __init__(self, fetcher: Optional[object] = None, llm_client = None):
-        """Khởi tạo: cấp fetcher (đọc email) và LLM client"""
+    def __init__(
+        self,
+        fetcher: Optional[object] = None,
+        llm_client = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        extract_workers: int = DEFAULT_EXTRACT_WORKERS,
+        llm_cache: Optional[LLMCache] = None,
+        llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE,
+    ):
+        """Khởi tạo: cấp fetcher (đọc email), LLM client và số CV xử lý song song"""
         self.fetcher = fetcher  # đối tượng có method fetch_cv_attachments()
         self.llm_client = llm_client or LLMClient()  # client LLM mặc định
+        self.max_workers = max(1, max_workers)  # số luồng gọi LLM đồng thời
+        self.extract_workers = max(1, extract_workers)  # số tiến trình đọc file
+        self._llm_cache = llm_cache  # cache kết quả LLM (tạo lười nếu None)
+        self.llm_batch_size = max(1, llm_batch_size)  # số CV gộp vào một request LLM
+
+    def _get_llm_cache(self) -> Optional[LLMCache]:
+        """Trả về cache kết quả LLM, mặc định ``CACHE_DIR/llm_cache.sqlite``."""
+        if self._llm_cache is None:
+            try:
+                self._llm_cache = LLMCache(
+                    CACHE_DIR / "llm_cache.sqlite", ttl=LLM_CACHE_TTL or None
+                )
+            except Exception as e:
+                logger.warning(f"Không mở được cache LLM: {e}")
+        return self._llm_cache
 
     def _extract_pdf(self, path: str) -> str:
-        """
-        Đọc text từ file PDF bằng thư viện tương ứng
-        Trả về chuỗi rỗng nếu không có library
-        """
-        if _PDF_EX == "pdfminer":
-            return extract_text(path)
-        elif _PDF_EX == "pypdf2":
-            from PyPDF2 import PdfReader
-            txt = ""
-            for p in PdfReader(path).pages:
-                txt += p.extract_text() or ""
-            return txt
-        elif _PDF_EX == "pymupdf":
-            import fitz
-            doc = fitz.open(path)
-            txt = "".join(page.get_text() for page in doc)
-            doc.close()
-            return txt
-        logger.error("❌ Không có thư viện PDF phù hợp để trích xuất text.")
-        return ""
+        """Đọc text từ file PDF (xem ``_extract_pdf`` cấp module)."""
+        return _extract_pdf(path)
 
     def extract_text(self, path: str) -> str:
         """
         Đọc văn bản từ file PDF hoặc DOCX
         Trả về chuỗi text, log cảnh báo nếu định dạng không hỗ trợ
         """
-        ext = os.path.splitext(path)[1].lower()  # lấy phần mở rộng
+        return extract_text_from_file(path)
+
+    def _extract_texts_parallel(self, files: List[str]) -> Optional[List[Optional[str]]]:
+        """
+        Đọc text của nhiều file: file đã có trong cache text được đọc ngay ở
+        tiến trình hiện tại, chỉ file chưa cache mới gửi sang pool tiến trình
+        dùng chung (parse PDF/DOCX tốn CPU).
+        Trả về None nếu extract_text bị thay thế; phần tử None là file sẽ được
+        đọc bằng ``self.extract_text`` trong luồng xử lý của nó (ít file chưa
+        cache hoặc không dùng được tiến trình con).
+        """
+        # Chỉ dùng cache/tiến trình con khi extract_text không bị thay thế
+        # (subclass/test), vì tiến trình con luôn gọi hàm cấp module
+        if "extract_text" in vars(self) or type(self).extract_text is not CVProcessor.extract_text:
+            return None
+        # Mã băm/file cache tính ở tiến trình này (được nhớ giữa các lần chạy)
+        lookups = [_lookup_cached_text(path) for path in files]
+        texts: List[Optional[str]] = [text for _, text in lookups]
+        misses = [i for i, text in enumerate(texts) if text is None]
+        workers = min(self.extract_workers, len(misses))
+        if workers < 2 or len(misses) < MIN_PROCESS_POOL_FILES:
+            return texts
         try:
-            if ext == ".pdf":
-                return self._extract_pdf(path)
-            if ext == ".docx":
-                doc = docx.Document(path)
-                return "\n".join(p.text for p in doc.paragraphs)
-            logger.warning(f"⚠️ Định dạng không hỗ trợ: {path}")
+            pool = _get_extract_pool(workers)
+            results = pool.map(
+                _extract_and_cache, [files[i] for i in misses], [lookups[i][0] for i in misses]
+            )
+            for i, text in zip(misses, results):
+                texts[i] = text
         except Exception as e:
-            logger.error(f"Lỗi khi đọc file {path}: {e}")
-        return ""
+            # Môi trường không tạo được tiến trình con (hoặc pool hỏng): bỏ pool,
+            # các file còn thiếu được đọc trong thread
+            logger.warning(f"Không đọc file song song bằng tiến trình được: {e}")
+            _shutdown_extract_pool()
+        return texts
 
-    def extract_info_with_llm(self, text: str) -> Dict:
+    def extract_info_with_llm(self, text: str, force_llm: bool = False) -> Dict:
         """
-        Enhanced LLM extraction with better error handling and retry logic
+        Enhanced LLM extraction with better error handling and retry logic.
+        Nếu regex đã lấy đủ các trường thì bỏ qua LLM, trừ khi ``force_llm``.
         """
         if not text.strip():
             logger.warning("Text input is empty for LLM extraction")
             return {}
 
+        if not force_llm:
+            info = self._regex_if_complete(text)
+            if info is not None:
+                logger.info("✅ Regex đã đủ trường hoặc text quá ngắn, bỏ qua LLM")
+                return info
+
+        # CV đã xử lý (cùng prompt, model và nội dung) thì dùng lại kết quả cũ
+        cache = self._get_llm_cache()
+        key = cache_key(CV_EXTRACTION_PROMPT, text, str(getattr(self.llm_client, "model", "")))
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info("✅ Dùng kết quả LLM đã cache")
+                return cached
+
+        # Chỉ gửi phần text cần cho việc trích xuất (giảm token)
+        prompt_text = _prune_text_for_llm(text)
+        if len(prompt_text) < len(text):
+            logger.info("Text pruned from %d to %d chars", len(text), len(prompt_text))
+
         max_retries = 3
-        base_delay = 1  # seconds
-        
+        total_wait = 0.0  # tổng thời gian đã chờ do quota/rate limit
+
         for attempt in range(1, max_retries + 1):
             try:
                 logger.info(f"LLM extraction attempt {attempt}/{max_retries}")
                 
-                # Create enhanced prompt with text length info
-                text_length = len(text)
-                if text_length > 8000:  # Truncate very long text
-                    text = text[:8000] + "...[text truncated]"
-                    logger.info(f"Text truncated from {text_length} to {len(text)} chars")
-                
-                # Generate response with timeout
-                resp = self.llm_client.generate_content([CV_EXTRACTION_PROMPT, text])
+                # Chờ token của bucket dùng chung rồi mới gọi LLM
+                _RATE_BUCKET.acquire()
+                resp = self.llm_client.generate_content([CV_EXTRACTION_PROMPT, prompt_text])
                 
                 if not resp or not resp.strip():
                     raise ValueError(f"Empty response from LLM on attempt {attempt}")
@@ -153,6 +676,9 @@ class CVProcessor:
                 
                 if json_data:
                     logger.info(f"✅ LLM extraction successful on attempt {attempt}")
+                    # Chỉ cache khi LLM trả về JSON hợp lệ (không cache kết quả regex)
+                    if cache is not None:
+                        cache.set(key, json_data)
                     return json_data
                 else:
                     raise ValueError(f"No valid JSON found in LLM response on attempt {attempt}")
@@ -164,8 +690,12 @@ class CVProcessor:
                 error_msg = str(e).lower()
                 if any(code in error_msg for code in ("quota", "429", "resource_exhausted", "rate limit")):
                     if attempt < max_retries:
-                        delay = base_delay * (2 ** attempt)  # Exponential backoff
-                        logger.warning(f"Quota/rate limit hit, retrying in {delay} seconds...")
+                        delay = _backoff_delay(attempt, _retry_after_seconds(e))
+                        if total_wait + delay > MAX_TOTAL_WAIT:
+                            logger.error("Quota/rate limit: vượt tổng thời gian chờ, dùng regex fallback.")
+                            return self._fallback_regex(text)
+                        total_wait += delay
+                        logger.warning(f"Quota/rate limit hit, retrying in {delay:.1f} seconds...")
                         time.sleep(delay)
                         continue
                 
@@ -176,49 +706,137 @@ class CVProcessor:
         # Fallback to regex if all attempts fail
         return self._fallback_regex(text)
 
+    def extract_info_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        Trích xuất nhiều CV với một request LLM (JSON array theo thứ tự CV).
+        CV đã có trong cache không được gửi lại; nếu phản hồi không hợp lệ
+        (không phải array đúng số phần tử) thì quay về gọi từng CV.
+        """
+        results: List[Dict] = [{} for _ in texts]
+        cache = self._get_llm_cache()
+        model = str(getattr(self.llm_client, "model", ""))
+        pending = []  # (vị trí, text, khóa cache) của các CV cần gọi LLM
+        for idx, text in enumerate(texts):
+            if not text.strip():
+                continue
+            info = self._regex_if_complete(text)
+            if info is not None:
+                results[idx] = info
+                continue
+            key = cache_key(CV_EXTRACTION_PROMPT, text, model)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                results[idx] = cached
+            else:
+                pending.append((idx, text, key))
+
+        if len(pending) > 1:
+            infos = self._llm_batch_call([text for _, text, _ in pending])
+            if infos is not None:
+                for (idx, _, key), info in zip(pending, infos):
+                    results[idx] = info
+                    if cache is not None:
+                        cache.set(key, info)
+                return results
+            logger.warning("Batch LLM không hợp lệ, xử lý lại từng CV")
+        for idx, text, _ in pending:
+            results[idx] = self.extract_info_with_llm(text)
+        return results
+
+    def _llm_batch_call(self, texts: List[str]) -> Optional[List[Dict]]:
+        """Gửi nhiều CV trong một request; trả về list dict hoặc None nếu lỗi."""
+        body = "\n\n".join(
+            f"=== CV {n} ===\n{_prune_text_for_llm(text)}" for n, text in enumerate(texts, start=1)
+        )
+        try:
+            _RATE_BUCKET.acquire()
+            resp = self.llm_client.generate_content([CV_BATCH_EXTRACTION_PROMPT, body])
+            array = _first_json_object(resp or "", "[")
+            data = _json_loads(array) if array is not None else None
+        except Exception as e:
+            logger.warning(f"❌ Batch LLM thất bại: {e}")
+            return None
+        if not isinstance(data, list) or len(data) != len(texts):
+            return None
+        if not all(isinstance(item, dict) for item in data):
+            return None
+        logger.info(f"✅ Batch LLM trích xuất {len(texts)} CV trong một request")
+        return data
+
+    async def aextract_info_with_llm(self, text: str) -> Dict:
+        """
+        Phiên bản async của extract_info_with_llm cho caller chạy trong event loop.
+        LLM client là đồng bộ nên lời gọi chạy trong thread, không chặn event loop.
+        """
+        return await asyncio.to_thread(self.extract_info_with_llm, text)
+
+    async def aextract_many(self, texts: List[str], limit: Optional[int] = None) -> List[Dict]:
+        """
+        Trích xuất nhiều CV đồng thời, tối đa ``limit`` (mặc định max_workers)
+        lời gọi LLM cùng lúc; kết quả giữ nguyên thứ tự ``texts``.
+        """
+        sem = asyncio.Semaphore(limit or self.max_workers)
+
+        async def _one(text: str) -> Dict:
+            async with sem:
+                return await self.aextract_info_with_llm(text)
+
+        return list(await asyncio.gather(*(_one(t) for t in texts)))
+
     def _extract_json_from_response(self, response: str) -> Optional[Dict]:
         """Extract JSON from LLM response with multiple patterns"""
         try:
-            # Pattern 1: JSON in code blocks
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(1))
-            
-            # Pattern 2: Direct JSON
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
-            
-            # Pattern 3: Try to parse entire response as JSON
-            return json.loads(response.strip())
-            
+            # Object JSON đầu tiên (ưu tiên khối ```json```), tìm bằng quét đếm ngoặc
+            candidate = _first_json_object(response)
+            if candidate is not None:
+                return _json_loads(candidate)
+
+            # Không thấy object: thử parse toàn bộ phản hồi
+            return _json_loads(response.strip())
+
         except json.JSONDecodeError as e:
-            logger.warning(f"JSON parsing failed: {e}")
-            return None
+            # Object đầu tiên không hợp lệ (vd. "{ghi chú}" trước JSON thật)
+            data = _raw_decode_first_dict(response)
+            if data is None:
+                logger.warning(f"JSON parsing failed: {e}")
+            return data
         except Exception as e:
             logger.error(f"Unexpected error in JSON extraction: {e}")
             return None
 
+    def _regex_if_complete(self, text: str) -> Optional[Dict]:
+        """Trả về kết quả regex nếu đủ tin cậy để không cần gọi LLM, ngược lại None."""
+        info = self._fallback_regex(text)
+        if len(text.strip()) < LLM_MIN_TEXT_CHARS:
+            return info
+        filled = sum(1 for v in info.values() if v)
+        if filled / len(info) < REGEX_SKIP_RATIO:
+            return None
+        if not _STRICT_EMAIL_RX.fullmatch(info["email"]):
+            return None
+        return info
+
     def _fallback_regex(self, text: str) -> Dict:
         """
         Dùng regex đơn giản để trích xuất các trường: tên, tuổi, email, điện thoại, học vấn, kinh nghiệm, địa chỉ, kỹ năng
         Trả về dict với các key tương ứng
         """
-        patterns = {
-            "ten": r"(?:(?:Họ tên|Tên)[:\-\s]+)([^\n]+)",
-            "tuoi": r"(?:(?:Tuổi|Age)[:\-\s]+)(\d{1,3})",
-            "email": r"([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)",
-            "dien_thoai": r"(\+?\d[\d\-\s]{7,}\d)",
-            "vi_tri": r"(?:(?:Vị trí|Position)[:\-\s]+)([^\n]+)",
-            "hoc_van": r"(?:(?:Học vấn|Education)[:\-\s]+)([^\n]+)",
-            "kinh_nghiem": r"(?:(?:Kinh nghiệm|Experience)[:\-\s]+)([^\n]+)",
-            "dia_chi": r"(?:(?:Địa chỉ|Address)[:\-\s]+)([^\n]+)",
-            "ky_nang": r"(?:(?:Kỹ năng|Skills?)[:\-\s]+)([^\n]+)",
-        }
-        info: Dict[str, str] = {}
-        for k, p in patterns.items():
-            m = re.search(p, text, re.IGNORECASE)
-            info[k] = m.group(1).strip() if m else ""
+        info: Dict[str, str] = dict.fromkeys((k for k, _ in _FALLBACK_PATTERNS), "")
+        missing = len(info)
+        for m in _FALLBACK_RX.finditer(text):
+            k = m.lastgroup
+            if not info[k]:
+                info[k] = m.group(k).strip()
+                if info[k]:
+                    missing -= 1
+                    if not missing:
+                        # Đủ mọi trường: không cần quét phần còn lại của text
+                        return info
+        for k, pat in _FALLBACK_PATTERNS:
+            if not info[k]:
+                m = pat.search(text)
+                if m:
+                    info[k] = m.group(1).strip()
         return info
 
     def process(
@@ -242,7 +860,6 @@ class CVProcessor:
                 "before": before,
                 "unseen_only": unseen,
             }
-            import inspect
             sig = inspect.signature(self.fetcher.fetch_cv_attachments)
             if "ignore_last_uid" in sig.parameters:
                 fetch_kwargs["ignore_last_uid"] = ignore_last_uid
@@ -258,11 +875,13 @@ class CVProcessor:
             sent_map.update(dict(getattr(self.fetcher, "last_fetch_info", [])))
         if not files:
             logger.info("🔍 dò thư mục attachments...")
-            files = [
-                os.path.join(ATTACHMENT_DIR, f)
-                for f in os.listdir(ATTACHMENT_DIR)
-                if f.lower().endswith((".pdf", ".docx"))
-            ]
+            # scandir trả về DirEntry có sẵn đường dẫn và loại file (không stat thêm)
+            with os.scandir(ATTACHMENT_DIR) as it:
+                files = [
+                    entry.path
+                    for entry in it
+                    if entry.name.lower().endswith((".pdf", ".docx")) and entry.is_file()
+                ]
 
         if from_time or to_time:
             def _in_range(p: str) -> bool:
@@ -289,62 +908,99 @@ class CVProcessor:
             logger.info("ℹ️ Không có file CV nào trong thư mục.")
             return pd.DataFrame()  # trả về DataFrame rỗng nếu không có file
 
-        rows: List[Dict[str, str]] = []
-        for idx, path in enumerate(files):
-            txt = self.extract_text(path)  # đọc text file
-            info = self.extract_info_with_llm(txt) or {}
-            # gom thông tin vào dict
-            sent_time = sent_map.get(path, "")
-            sent_time = sent_time if sent_time is not None else ""
-            rows.append({
-                "Thời gian nhận": sent_time,
-                "Nguồn": os.path.basename(path),
-                "Vị trí": info.get("vi_tri", ""),
-                "Họ tên": info.get("ten", ""),
-                "Tuổi": info.get("tuoi", ""),
-                "Email": info.get("email", ""),
-                "Điện thoại": info.get("dien_thoai", ""),
-                "Địa chỉ": info.get("dia_chi", ""),
-                "Học vấn": info.get("hoc_van", ""),
-                "Kinh nghiệm": info.get("kinh_nghiem", ""),
-                "Kỹ năng": info.get("ky_nang", ""),
-            })
-
-            if progress_callback:
-                percentage = ((idx + 1) / total_files) * 100 if total_files > 0 else 100
-                progress_callback(idx + 1, f"Đang xử lý {os.path.basename(path)} ({percentage:.1f}%)")
-
-        df = pd.DataFrame(rows, columns=[
-            "Thời gian nhận",
-            "Nguồn",
-            "Vị trí",
-            "Họ tên",
-            "Tuổi",
-            "Email",
-            "Điện thoại",
-            "Địa chỉ",
-            "Học vấn",
-            "Kinh nghiệm",
-            "Kỹ năng",
-        ])  # tạo DataFrame từ list dict với thứ tự cột cố định
-        if hasattr(df, "sort_values"):
-            df.sort_values("Thời gian nhận", ascending=False, inplace=True)
-            df["Thời gian nhận"] = df["Thời gian nhận"].apply(format_sent_time_display)
-        else:
-            df.sort(key=lambda r: r.get("Thời gian nhận", ""), reverse=True)
-            for row in df:
-                row["Thời gian nhận"] = format_sent_time_display(row.get("Thời gian nhận", ""))
+        # Bước 1: lấy text từ cache, parse các file còn lại trên nhiều tiến trình
+        texts = self._extract_texts_parallel(files)
+
+        # Bước 2: gọi LLM song song: thời gian chờ mạng của các CV chồng lên nhau.
+        # Mỗi lượt xử lý llm_batch_size CV (gộp vào một request nếu > 1).
+        # Kết quả giữ nguyên thứ tự file, progress_callback chạy ở luồng gọi.
+        # Lưu theo cột (mỗi cột một list cấp phát sẵn) thay vì list dict theo dòng
+        columns: Dict[str, List[str]] = {col: [""] * total_files for col in RESULT_COLUMNS}
+        size = self.llm_batch_size
+        batches = [list(range(i, min(i + size, total_files))) for i in range(0, total_files, size)]
+        workers = min(self.max_workers, len(batches))
+        done = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    self._process_batch,
+                    [files[i] for i in batch],
+                    sent_map,
+                    [texts[i] for i in batch] if texts is not None else None,
+                ): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                for idx, row in zip(futures[future], future.result()):
+                    for col, value in zip(RESULT_COLUMNS, row):
+                        columns[col][idx] = value
+                    done += 1
+
+                    if progress_callback:
+                        percentage = (done / total_files) * 100 if total_files > 0 else 100
+                        progress_callback(done, f"Đang xử lý {os.path.basename(files[idx])} ({percentage:.1f}%)")
+
+        # Sắp xếp theo thời gian nhận (mới nhất trước) rồi định dạng để hiển thị
+        order = sorted(range(total_files), key=columns["Thời gian nhận"].__getitem__, reverse=True)
+        columns = {col: [values[i] for i in order] for col, values in columns.items()}
+        columns["Thời gian nhận"] = [format_sent_time_display(ts) for ts in columns["Thời gian nhận"]]
+
+        # tạo DataFrame trực tiếp từ các cột với thứ tự cột cố định; copy=False
+        # để mỗi cột chỉ được chuyển list -> mảng một lần, không gộp thêm thành
+        # khối 2 chiều (pandas 2.x gộp các cột object khi copy=True)
+        df = pd.DataFrame(columns, columns=list(RESULT_COLUMNS), copy=False)
 
         if progress_callback:
             progress_callback(total_files, f"✅ Hoàn tất xử lý {total_files} file")
 
         return df  # trả về kết quả
 
+    def _process_batch(
+        self, paths: List[str], sent_map: Dict[str, str], texts: Optional[List[Optional[str]]] = None
+    ) -> List[Tuple[str, ...]]:
+        """Xử lý một nhóm file: từng file nếu nhóm có 1 file, ngược lại gộp một request LLM"""
+        if len(paths) == 1:
+            return [self._process_file(paths[0], sent_map, texts[0] if texts is not None else None)]
+        if texts is None:
+            texts = [None] * len(paths)
+        texts = [self.extract_text(path) if text is None else text for path, text in zip(paths, texts)]
+        infos = self.extract_info_batch(texts)
+        return [
+            _build_row(sent_map.get(path) or "", os.path.basename(path), info or {})
+            for path, info in zip(paths, infos)
+        ]
+
+    def _process_file(
+        self, path: str, sent_map: Dict[str, str], txt: Optional[str] = None
+    ) -> Tuple[str, ...]:
+        """Đọc một file CV (nếu chưa có ``txt``), trích xuất info và trả về một dòng kết quả"""
+        if txt is None:
+            txt = self.extract_text(path)  # đọc text file
+        info = self.extract_info_with_llm(txt) or {}
+        # gom thông tin vào dict
+        sent_time = sent_map.get(path, "")
+        sent_time = sent_time if sent_time is not None else ""
+        return _build_row(sent_time, os.path.basename(path), info)
+
     def save_to_csv(self, df: pd.DataFrame, output: str = OUTPUT_CSV):
         """
         Ghi đè file CSV mỗi lần chạy; nếu muốn append, có thể chuyển mode và header
         """
-        df.to_csv(output, index=False, encoding="utf-8-sig")  # lưu file
+        if pacsv is not None:
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                # Ghi BOM trước để Excel nhận đúng UTF-8 (tương đương utf-8-sig)
+                with open(output, "wb", buffering=CSV_WRITE_BUFFER) as fh:
+                    fh.write(b"\xef\xbb\xbf")
+                    pacsv.write_csv(table, fh, write_options=pacsv.WriteOptions(include_header=True))
+                logger.info(f"✅ Đã lưu {len(df)} hồ sơ vào {output}")
+                return
+            except Exception as e:
+                # Cột kiểu hỗn hợp pyarrow không chuyển được -> dùng writer của pandas
+                logger.debug("pyarrow không ghi được CSV, dùng pandas: %s", e)
+        # Ghi qua một file mở với bộ đệm 1 MiB: một lần open/close cho cả bảng
+        with open(output, "w", buffering=CSV_WRITE_BUFFER, newline="", encoding="utf-8-sig") as fh:
+            df.to_csv(fh, index=False, lineterminator="\n")  # lưu file
         logger.info(f"✅ Đã lưu {len(df)} hồ sơ vào {output}")
 
     def save_to_excel(self, df: pd.DataFrame, output: str = OUTPUT_EXCEL) -> None:
@@ -3,14 +3,17 @@
 import requests  # thư viện HTTP để tương tác với API OpenRouter
 import streamlit as st  # lấy thông tin session_state trong Streamlit
 import logging  # ghi log xử lý
-from typing import List  # định nghĩa kiểu cho danh sách
+from functools import lru_cache  # ghi nhớ kết quả kiểm tra API key
+from typing import List, Optional  # định nghĩa kiểu cho danh sách
 
 from .config import LLM_CONFIG, OPENROUTER_BASE_URL  # cấu hình chung LLM và URL
+from .llm_client import format_openrouter_messages, make_http_session  # dùng chung với LLMClient
 
 # --- Thiết lập logger cho module dynamic_llm_client ---
 logger = logging.getLogger(__name__)  # lấy logger theo tên module
 logger.setLevel(logging.INFO)  # mức log tối thiểu INFO
-logger.addHandler(logging.StreamHandler())  # xuất log ra console
+if not logger.handlers:                    # tránh nhân đôi handler khi import lại
+    logger.addHandler(logging.StreamHandler())  # xuất log ra console
 
 
 def _streamlit_ctx_exists() -> bool:
@@ -33,6 +36,34 @@ def _streamlit_ctx_exists() -> bool:
         return False
 
 
+@lru_cache(maxsize=32)
+def _validate_google_key(api_key: str) -> Optional[int]:
+    """Kiểm tra Google API key một lần cho mỗi key, trả về số models hoặc None."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    try:
+        return len(list(genai.list_models()))
+    except Exception as e:
+        logger.warning(f"Could not validate Google API key: {e}")
+        return None
+
+
+@lru_cache(maxsize=32)
+def _validate_openrouter_key(api_key: str) -> Optional[int]:
+    """Kiểm tra OpenRouter API key một lần cho mỗi key, trả về HTTP status hoặc None."""
+    try:
+        response = requests.get(
+            "https://openrouter.ai/api/v1/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=10,
+        )
+        return response.status_code
+    except Exception as e:
+        logger.warning(f"Could not validate OpenRouter API key: {e}")
+        return None
+
+
 class DynamicLLMClient:
     """
     Client LLM động cho giao diện Streamlit.
@@ -65,6 +96,7 @@ class DynamicLLMClient:
         else:
             session_key = None
         self.api_key = api_key or session_key or LLM_CONFIG.get("api_key", "")
+        self.session = make_http_session()  # tái sử dụng kết nối HTTP giữa các lời gọi
         # Thiết lập client theo provider đã chọn
         self._setup()
 
@@ -83,14 +115,10 @@ class DynamicLLMClient:
                 # Configure with retry and timeout
                 genai.configure(api_key=self.api_key)
 
-                # Validate API key by listing models
-                try:
-                    models = list(genai.list_models())
-                    logger.info(
-                        f"Google API key validated. Available models: {len(models)}"
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not validate Google API key: {e}")
+                # Validate API key by listing models (chỉ gọi mạng lần đầu cho mỗi key)
+                count = _validate_google_key(self.api_key)
+                if count is not None:
+                    logger.info(f"Google API key validated. Available models: {count}")
 
                 # Create client with safety settings
                 self.client = genai.GenerativeModel(
@@ -108,21 +136,14 @@ class DynamicLLMClient:
                 if not self.api_key:
                     raise ValueError("OpenRouter API key không có sẵn")
 
-                # Validate API key
-                try:
-                    response = requests.get(
-                        "https://openrouter.ai/api/v1/models",
-                        headers={"Authorization": f"Bearer {self.api_key}"},
-                        timeout=10,
+                # Validate API key (chỉ gọi mạng lần đầu cho mỗi key)
+                status = _validate_openrouter_key(self.api_key)
+                if status == 200:
+                    logger.info("OpenRouter API key validated successfully")
+                elif status is not None:
+                    logger.warning(
+                        f"OpenRouter API key validation returned status: {status}"
                     )
-                    if response.status_code == 200:
-                        logger.info("OpenRouter API key validated successfully")
-                    else:
-                        logger.warning(
-                            f"OpenRouter API key validation returned status: {response.status_code}"
-                        )
-                except Exception as e:
-                    logger.warning(f"Could not validate OpenRouter API key: {e}")
 
                 self.client = None  # Will use direct HTTP requests
 
@@ -167,10 +188,7 @@ class DynamicLLMClient:
         - Trả về nội dung text từ response JSON
         """
         # Định dạng messages cho OpenRouter: role "system" cho phần đầu, "user" cho các phần sau
-        formatted = [
-            {"role": "system" if i == 0 else "user", "content": m}
-            for i, m in enumerate(messages)
-        ]
+        formatted = format_openrouter_messages(self.model, messages)
 
         # Thiết lập payload JSON theo API spec của OpenRouter
         payload = {
@@ -189,7 +207,7 @@ class DynamicLLMClient:
         try:
             # Gửi POST request, timeout 30s
             url = f"{OPENROUTER_BASE_URL}/chat/completions"
-            res = requests.post(url, json=payload, headers=headers, timeout=30)
+            res = self.session.post(url, json=payload, headers=headers, timeout=30)
             # Kiểm tra Unauthorized
             if res.status_code == 401:
                 logger.error("OpenRouter API Unauthorized: check API key")
@@ -203,3 +221,6 @@ class DynamicLLMClient:
         except Exception as e:
             logger.error(f"❌ Lỗi OpenRouter API: {e}")  # log lỗi nếu có
             raise  # propagate the exception to the caller
+
+
+__all__ = ["DynamicLLMClient"]
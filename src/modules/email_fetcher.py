@@ -1,19 +1,27 @@
 # modules/email_fetcher.py
 
 import imaplib                   # thư viện IMAP4 để kết nối và tương tác với server email
+import atexit                    # logout các kết nối IMAP trong pool khi thoát
+import hashlib                   # khóa pool theo mã băm mật khẩu
+import threading                 # khóa pool kết nối dùng chung giữa các luồng
+import base64                    # giải mã phần đính kèm base64
+import quopri                    # giải mã quoted-printable
 import email                     # thư viện xử lý định dạng email (parser)
+import io                        # đọc dữ liệu đính kèm theo dòng khi giải mã
 from email.header import decode_header  # decode header RFC2047
 import os                        # thao tác hệ thống file và đường dẫn
 import re                        # xử lý biểu thức chính quy
 import time                      # sleep and delay functions
 import logging                   # ghi log
 from datetime import date, datetime, timezone, timedelta  # dùng để lọc email và tạo timestamp
-from typing import List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from email.utils import parsedate_to_datetime
 
-from .config import ATTACHMENT_DIR, EMAIL_UNSEEN_ONLY
+from .config import ATTACHMENT_DIR, EMAIL_KEYWORD_SEARCH, EMAIL_UNSEEN_ONLY
 from .sent_time_store import record_sent_time
 from .uid_store import load_last_uid, save_last_uid
+from .seen_store import SeenStore, content_hasher
+from .imap_parser import BodyPart, iter_parts, parse_fetch_response
 
 # --- Logger của module (tránh nhân đôi handler khi tạo nhiều instance) ---
 logger = logging.getLogger(__name__)
@@ -41,6 +49,168 @@ def _validate_config():
     if missing:
         raise ValueError(f"Missing email configuration: {', '.join(missing)}")
 
+
+# Phần mở rộng của file đính kèm được coi là CV
+CV_EXTENSIONS = ('.pdf', '.docx')
+# Tên file trông rõ ràng là CV (ưu tiên tải kể cả khi không khớp từ khóa)
+_OBVIOUS_CV_RX = re.compile(r"(cv|resume|curriculum|vitae)", re.IGNORECASE)
+# Tổng dung lượng (theo BODYSTRUCTURE) tối đa của các phần đính kèm tải trong
+# một lệnh FETCH gộp nhiều email; giới hạn bộ nhớ giữ phản hồi
+PARTS_FETCH_MAX_BYTES = 32 << 20
+
+
+# --- Pool kết nối IMAP đã đăng nhập, dùng lại giữa các EmailFetcher ---
+# TLS handshake + LOGIN tốn vài trăm ms mỗi lần; Streamlit/Gradio tạo fetcher
+# mới ở mỗi lần chạy nên kết nối được trả về pool (close()) thay vì bỏ đi.
+# Kết nối rảnh quá IMAP_IDLE_TTL giây bị bỏ (server thường cắt sau 30 phút).
+IMAP_IDLE_TTL = 1500.0
+_POOL: Dict[Tuple[str, int, str, str], Tuple[imaplib.IMAP4, float]] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _logout_quietly(conn) -> None:
+    try:
+        conn.logout()
+    except Exception:
+        pass
+
+
+@atexit.register
+def _close_pool() -> None:
+    """Logout mọi kết nối còn trong pool."""
+    with _POOL_LOCK:
+        conns = [conn for conn, _ in _POOL.values()]
+        _POOL.clear()
+    for conn in conns:
+        _logout_quietly(conn)
+
+
+def _decode_mime_words(value: str) -> str:
+    """Giải mã header RFC 2047 (=?utf-8?b?...?=) thành chuỗi Unicode."""
+    try:
+        return ''.join(
+            p.decode(enc or 'utf-8', errors='ignore') if isinstance(p, bytes) else p
+            for p, enc in decode_header(value)
+        )
+    except Exception:
+        return value
+
+
+def _decode_transfer(data: bytes, encoding: str) -> bytes:
+    """Giải mã Content-Transfer-Encoding của một phần MIME tải qua BODY[...]."""
+    if encoding == 'base64':
+        return b''.join(_iter_b64_decoded(data))
+    if encoding == 'quoted-printable':
+        return quopri.decodestring(data)
+    return data
+
+
+# Kích thước khối base64 giải mã mỗi lần khi ghi đính kèm ra đĩa
+DECODE_CHUNK_SIZE = 1 << 16
+
+# Ký tự ngoài bảng chữ base64 (xuống dòng, khoảng trắng, '=' đệm) bị bỏ qua khi giải mã
+_B64_JUNK_RX = re.compile(rb'[^A-Za-z0-9+/]')
+
+
+def _iter_b64_decoded(raw: bytes):
+    """
+    Giải mã base64 theo từng khối thay vì cả file một lần.
+    Dễ dãi như ``get_payload(decode=True)``: bỏ ký tự lạ và tự thêm '=' còn
+    thiếu ở khối cuối (nhiều trình gửi mail cắt mất phần đệm).
+    """
+    buf = b''
+    for line in io.BytesIO(raw):
+        buf += _B64_JUNK_RX.sub(b'', line)
+        if len(buf) >= DECODE_CHUNK_SIZE:
+            cut = len(buf) - len(buf) % 4
+            yield base64.b64decode(buf[:cut])
+            buf = buf[cut:]
+    if len(buf) % 4 == 1:  # một ký tự lẻ không mang đủ 8 bit dữ liệu
+        buf = buf[:-1]
+    if buf:
+        yield base64.b64decode(buf + b'=' * (-len(buf) % 4))
+
+
+class _HashingWriter:
+    """File-like ghi ra file đồng thời cập nhật mã băm nội dung."""
+
+    def __init__(self, fh, hasher):
+        self._fh = fh
+        self._hasher = hasher
+
+    def write(self, data: bytes) -> int:
+        self._hasher.update(data)
+        return self._fh.write(data)
+
+
+def _subject_from_header(msg_data) -> str:
+    """Lấy Subject từ kết quả FETCH BODY.PEEK[HEADER.FIELDS (SUBJECT)]."""
+    for item in msg_data or []:
+        if isinstance(item, tuple) and isinstance(item[1], (bytes, bytearray)):
+            return _decode_mime_words(email.message_from_bytes(item[1]).get('Subject', ''))
+    return ''
+
+
+_UID_RX = re.compile(rb'\bUID (\d+)')
+_SEQ_RX = re.compile(rb'(\d+) \(')
+
+
+def _subjects_by_id(msg_data) -> Dict[str, str]:
+    """
+    ``{id: Subject}`` từ một lệnh FETCH header cho nhiều email (sequence set).
+    id là UID nếu phản hồi có ``UID n``, ngược lại là số thứ tự đầu dòng.
+    """
+    subjects: Dict[str, str] = {}
+    for item in msg_data or []:
+        if isinstance(item, tuple) and isinstance(item[1], (bytes, bytearray)):
+            head = item[0] or b''
+            m = _UID_RX.search(head) or _SEQ_RX.match(head)
+            if m:
+                subjects[m.group(1).decode()] = _subject_from_header([item])
+    return subjects
+
+
+def _keyword_search_key(keywords: List[str]) -> Optional[str]:
+    """
+    Một search-key IMAP khớp email có bất kỳ từ khóa nào trong Subject hoặc Body:
+    ``(OR (OR SUBJECT "CV" BODY "CV") (OR SUBJECT "Resume" BODY "Resume"))``.
+    OR của IMAP là toán tử hai ngôi nên được lồng nhau. Trả về None nếu có từ
+    khóa không phải ASCII (cần literal, không gửi được như chuỗi thường).
+    """
+    terms = []
+    for kw in keywords:
+        if not kw or not kw.isascii():
+            return None
+        quoted = '"' + kw.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        terms.append(f'(OR SUBJECT {quoted} BODY {quoted})')
+    if not terms:
+        return None
+    expr = terms[0]
+    for term in terms[1:]:
+        expr = f'(OR {expr} {term})'
+    return expr
+
+
+def _parse_sent_time(internal_date: Optional[str], date_hdr: Optional[str] = None) -> str:
+    """Thời gian gửi dạng ISO, ưu tiên INTERNALDATE rồi tới header Date."""
+    if internal_date:
+        try:
+            return parsedate_to_datetime(internal_date).isoformat()
+        except Exception:
+            try:
+                tup = imaplib.Internaldate2tuple(f'INTERNALDATE "{internal_date}"'.encode())
+                if tup:
+                    return datetime.fromtimestamp(time.mktime(tup), tz=timezone.utc).isoformat()
+            except Exception:
+                pass
+    if date_hdr:
+        try:
+            return parsedate_to_datetime(date_hdr).isoformat()
+        except Exception:
+            pass
+    return ""
+
+
 class EmailFetcher:
     """
     Lớp để kết nối IMAP, tìm email chứa CV/Resume và tải file đính kèm về máy.
@@ -65,10 +235,49 @@ class EmailFetcher:
         self.password = password or EMAIL_PASS
         self.mail = None
         self.last_fetch_info: List[Tuple[str, str | None]] = []
+        # Tập mã băm nội dung đã tải (mở khi cần)
+        self._seen: Optional[SeenStore] = None
 
         # Sử dụng logger chung của module (không thêm handler mới)
         self.logger = logger
 
+    def _pool_key(self) -> Tuple[str, int, str, str]:
+        # Mật khẩu (dạng băm) nằm trong khóa: đổi mật khẩu thì không dùng lại phiên cũ
+        return self.host, self.port, self.user, hashlib.sha256(self.password.encode()).hexdigest()
+
+    def _reuse_pooled(self) -> bool:
+        """Lấy kết nối còn sống từ pool (kiểm tra bằng NOOP). True nếu dùng được."""
+        with _POOL_LOCK:
+            entry = _POOL.pop(self._pool_key(), None)
+        if entry is None:
+            return False
+        conn, last_use = entry
+        if time.monotonic() - last_use < IMAP_IDLE_TTL:
+            try:
+                if conn.noop()[0] == 'OK':
+                    self.mail = conn
+                    self.logger.info(f"✅ Reusing IMAP connection: {self.user}@{self.host}")
+                    return True
+            except (imaplib.IMAP4.error, OSError) as e:
+                self.logger.debug(f"Pooled IMAP connection is stale: {e}")
+        _logout_quietly(conn)
+        return False
+
+    def close(self) -> None:
+        """
+        Trả kết nối về pool để lần connect() sau (cùng host/user) dùng lại;
+        không logout. Kết nối chỉ được một fetcher dùng tại một thời điểm.
+        """
+        conn, self.mail = self.mail, None
+        if conn is None:
+            return
+        with _POOL_LOCK:
+            key = self._pool_key()
+            if key not in _POOL:
+                _POOL[key] = (conn, time.monotonic())
+                return
+        _logout_quietly(conn)  # pool đã có kết nối cho tài khoản này
+
     def connect(self) -> None:
         """
         Enhanced IMAP connection with better error handling and validation
@@ -81,6 +290,9 @@ class EmailFetcher:
             if not isinstance(self.port, int) or not (1 <= self.port <= 65535):
                 raise ValueError(f"Invalid port number: {self.port}")
             
+            if self._reuse_pooled():
+                return
+
             self.logger.info(f"Connecting to IMAP server: {self.host}:{self.port}")
             
             # Establish SSL connection with timeout
@@ -127,6 +339,293 @@ class EmailFetcher:
         except Exception as e:
             self.logger.error(f"[ERR] Failed to reset UID store: {e}")
 
+    def _seen_store(self) -> Optional[SeenStore]:
+        """Open the attachment seen-set lazily; ``None`` if it is unavailable."""
+        if self._seen is None:
+            try:
+                self._seen = SeenStore(os.path.join(ATTACHMENT_DIR, ".seen.sqlite"))
+            except Exception as e:
+                self.logger.warning(f"Could not open seen store: {e}")
+        return self._seen
+
+    def _find_duplicate(self, digest: str) -> Optional[str]:
+        """Return the existing path of an identical attachment, if still on disk."""
+        store = self._seen_store()
+        if store is None:
+            return None
+        try:
+            path = store.lookup(digest)
+        except Exception as e:
+            self.logger.warning(f"Seen store lookup failed: {e}")
+            return None
+        return path if path and os.path.exists(path) else None
+
+    def _remember(self, digest: str, path: str) -> None:
+        """Record the content hash of a newly saved attachment."""
+        store = self._seen_store()
+        if store is None:
+            return
+        try:
+            store.add(digest, path)
+        except Exception as e:
+            self.logger.warning(f"Could not record {path} in seen store: {e}")
+
+    def _fetch(self, id_bytes: bytes, query: str):
+        """FETCH theo UID nếu server hỗ trợ, ngược lại theo số thứ tự."""
+        if hasattr(self.mail, 'uid'):
+            return self.mail.uid('fetch', id_bytes, query)
+        return self.mail.fetch(id_bytes, query)
+
+    def _attachment_path(self, filename: str) -> str:
+        """Đường dẫn lưu file đính kèm (tên file đã loại ký tự đặc biệt)."""
+        name, ext = os.path.splitext(filename)
+        safe_name = re.sub(r'[^\w\-\_ ]', '_', name)
+        return os.path.join(ATTACHMENT_DIR, safe_name + ext)
+
+    def _store_attachment(
+        self, path: str, raw: bytes, sent_time: str, note: str, encoding: str = ''
+    ) -> bool:
+        """
+        Ghi file đính kèm ra đĩa nếu chưa có file cùng nội dung.
+        ``raw`` được giải mã theo ``encoding`` (base64/quoted-printable) từng khối
+        và ghi thẳng vào file tạm trong khi tính mã băm, không giữ bản giải mã
+        đầy đủ trong bộ nhớ. Trả về True nếu đã lưu file mới.
+        """
+        tmp_path = f"{path}.part"
+        hasher = content_hasher()
+        try:
+            with open(tmp_path, "wb") as f:
+                out = _HashingWriter(f, hasher)
+                if encoding == 'base64':
+                    for chunk in _iter_b64_decoded(raw):
+                        out.write(chunk)
+                elif encoding == 'quoted-printable':
+                    quopri.decode(io.BytesIO(raw), out)
+                else:
+                    out.write(raw)
+        except Exception as e:
+            self.logger.error(f"[ERROR] Failed to save {os.path.basename(path)}: {e}")
+            self._discard(tmp_path)
+            return False
+
+        # Bỏ qua file trùng nội dung với file đã tải (tránh gọi LLM lại)
+        digest = hasher.hexdigest()
+        duplicate = self._find_duplicate(digest)
+        if duplicate:
+            self.logger.info(f"[INFO] Trùng nội dung với {duplicate}, bỏ qua {os.path.basename(path)}")
+            self._discard(tmp_path)
+            return False
+
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.error(f"[ERROR] Failed to save {os.path.basename(path)}: {e}")
+            self._discard(tmp_path)
+            return False
+        self._remember(digest, path)
+        self.last_fetch_info.append((path, sent_time))
+        try:
+            record_sent_time(path, sent_time)
+        except Exception as e:
+            self.logger.warning(f"Could not record sent time for {path}: {e}")
+        self.logger.info(f"[OK] Lưu đính kèm mới: {path}{note}")
+        return True
+
+    def _discard(self, path: str) -> None:
+        """Xóa file tạm, bỏ qua lỗi."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _fetch_structures(self, id_set: bytes) -> Dict[str, dict]:
+        """
+        Một lệnh FETCH BODYSTRUCTURE + INTERNALDATE cho cả đợt email.
+        Trả về ``{id: items}``; dict rỗng nếu server không trả về dữ liệu đọc
+        được (khi đó từng email được tải cả thư như cũ).
+        """
+        try:
+            typ, data = self._fetch(id_set, '(BODYSTRUCTURE INTERNALDATE)')
+            if typ != 'OK':
+                return {}
+            return {
+                str(items.get('UID', num)): items
+                for num, items in parse_fetch_response(data)
+                if 'BODYSTRUCTURE' in items
+            }
+        except Exception as e:
+            self.logger.debug(f"BODYSTRUCTURE not usable for {id_set!r}: {e}")
+            return {}
+
+    def _mark_seen(self, ids: List[str]) -> None:
+        """Đánh dấu \\Seen cho nhiều email bằng một lệnh STORE."""
+        if not ids:
+            return
+        id_set = ','.join(ids)
+        try:
+            if hasattr(self.mail, 'uid'):
+                self.mail.uid('STORE', id_set, '+FLAGS', '\\Seen')
+            else:
+                self.mail.store(id_set, '+FLAGS', '\\Seen')
+        except Exception as e:
+            self.logger.debug(f"Could not mark {id_set} as seen: {e}")
+
+    def _fetch_sections(
+        self, wanted: List[Tuple[str, Tuple[str, ...], int]]
+    ) -> Iterator[Tuple[str, dict]]:
+        """
+        Tải các section ``BODY.PEEK[...]`` cho nhiều email: ``wanted`` là
+        [(id, sections, tổng dung lượng)]. Email có cùng danh sách section
+        (thường gặp: ``[2]``) được gộp vào một lệnh FETCH với sequence set,
+        mỗi lệnh tối đa PARTS_FETCH_MAX_BYTES, nên số round-trip không tăng
+        theo số email. Yield (id, {``BODY[section]``: bytes}) theo từng lệnh
+        (dict rỗng nếu lệnh lỗi) để phản hồi được nhả trước lệnh tiếp theo.
+        """
+        groups: Dict[Tuple[str, ...], List[Tuple[str, int]]] = {}
+        for num_str, sections, size in wanted:
+            if sections:
+                groups.setdefault(sections, []).append((num_str, size))
+
+        for sections, members in groups.items():
+            chunks, chunk, total = [], [], 0
+            for num_str, size in members:
+                if chunk and total + size > PARTS_FETCH_MAX_BYTES:
+                    chunks.append(chunk)
+                    chunk, total = [], 0
+                chunk.append(num_str)
+                total += size
+            chunks.append(chunk)
+
+            query = '(' + ' '.join(f'BODY.PEEK[{s}]' for s in sections) + ')'
+            for chunk in chunks:
+                id_set = ','.join(chunk).encode()
+                try:
+                    typ, data = self._fetch(id_set, query)
+                    responses = (
+                        {str(items.get('UID', num)): items for num, items in parse_fetch_response(data)}
+                        if typ == 'OK' else {}
+                    )
+                    del data
+                except Exception as e:
+                    self.logger.warning(f"[ERROR] Failed to fetch {query} of {id_set!r}: {e}")
+                    responses = {}
+                for num_str in chunk:
+                    yield num_str, responses.pop(num_str, {})
+
+    def _cv_candidates(self, num_str: str, items: dict):
+        """
+        (các phần MIME, [(phần, tên file, có phải CV rõ ràng)] của file PDF/DOCX)
+        theo BODYSTRUCTURE, hoặc None nếu BODYSTRUCTURE không đọc được.
+        """
+        try:
+            parts = list(iter_parts(items['BODYSTRUCTURE']))
+        except Exception as e:
+            self.logger.debug(f"BODYSTRUCTURE not usable for email {num_str}: {e}")
+            return None
+        candidates: List[Tuple[BodyPart, str, bool]] = []
+        for part in parts:
+            filename = _decode_mime_words(part.filename or '')
+            name, ext = os.path.splitext(filename)
+            if ext.lower() in CV_EXTENSIONS:
+                candidates.append((part, filename, bool(_OBVIOUS_CV_RX.search(name))))
+        return parts, candidates
+
+    def _fetch_body_texts(
+        self, structures: Dict[str, dict], subjects: Dict[str, str], keywords: List[str]
+    ) -> Dict[str, str]:
+        """
+        Nội dung text/plain của các email trong đợt cần từ khóa trong nội dung
+        để quyết định (Subject không khớp và có file không rõ là CV).
+        Tải gộp qua _fetch_sections thay vì một lệnh FETCH mỗi email.
+        """
+        wanted, text_parts = [], {}
+        for num_str, items in structures.items():
+            found = self._cv_candidates(num_str, items)
+            if not found or not found[1]:
+                continue
+            parts, candidates = found
+            subject = subjects.get(num_str, '').lower()
+            if any(kw.lower() in subject for kw in keywords) or all(c[2] for c in candidates):
+                continue
+            texts = [p for p in parts if p.content_type == 'text/plain' and not p.filename]
+            text_parts[num_str] = texts
+            wanted.append((num_str, tuple(p.section for p in texts), sum(p.size for p in texts)))
+
+        body_texts = {num_str: '' for num_str in text_parts}
+        for num_str, bodies in self._fetch_sections(wanted):
+            for p in text_parts[num_str]:
+                raw = bodies.get(f'BODY[{p.section}]')
+                if isinstance(raw, (bytes, bytearray)):
+                    charset = p.params.get('charset') or 'utf-8'
+                    body_texts[num_str] += _decode_transfer(bytes(raw), p.encoding).decode(charset, errors='ignore')
+        return body_texts
+
+    def _plan_cv_parts(
+        self, num_str: str, subject: str, keywords: List[str], items: dict, body_text: str = ''
+    ) -> Optional[Tuple[int, List[Tuple[BodyPart, str, bool]], str]]:
+        """
+        Chọn các phần PDF/DOCX cần tải của email dựa trên BODYSTRUCTURE
+        (``items`` của _fetch_structures), không tải toàn bộ thư (ảnh inline,
+        file khác...). ``body_text`` là nội dung text/plain đã tải gộp bởi
+        _fetch_body_texts (rỗng nếu không cần).
+        Trả về (số file CV được chọn, [(phần MIME, path, là CV rõ ràng)] cần
+        tải, thời gian gửi), hoặc None nếu BODYSTRUCTURE không đọc được (khi
+        đó tải cả thư như cũ).
+        """
+        found = self._cv_candidates(num_str, items)
+        if found is None:
+            return None
+        candidates = found[1]
+        if not candidates:
+            self.logger.debug(f"[SKIP] Email {num_str}: No PDF/DOCX attachments")
+            return 0, [], ''
+
+        text = f"{subject}\n{body_text}".lower()
+        keyword_match = any(kw.lower() in text for kw in keywords)
+        selected = [c for c in candidates if c[2] or keyword_match]
+        if not selected:
+            self.logger.debug(f"[SKIP] Email {num_str}: No relevant attachments or keywords")
+            return 0, [], ''
+
+        self.logger.info(f"[PROCESSING] Email {num_str}: {subject[:50]}... ({len(selected)} PDF/DOCX files)")
+        sent_time = _parse_sent_time(items.get('INTERNALDATE'))
+        # Ưu tiên file trông rõ ràng là CV; bỏ qua file đã tồn tại trước khi tải
+        selected.sort(key=lambda c: c[2], reverse=True)
+        to_download = []
+        for part, filename, is_obvious_cv in selected:
+            path = self._attachment_path(filename)
+            if os.path.exists(path):
+                self.logger.info(f"[INFO] Đã tồn tại: {path}")
+                continue
+            to_download.append((part, path, is_obvious_cv))
+        return len(selected), to_download, sent_time
+
+    def _download_planned(
+        self, plans: List[Tuple[str, List[Tuple[BodyPart, str, bool]], str]]
+    ) -> List[str]:
+        """
+        Tải các phần đã chọn của nhiều email (gộp lệnh FETCH qua
+        _fetch_sections). Trả về path đã lưu theo thứ tự ``plans``.
+        """
+        by_id = {num_str: (to_download, sent_time) for num_str, to_download, sent_time in plans}
+        wanted = [
+            (num_str, tuple(p.section for p, _, _ in to_download), sum(p.size for p, _, _ in to_download))
+            for num_str, to_download, _ in plans
+        ]
+        saved: Dict[str, List[str]] = {}
+        for num_str, bodies in self._fetch_sections(wanted):
+            to_download, sent_time = by_id[num_str]
+            for part, path, is_obvious_cv in to_download:
+                # pop: nhả bytes của phần đã ghi trước khi xử lý phần tiếp theo
+                raw = bodies.pop(f'BODY[{part.section}]', None)
+                if not isinstance(raw, (bytes, bytearray)):
+                    self.logger.warning(f"[SKIP] Failed to download attachment: {os.path.basename(path)}")
+                    continue
+                note = " (priority CV)" if is_obvious_cv else " (PDF/DOCX)"
+                if self._store_attachment(path, bytes(raw), sent_time, note, part.encoding):
+                    saved.setdefault(num_str, []).append(path)
+        return [path for num_str, _, _ in plans for path in saved.get(num_str, [])]
+
     def get_last_processed_uid(self) -> Optional[int]:
         """
         Get the UID of the last processed email.
@@ -142,6 +641,7 @@ class EmailFetcher:
         batch_size: int = 100,
         unseen_only: bool = EMAIL_UNSEEN_ONLY,
         ignore_last_uid: bool = False,
+        keyword_search: bool = EMAIL_KEYWORD_SEARCH,
     ) -> List[str]:
         """
         Tìm và tải xuống file đính kèm PDF/DOCX từ các email thoả mãn:
@@ -152,6 +652,8 @@ class EmailFetcher:
         Nếu ``unseen_only`` được bật (mặc định), chỉ tìm trong các email chưa đọc
         để tránh quét lại những thư đã xử lý.
         Nếu ``ignore_last_uid`` được bật, bỏ qua UID đã lưu và xử lý tất cả email.
+        Nếu ``keyword_search`` được bật, server chỉ trả về email có từ khóa trong
+        Subject/Body (một lệnh SEARCH với các OR lồng nhau).
         Thông tin path và thời gian gửi của mỗi file tải được
         sẽ lưu trong ``last_fetch_info``.
         """
@@ -200,9 +702,22 @@ class EmailFetcher:
             if hasattr(self.mail, 'uid'):
                 # Try different search approaches in order of preference
                 search_successful = False
-                
+
+                # Approach 0: lọc từ khóa trên server trong cùng một lệnh SEARCH
+                keyword_key = _keyword_search_key(keywords) if keyword_search else None
+                if keyword_key:
+                    try:
+                        self.logger.info(f"[DEBUG] Attempting UID search with keywords: {keyword_key}")
+                        # Không kèm charset: uid() gửi nguyên tham số (không tự thêm CHARSET)
+                        # và _keyword_search_key chỉ nhận từ khóa ASCII
+                        typ, data = self.mail.uid('search', *criteria, keyword_key)
+                        if typ == 'OK':
+                            search_successful = True
+                    except Exception as e:
+                        self.logger.debug(f"UID search with keywords failed: {e}")
+
                 # Approach 1: Try with criteria if they exist
-                if criteria and criteria != ['ALL']:
+                if not search_successful and criteria and criteria != ['ALL']:
                     try:
                         search_criteria = ' '.join(criteria)
                         self.logger.info(f"[DEBUG] Attempting UID search with criteria: {search_criteria}")
@@ -319,6 +834,15 @@ class EmailFetcher:
         
         for start in range(0, len(email_ids), batch_size):
             batch = email_ids[start:start + batch_size]
+            # Header Subject và BODYSTRUCTURE của cả đợt: mỗi loại một lệnh FETCH
+            # với sequence set "id1,id2,..." thay vì một round-trip mỗi email
+            id_set = b','.join(n if isinstance(n, bytes) else str(n).encode() for n in batch)
+            _, header_data = self._fetch(id_set, '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
+            subjects = _subjects_by_id(header_data)
+            structures = self._fetch_structures(id_set)
+            body_texts = self._fetch_body_texts(structures, subjects, keywords)
+            to_mark: List[str] = []  # email đã xử lý, đánh dấu \Seen một lần cuối đợt
+            plans = []  # (id, phần cần tải, thời gian gửi) của email đọc được BODYSTRUCTURE
             for num in batch:
                 processed_emails += 1
                 # Convert bytes to string for IMAP commands
@@ -328,17 +852,29 @@ class EmailFetcher:
                 if processed_emails % 10 == 0:
                     self.logger.info(f"[PROGRESS] Processed {processed_emails}/{len(email_ids)} emails, found {len(new_files)} CV files so far")
 
-                # Fetch subject header first for quick keyword checks
                 id_bytes = num if isinstance(num, bytes) else str(num).encode()
-                if hasattr(self.mail, 'uid'):
-                    self.mail.uid('fetch', id_bytes, '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
-                    typ, msg_data = self.mail.uid('fetch', id_bytes, '(RFC822 INTERNALDATE)')
-                    uid_int = int(num_str)
-                else:
-                    self.mail.fetch(id_bytes, '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
-                    typ, msg_data = self.mail.fetch(id_bytes, '(RFC822 INTERNALDATE)')
-                    uid_int = int(num_str)
-                    
+                uid_int = int(num_str)
+
+                # Ưu tiên tải riêng phần PDF/DOCX theo BODYSTRUCTURE
+                items = structures.get(num_str)
+                structured = None
+                if items is not None:
+                    structured = self._plan_cv_parts(
+                        num_str, subjects.get(num_str, ''), keywords, items, body_texts.get(num_str, '')
+                    )
+                if structured is not None:
+                    if uid_int > max_uid_seen:
+                        max_uid_seen = uid_int
+                    found, to_download, sent_time = structured
+                    if found:
+                        emails_with_attachments += 1
+                        total_attachments_found += found
+                        to_mark.append(num_str)
+                        plans.append((num_str, to_download, sent_time))
+                    continue
+
+                # Server không trả BODYSTRUCTURE dùng được: tải toàn bộ thư
+                typ, msg_data = self._fetch(id_bytes, '(RFC822 INTERNALDATE)')
                 if typ != "OK" or not msg_data:
                     continue
                     
@@ -374,233 +910,82 @@ class EmailFetcher:
                 msg = email.message_from_bytes(raw_msg)
 
                 # Determine sent time, prefer INTERNALDATE over Date header
-                sent_time: str | None = ""
-                if internal_date:
-                    try:
-                        dt = parsedate_to_datetime(internal_date)
-                        sent_time = dt.isoformat()
-                    except Exception:
-                        try:
-                            tup = imaplib.Internaldate2tuple(f'INTERNALDATE "{internal_date}"'.encode())
-                            if tup:
-                                dt = datetime.fromtimestamp(time.mktime(tup), tz=timezone.utc)
-                                sent_time = dt.isoformat()
-                        except Exception:
-                            sent_time = ""
-                if not sent_time:
-                    date_hdr = msg.get('Date')
-                    if date_hdr:
-                        try:
-                            dt = parsedate_to_datetime(date_hdr)
-                            sent_time = dt.isoformat()
-                        except Exception:
-                            sent_time = ""
+                sent_time = _parse_sent_time(internal_date, msg.get('Date'))
 
-                # Check for PDF/DOCX attachments FIRST - always fetch PDF/DOCX files
-                has_cv_attachment = False
+                # (phần MIME, tên file, có phải CV rõ ràng) của các file PDF/DOCX
                 cv_attachments = []
-                
                 for part in msg.walk():
                     raw_name = part.get_filename()
                     if not raw_name:
                         continue
-
-                    # Decode file name
-                    try:
-                        decoded_parts = decode_header(raw_name)
-                        filename = ''.join(
-                            (p.decode(enc or 'utf-8') if isinstance(p, bytes) else p)
-                            for p, enc in decoded_parts
-                        )
-                    except Exception:
-                        filename = raw_name
-
-                    # Check if it's a PDF/DOCX file - treat all as potential CVs
+                    filename = _decode_mime_words(raw_name)
                     name, ext = os.path.splitext(filename)
-                    if ext.lower() in ['.pdf', '.docx']:
-                        # Prioritize files that clearly look like CVs
-                        is_obvious_cv = re.search(r"(cv|resume|curriculum|vitae)", name, re.IGNORECASE)
-                        has_cv_attachment = True
+                    if ext.lower() in CV_EXTENSIONS:
+                        is_obvious_cv = bool(_OBVIOUS_CV_RX.search(name))
                         cv_attachments.append((part, filename, is_obvious_cv))
                         self.logger.debug(f"[ATTACHMENT] Found {ext.upper()}: {filename} {'(obvious CV)' if is_obvious_cv else '(potential CV)'}")
-                
-                # Extract subject and body text for keyword detection
-                try:
-                    subj_hdr = msg.get('Subject', '')
-                    subj = ''.join(
-                        p.decode(enc or 'utf-8', errors='ignore') if isinstance(p, bytes) else p
-                        for p, enc in decode_header(subj_hdr)
-                    )
-                except Exception:
-                    subj = ''
 
+                # Subject và nội dung text/plain để kiểm tra từ khóa
+                subj = _decode_mime_words(msg.get('Subject', ''))
                 body_text = ''
                 for part in msg.walk():
                     if part.get_content_type() == 'text/plain' and not part.get_filename():
                         charset = part.get_content_charset() or 'utf-8'
                         try:
-                            payload = part.get_payload(decode=False)
-
-                            if isinstance(payload, str):
-                                if part.get('Content-Transfer-Encoding') == 'base64':
-                                    import base64
-                                    decoded_bytes = base64.b64decode(payload)
-                                    body_text += decoded_bytes.decode(charset, errors='ignore')
-                                else:
-                                    body_text += payload
-                            elif isinstance(payload, bytes):
+                            payload = part.get_payload(decode=True)
+                            if isinstance(payload, bytes):
                                 body_text += payload.decode(charset, errors='ignore')
                         except Exception as e:
                             self.logger.debug(f"Failed to extract text from part: {e}")
-                            pass
 
                 all_text = f"{subj}\n{body_text}".lower()
                 keyword_match = any(kw.lower() in all_text for kw in keywords)
 
-                # Filter attachments: keep only obvious CVs or those matched by keywords
-                filtered_attachments = [att for att in cv_attachments if att[2] or keyword_match]
-                has_cv_attachment = bool(filtered_attachments)
-
-                if not has_cv_attachment and not keyword_match:
+                # Chỉ giữ file rõ ràng là CV hoặc email khớp từ khóa
+                cv_attachments = [att for att in cv_attachments if att[2] or keyword_match]
+                if not cv_attachments and not keyword_match:
                     self.logger.debug(f"[SKIP] Email {num_str}: No relevant attachments or keywords")
                     continue
 
-                cv_attachments = filtered_attachments
-
-                if has_cv_attachment:
-                    self.logger.info(f"[EMAIL {num_str}] Found {len(cv_attachments)} PDF/DOCX attachment(s)")
-
-                # Log email being processed with more details
-                try:
-                    subj_hdr = msg.get('Subject', '')
-                    subj = ''.join(
-                        p.decode(enc or 'utf-8', errors='ignore') if isinstance(p, bytes) else p
-                        for p, enc in decode_header(subj_hdr)
-                    )
-                except Exception:
-                    subj = ''
-                
-                attachment_info = ""
-                if has_cv_attachment:
-                    attachment_info = f"({len(cv_attachments)} PDF/DOCX files)"
-                else:
-                    attachment_info = "(keyword match only)"
-                    
+                attachment_info = f"({len(cv_attachments)} PDF/DOCX files)" if cv_attachments else "(keyword match only)"
                 self.logger.info(f"[PROCESSING] Email {num_str}: {subj[:50]}... {attachment_info}")
 
-                # Process PDF/DOCX attachments if found
-                if has_cv_attachment:
+                if cv_attachments:
                     emails_with_attachments += 1
                     total_attachments_found += len(cv_attachments)
-                    
-                    # Sort to prioritize obvious CV files first
-                    cv_attachments.sort(key=lambda x: x[2], reverse=True)  # is_obvious_cv first
-                    
-                    for part, filename, is_obvious_cv in cv_attachments:
-                        # Sanitize filename
-                        name, ext = os.path.splitext(filename)
-                        safe_name = re.sub(r'[^\w\-\_ ]', '_', name)
-                        safe = safe_name + ext
-                        path = os.path.join(ATTACHMENT_DIR, safe)
-
-                        # Skip if file already exists
-                        if os.path.exists(path):
-                            self.logger.info(f"[INFO] Đã tồn tại: {path}")
-                            continue
-
-                        # Save attachment
-                        payload = part.get_payload(decode=True)
-                        if payload is None:
-                            self.logger.warning(f"[SKIP] Failed to decode attachment: {safe}")
-                            continue
-
-                        # Convert to bytes
-                        if isinstance(payload, str):
-                            content_bytes = payload.encode('utf-8')
-                        elif isinstance(payload, bytes):
-                            content_bytes = payload
-                        else:
-                            self.logger.warning(f"[SKIP] Unsupported payload type for {safe}: {type(payload)}")
-                            continue
 
-                        try:
-                            with open(path, "wb") as f:
-                                f.write(content_bytes)
-                            new_files.append(path)
-                            self.last_fetch_info.append((path, sent_time))
-                            try:
-                                record_sent_time(path, sent_time)
-                            except Exception as e:
-                                self.logger.warning(f"Could not record sent time for {path}: {e}")
-                            priority_msg = " (priority CV)" if is_obvious_cv else " (PDF/DOCX)"
-                            self.logger.info(f"[OK] Lưu đính kèm mới: {path}{priority_msg}")
-                        except Exception as e:
-                            self.logger.error(f"[ERROR] Failed to save {safe}: {e}")
-                            continue
-                else:
-                    # Even in aggressive mode, check for any PDF/DOCX attachments in emails without obvious CVs
-                    # This catches cases where files might not be detected in the first pass
-                    emails_with_attachments += 1 if has_cv_attachment else 0
-                    
-                    for part in msg.walk():
-                        raw_name = part.get_filename()
-                        if not raw_name:
-                            continue
-
-                        try:
-                            decoded_parts = decode_header(raw_name)
-                            filename = ''.join(
-                                (p.decode(enc or 'utf-8') if isinstance(p, bytes) else p)
-                                for p, enc in decoded_parts
-                            )
-                        except Exception:
-                            filename = raw_name
-
-                        name, ext = os.path.splitext(filename)
-                        if ext.lower() not in ['.pdf', '.docx']:
-                            continue
-                            
-                        # In aggressive mode or keyword-matched emails, save all PDF/DOCX files
-                        safe_name = re.sub(r'[^\w\-\_ ]', '_', name)
-                        safe = safe_name + ext
-                        path = os.path.join(ATTACHMENT_DIR, safe)
-
-                        if os.path.exists(path):
-                            self.logger.info(f"[INFO] Đã tồn tại: {path}")
-                            continue
+                # Ưu tiên file trông rõ ràng là CV
+                cv_attachments.sort(key=lambda x: x[2], reverse=True)
+                for part, filename, is_obvious_cv in cv_attachments:
+                    path = self._attachment_path(filename)
+                    safe = os.path.basename(path)
+                    if os.path.exists(path):
+                        self.logger.info(f"[INFO] Đã tồn tại: {path}")
+                        continue
 
+                    # base64/quoted-printable: đưa payload thô cho _store_attachment
+                    # giải mã từng khối khi ghi, không dựng bản giải mã đầy đủ
+                    encoding = str(part.get('Content-Transfer-Encoding', '')).strip().lower()
+                    payload = part.get_payload(decode=False)
+                    if encoding in ('base64', 'quoted-printable') and isinstance(payload, str):
+                        payload = payload.encode('ascii', errors='ignore')
+                    else:
+                        encoding = ''
                         payload = part.get_payload(decode=True)
-                        if payload is None:
-                            self.logger.warning(f"[SKIP] Failed to decode attachment: {safe}")
-                            continue
-
-                        if isinstance(payload, str):
-                            content_bytes = payload.encode('utf-8')
-                        elif isinstance(payload, bytes):
-                            content_bytes = payload
-                        else:
-                            self.logger.warning(f"[SKIP] Unsupported payload type for {safe}: {type(payload)}")
-                            continue
+                    if not isinstance(payload, bytes):
+                        self.logger.warning(f"[SKIP] Failed to decode attachment: {safe}")
+                        continue
 
-                        try:
-                            with open(path, "wb") as f:
-                                f.write(content_bytes)
-                            new_files.append(path)
-                            self.last_fetch_info.append((path, sent_time))
-                            try:
-                                record_sent_time(path, sent_time)
-                            except Exception as e:
-                                self.logger.warning(f"Could not record sent time for {path}: {e}")
-                            self.logger.info(f"[OK] Lưu đính kèm mới: {path} (keyword match)")
-                        except Exception as e:
-                            self.logger.error(f"[ERROR] Failed to save {safe}: {e}")
-                            continue
+                    priority_msg = " (priority CV)" if is_obvious_cv else " (PDF/DOCX)"
+                    if self._store_attachment(path, payload, sent_time, priority_msg, encoding):
+                        new_files.append(path)
 
                 # Đánh dấu email đã đọc để tránh xử lý lại lần sau
-                try:
-                    self.mail.store(num_str, "+FLAGS", "\\Seen")
-                except Exception:
-                    pass
+                to_mark.append(num_str)
+
+            # Phần đính kèm của các email trong đợt: gộp lệnh FETCH theo section
+            new_files.extend(self._download_planned(plans))
+            self._mark_seen(to_mark)
 
         # Log summary statistics
         self.logger.info(f"[SUMMARY] Processed {processed_emails} emails, found {emails_with_attachments} emails with PDF/DOCX attachments")
@@ -0,0 +1,26 @@
+# modules/fallback_models.py
+
+# Danh sách models dự phòng dùng chung cho config và ModelFetcher (một nguồn duy nhất).
+# Dùng tuple hằng: được biên dịch sẵn vào .pyc nên import không tốn chi phí dựng lại
+
+from typing import Tuple
+
+GOOGLE_FALLBACK_MODELS: Tuple[str, ...] = (
+    # Common Gemini models (flash, pro, vision) and extended variants
+    "gemini-1.0", "gemini-1.0-pro", "gemini-1.5-flash", "gemini-1.5-flash-latest",
+    "gemini-1.5-pro", "gemini-1.5-pro-latest", "gemini-pro", "gemini-pro-vision",
+    # Newer and experimental variants
+    "gemini-2.0-alpha", "gemini-2.0-vision", "gemini-2.0-vision-extended",
+    "gemini-2.0-flash", "gemini-2.5-flash-lite-preview-06-17",
+    "gemini-2.5-pro", "gemini-2.5-pro-latest",
+)
+
+OPENROUTER_FALLBACK_MODELS: Tuple[str, ...] = (
+    "anthropic/claude-3.5-sonnet", "anthropic/claude-3-haiku",
+    "openai/gpt-4o", "openai/gpt-4o-mini", "openai/gpt-3.5-turbo",
+    "google/gemini-pro-1.5", "google/gemini-flash-1.5",
+    "meta-llama/llama-3.1-8b-instruct", "meta-llama/llama-3.1-70b-instruct",
+    "qwen/qwen-2.5-72b-instruct",
+)
+
+__all__ = ["GOOGLE_FALLBACK_MODELS", "OPENROUTER_FALLBACK_MODELS"]
@@ -0,0 +1,162 @@
+"""Phân tích phản hồi FETCH của IMAP (BODYSTRUCTURE, INTERNALDATE, BODY[...])."""
+
+import re
+from email.utils import decode_rfc2231
+from urllib.parse import unquote
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+Value = Union[None, str, bytes, list]
+
+# Token của phản hồi IMAP: ngoặc, chuỗi trong nháy, literal {n}, atom
+# (atom có thể chứa phần [...] như BODY[HEADER.FIELDS (SUBJECT)])
+_TOKEN_RX = re.compile(
+    rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    rb'|\{(?P<literal>\d+)\}\s*$|(?P<atom>[^\s()"\[]+(?:\[[^\]]*\][^\s()"]*)?))'
+)
+_OPEN = object()
+_CLOSE = object()
+
+
+def _tokens(msg_data: list) -> Iterator[object]:
+    """Tách ``msg_data`` của imaplib thành token; literal trả về dạng bytes."""
+    for item in msg_data:
+        if isinstance(item, tuple):
+            head, literal = item[0] or b"", item[1]
+        else:
+            head, literal = item, None
+        if not isinstance(head, (bytes, bytearray)):
+            raise ValueError(f"Unexpected FETCH item: {item!r}")
+        pos = 0
+        head = bytes(head).rstrip()
+        while pos < len(head):
+            m = _TOKEN_RX.match(head, pos)
+            if not m or m.end() == pos:
+                raise ValueError(f"Cannot tokenize FETCH response at {head[pos:pos + 20]!r}")
+            pos = m.end()
+            if m.group("open"):
+                yield _OPEN
+            elif m.group("close"):
+                yield _CLOSE
+            elif m.group("quoted") is not None:
+                raw = re.sub(rb"\\(.)", rb"\1", m.group("quoted"))
+                yield raw.decode("utf-8", errors="replace")
+            elif m.group("atom") is not None:
+                atom = m.group("atom").decode("ascii", errors="replace")
+                yield None if atom.upper() == "NIL" else atom
+        if literal is not None:
+            yield bytes(literal)
+
+
+def _parse_list(tokens: Iterator[object]) -> list:
+    """Đọc các phần tử cho tới ``)`` tương ứng (``(`` đã được tiêu thụ)."""
+    items: list = []
+    for tok in tokens:
+        if tok is _CLOSE:
+            return items
+        items.append(_parse_list(tokens) if tok is _OPEN else tok)
+    raise ValueError("Unbalanced parentheses in FETCH response")
+
+
+def parse_fetch_response(msg_data: list) -> List[Tuple[str, Dict[str, Value]]]:
+    """Return ``[(message number, {ITEM: value})]`` for an imaplib FETCH result.
+
+    Item names are upper-cased (``UID``, ``BODYSTRUCTURE``, ``BODY[2]``...);
+    literals are returned as ``bytes``, quoted strings and atoms as ``str``
+    and ``NIL`` as ``None``. Raises ``ValueError`` on malformed input.
+    """
+    tokens = _tokens([d for d in msg_data if d is not None])
+    result = []
+    for num in tokens:
+        if not isinstance(num, str) or next(tokens, None) is not _OPEN:
+            raise ValueError(f"Expected '<num> (' in FETCH response, got {num!r}")
+        flat = _parse_list(tokens)
+        if len(flat) % 2:
+            raise ValueError("FETCH item list has an odd number of elements")
+        items = {str(flat[i]).upper(): flat[i + 1] for i in range(0, len(flat), 2)}
+        result.append((num, items))
+    return result
+
+
+def _text(value: Value) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value if isinstance(value, str) else ""
+
+
+def _params(value: Value) -> Dict[str, str]:
+    """``("name" "cv.pdf" ...)`` -> ``{"name": "cv.pdf"}`` (khóa viết thường)."""
+    if not isinstance(value, list):
+        return {}
+    return {_text(value[i]).lower(): _text(value[i + 1]) for i in range(0, len(value) - 1, 2)}
+
+
+class BodyPart:
+    """One leaf MIME part described by BODYSTRUCTURE."""
+
+    __slots__ = ("section", "maintype", "subtype", "params", "encoding", "size", "disposition", "disp_params")
+
+    def __init__(self, section: str, node: list):
+        self.section = section
+        self.maintype = _text(node[0]).lower()
+        self.subtype = _text(node[1]).lower()
+        self.params = _params(node[2])
+        self.encoding = _text(node[5]).lower()
+        self.size = int(node[6]) if _text(node[6]).isdigit() else 0
+        # Vị trí disposition: text/* có thêm số dòng, message/rfc822 có thêm
+        # envelope + body + số dòng (RFC 3501, mục 7.4.2)
+        if self.maintype == "text":
+            idx = 9
+        elif (self.maintype, self.subtype) == ("message", "rfc822"):
+            idx = 11
+        else:
+            idx = 8
+        disp = node[idx] if len(node) > idx and isinstance(node[idx], list) else None
+        self.disposition = _text(disp[0]).lower() if disp else ""
+        self.disp_params = _params(disp[1]) if disp and len(disp) > 1 else {}
+
+    @property
+    def content_type(self) -> str:
+        return f"{self.maintype}/{self.subtype}"
+
+    @property
+    def filename(self) -> Optional[str]:
+        """Tên file theo Content-Disposition, sau đó tới tham số ``name``."""
+        for params in (self.disp_params, self.params):
+            for key in ("filename", "name"):
+                if params.get(key):
+                    return params[key]
+                if params.get(key + "*"):
+                    return _decode_rfc2231(params[key + "*"])
+        return None
+
+
+def _decode_rfc2231(value: str) -> str:
+    """``utf-8''%E1%BB%...`` -> chuỗi Unicode (RFC 2231)."""
+    parts = decode_rfc2231(value)
+    if len(parts) != 3:
+        return unquote(value)
+    charset, _lang, encoded = parts
+    return unquote(encoded, encoding=charset or "utf-8", errors="replace")
+
+
+def iter_parts(structure: list, section: str = "") -> Iterator[BodyPart]:
+    """Yield every leaf part of a BODYSTRUCTURE with its part specifier."""
+    if not structure:
+        return
+    if isinstance(structure[0], list):  # multipart: (part)(part)... "mixed" (params)...
+        # Các phần con là những list đứng trước subtype; sau đó là tham số/extension
+        children = []
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            children.append(child)
+        for i, child in enumerate(children, start=1):
+            yield from iter_parts(child, f"{section}.{i}" if section else str(i))
+        return
+    part = BodyPart(section or "1", structure)
+    yield part
+    if part.content_type == "message/rfc822" and len(structure) > 8 and isinstance(structure[8], list):
+        inner = structure[8]
+        # Thư đính kèm dạng multipart: các phần con là <section>.N; ngược lại <section>.1
+        yield from iter_parts(inner, part.section if isinstance(inner[0], list) else f"{part.section}.1")
+
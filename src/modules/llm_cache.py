@@ -0,0 +1,77 @@
+"""Bộ nhớ đệm kết quả LLM trích xuất CV, lưu bền vững trong SQLite."""
+
+import hashlib  # tính khóa cache
+import json  # tuần tự hóa dict kết quả
+import sqlite3  # lưu trữ bền vững, tra cứu theo khóa chính
+import threading  # khóa khi nhiều luồng xử lý CV dùng chung kết nối
+import time
+import unicodedata  # chuẩn hóa Unicode trước khi băm
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Return ``text`` in NFC form, case-folded, with whitespace collapsed.
+
+    CVs re-exported or re-submitted by the same candidate often differ only in
+    line breaks, spacing or letter case; these map to the same normalised text.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def cache_key(prompt: str, text: str, model: str = "") -> str:
+    """Return a SHA-256 key for ``(prompt, model, normalize_text(text))``.
+
+    The parts are serialised as sorted-key JSON so that the key is stable and
+    unambiguous regardless of the content of each part.
+    """
+    payload = json.dumps(
+        {"prompt": prompt, "model": model, "text": normalize_text(text)}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Persistent ``key -> dict`` cache of LLM extraction results backed by SQLite."""
+
+    def __init__(self, db_path: Path, ttl: Optional[float] = None):
+        self.db_path = Path(db_path)
+        self.ttl = ttl  # giây; None: không hết hạn
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache(key TEXT PRIMARY KEY, value TEXT, ts INTEGER)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached dict for ``key`` or ``None`` if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, ts FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, ts = row
+        if self.ttl is not None and time.time() - ts >= self.ttl:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    def set(self, key: str, value: Dict) -> None:
+        """Store ``value`` under ``key``."""
+        data = json.dumps(value, ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache(key, value, ts) VALUES (?, ?, ?)",
+                (key, data, int(time.time())),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
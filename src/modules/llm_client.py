@@ -2,6 +2,8 @@
 
 import logging                     # thư viện ghi log
 import requests                    # thư viện HTTP để gửi yêu cầu tới API OpenRouter
+from requests.adapters import HTTPAdapter  # pool kết nối keep-alive
+from urllib3.util.retry import Retry       # retry lỗi kết nối / 5xx ở tầng HTTP
 from typing import List           # khai báo kiểu List cho Python 3.8+
 
 from .config import LLM_CONFIG, OPENROUTER_BASE_URL  # import cấu hình LLM và URL chung
@@ -9,7 +11,57 @@ from .config import LLM_CONFIG, OPENROUTER_BASE_URL  # import cấu hình LLM v
 # --- Thiết lập logger cho module llm_client ---
 logger = logging.getLogger(__name__)        # lấy logger theo tên module hiện tại
 logger.setLevel(logging.INFO)               # đặt mức log tối thiểu là INFO
-logger.addHandler(logging.StreamHandler())   # thêm handler để xuất log ra console
+if not logger.handlers:                     # tránh nhân đôi handler khi import lại
+    logger.addHandler(logging.StreamHandler())   # thêm handler để xuất log ra console
+
+
+def make_http_session() -> requests.Session:
+    """
+    Session HTTP giữ kết nối TLS (keep-alive) giữa các request tới LLM API.
+    Retry lỗi kết nối và 5xx với backoff; 429 để CVProcessor xử lý (có jitter
+    và giới hạn tổng thời gian chờ) nên không retry ở đây để tránh nhân đôi.
+    Không retry lỗi đọc/timeout: request có thể đã tới server và bị tính phí,
+    gửi lại POST sẽ chờ (và trả tiền) thêm một lần hoàn thành nữa.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=0,
+        other=0,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry))
+    return session
+
+
+# Anthropic chỉ cache prompt từ 1024 token trở lên (~4 ký tự/token); ngắn hơn thì vô ích
+PROMPT_CACHE_MIN_CHARS = 4096
+
+
+def format_openrouter_messages(model: str, messages: List[str]) -> List[dict]:
+    """
+    Định dạng messages cho OpenRouter: role "system" cho phần đầu, "user" cho các phần sau.
+    Chỉ với model ``anthropic/...`` và prompt hệ thống đủ dài để được cache, prompt
+    hệ thống được gửi dạng content part có ``cache_control``; các model khác giữ
+    nguyên định dạng chuỗi (một số provider không nhận content dạng mảng).
+    """
+    formatted = [
+        {"role": "system" if i == 0 else "user", "content": m}
+        for i, m in enumerate(messages)
+    ]
+    if (
+        len(formatted) > 1
+        and model.startswith("anthropic/")
+        and len(messages[0]) >= PROMPT_CACHE_MIN_CHARS
+    ):
+        formatted[0]["content"] = [
+            {"type": "text", "text": messages[0], "cache_control": {"type": "ephemeral"}}
+        ]
+    return formatted
 
 
 class LLMClient:
@@ -27,6 +79,7 @@ class LLMClient:
         self.provider = LLM_CONFIG["provider"]  # provider hiện tại (google hoặc openrouter)
         self.model = LLM_CONFIG["model"]        # model hiện tại (ví dụ gemini-1.5-flash-latest)
         self.api_key = LLM_CONFIG["api_key"]    # api_key tương ứng
+        self.session = make_http_session()      # tái sử dụng kết nối HTTP giữa các lời gọi
 
         # Thiết lập client dựa trên provider
         if self.provider == "google":
@@ -73,10 +126,7 @@ class LLMClient:
         - Trả về nội dung text từ response JSON
         """
         # Định dạng messages cho OpenRouter: role "system" cho phần đầu, "user" cho các phần sau
-        formatted = [
-            {"role": "system" if i == 0 else "user", "content": m}
-            for i, m in enumerate(messages)
-        ]
+        formatted = format_openrouter_messages(self.model, messages)
 
         # Thiết lập payload JSON theo API spec của OpenRouter
         payload = {
@@ -94,7 +144,7 @@ class LLMClient:
 
         try:
             # Gửi POST request, timeout 30s
-            res = requests.post(
+            res = self.session.post(
                 f"{OPENROUTER_BASE_URL}/chat/completions",
                 json=payload,
                 headers=headers,
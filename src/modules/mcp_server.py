@@ -1,12 +1,14 @@
 # modules/mcp_server.py
 
-import shutil                    # sao chép luồng dữ liệu nhị phân
 import logging                   # ghi log hoạt động ứng dụng
+import threading                 # khóa khi khởi tạo tài nguyên dùng chung
+from contextlib import asynccontextmanager  # lifespan của FastAPI
 from pathlib import Path         # thao tác đường dẫn hướng đối tượng
 
-from fastapi import FastAPI, UploadFile, File, HTTPException  # framework API và xử lý upload
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request  # framework API và xử lý upload
 from datetime import date, datetime
 from fastapi.responses import FileResponse    # trả về file như response
+from fastapi.concurrency import run_in_threadpool  # chạy code đồng bộ ngoài event loop
 from pydantic_settings import BaseSettings, SettingsConfigDict      # sử dụng BaseSettings với cấu hình cho Pydantic v2
 
 
@@ -51,8 +53,43 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s: %(message)s"
 )
 
+# Kích thước mỗi khối khi ghi file upload ra đĩa (1 MiB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Khóa để chỉ một request tạo CVProcessor dùng chung
+_processor_lock = threading.Lock()
+
+
+def _build_processor() -> CVProcessor:
+    """Tạo CVProcessor với LLM client mặc định."""
+    return CVProcessor(llm_client=LLMClient())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Tạo CVProcessor dùng chung một lần khi server khởi động."""
+    try:
+        app.state.processor = _build_processor()
+    except Exception as e:
+        # Không chặn server khởi động; get_processor sẽ thử lại khi có request
+        logging.warning(f"Không khởi tạo được CVProcessor lúc khởi động: {e}")
+    yield
+
+
+def get_processor(request: Request) -> CVProcessor:
+    """Dependency trả về CVProcessor dùng chung, tạo lười nếu chưa có."""
+    state = request.app.state
+    processor = getattr(state, "processor", None)
+    if processor is None:
+        with _processor_lock:
+            processor = getattr(state, "processor", None)
+            if processor is None:
+                processor = state.processor = _build_processor()
+    return processor
+
+
 # Khởi tạo FastAPI app với metadata
-app = FastAPI(title="CV AI MCP Server", version="1.0")
+app = FastAPI(title="CV AI MCP Server", version="1.0", lifespan=lifespan)
 
 
 @app.get("/", summary="Health Check")
@@ -64,28 +101,39 @@ async def health():
 
 
 @app.post("/run-full-process", summary="Run full CV extraction process")
-async def run_full(from_date: str | None = None, to_date: str | None = None):
+async def run_full(
+    from_date: str | None = None,
+    to_date: str | None = None,
+    processor: CVProcessor = Depends(get_processor),
+):
     """Process all CV files in attachments and save results."""
 
     # Chuyển đổi chuỗi ngày (nếu có) sang datetime để lọc
     from_dt = datetime.strptime(from_date, "%d/%m/%Y") if from_date else None
     to_dt = datetime.strptime(to_date, "%d/%m/%Y") if to_date else None
 
-    processor = CVProcessor(llm_client=LLMClient())
-    df = processor.process(from_time=from_dt, to_time=to_dt)
+    def _run() -> int:
+        # Toàn bộ phần xử lý là đồng bộ (đọc file, gọi LLM, ghi đĩa)
+        df = processor.process(from_time=from_dt, to_time=to_dt)
+
+        # Nếu không có CV mới, trả về số bản ghi đã xử lý = 0
+        if df.empty:
+            return 0
 
-    # Nếu không có CV mới, trả về số bản ghi đã xử lý = 0
-    if df.empty:
-        return {"processed": 0}
+        # Lưu DataFrame vào CSV, ghi đè file cũ
+        processor.save_to_csv(df, str(settings.output_csv))
+        processor.save_to_excel(df, str(settings.output_excel))
+        return len(df)
 
-    # Lưu DataFrame vào CSV, ghi đè file cũ
-    processor.save_to_csv(df, str(settings.output_csv))
-    processor.save_to_excel(df, str(settings.output_excel))
-    return {"processed": len(df)}
+    # Chạy trong threadpool để event loop vẫn phục vụ các request khác
+    return {"processed": await run_in_threadpool(_run)}
 
 
 @app.post("/process-single-cv", summary="Process single CV file")
-async def process_single_cv(file: UploadFile = File(...)):
+async def process_single_cv(
+    file: UploadFile = File(...),
+    processor: CVProcessor = Depends(get_processor),
+):
     """
     Xử lý 1 file CV được upload:
     1. Lưu tạm file vào thư mục attachments
@@ -96,19 +144,21 @@ async def process_single_cv(file: UploadFile = File(...)):
     # Đường dẫn file tạm
     tmp_path = settings.attachment_dir / f"tmp_{file.filename}"
 
-    # Ghi file upload vào ổ đĩa
-    with tmp_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Trích xuất text và thông tin
-    processor = CVProcessor(llm_client=LLMClient())
-    text = processor.extract_text(str(tmp_path))
-
-    # Xóa file tạm (nếu có lỗi, chỉ log warning)
     try:
-        tmp_path.unlink()
-    except Exception as e:
-        logging.warning(f"Không xóa được file tạm: {e}")
+        # Ghi file upload vào ổ đĩa theo từng khối 1 MiB; đọc async để không
+        # chặn event loop khi file lớn đã bị spool ra đĩa
+        with tmp_path.open("wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+
+        # Trích xuất text và thông tin (chạy trong threadpool, không chặn event loop)
+        text = await run_in_threadpool(processor.extract_text, str(tmp_path))
+    finally:
+        # Xóa file tạm kể cả khi trích xuất lỗi (nếu có lỗi, chỉ log warning)
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except Exception as e:
+            logging.warning(f"Không xóa được file tạm: {e}")
 
     # Nếu không trích xuất được text, trả về lỗi
     if not text:
@@ -118,7 +168,7 @@ async def process_single_cv(file: UploadFile = File(...)):
         )
 
     # Trả về thông tin đã trích xuất
-    return processor.extract_info_with_llm(text)
+    return await run_in_threadpool(processor.extract_info_with_llm, text)
 
 
 @app.get("/results", summary="Get processed results CSV")
@@ -2,15 +2,20 @@
 
 import os                      # thư viện xử lý đường dẫn và tương tác hệ thống file
 import json                    # parse và dump dữ liệu JSON
+import time                    # thời điểm lấy models để tính TTL cache
+import hashlib                 # băm (provider, api_key) làm tên file cache
 import logging                 # ghi log
-from typing import List, Dict # khai báo kiểu List, Dict cho hàm/method
-import google.generativeai as genai  # SDK Google Gemini để list models
+import threading               # làm mới cache ở nền (stale-while-revalidate)
+from typing import List, Dict, Optional, Tuple # khai báo kiểu List, Dict cho hàm/method
 import requests                # gửi HTTP request (OpenRouter API)
 
+from .fallback_models import GOOGLE_FALLBACK_MODELS, OPENROUTER_FALLBACK_MODELS
+
 # --- Cấu hình logger cho module ---
 logger = logging.getLogger(__name__)       # lấy logger theo tên module hiện tại
 logger.setLevel(logging.INFO)              # chỉ ghi log mức INFO trở lên
-logger.addHandler(logging.StreamHandler()) # xuất log ra console
+if not logger.handlers:                    # tránh nhân đôi handler khi import lại
+    logger.addHandler(logging.StreamHandler()) # xuất log ra console
 
 class ModelFetcher:
     """
@@ -21,37 +26,100 @@ class ModelFetcher:
     CACHE_DIR = os.path.expanduser("~/.hoancauai_cache")
     os.makedirs(CACHE_DIR, exist_ok=True)  # tạo thư mục nếu chưa tồn tại
 
+    # Thời gian sống của cache (giây), mặc định 24h, đổi qua biến MODEL_CACHE_TTL.
+    # Quá hạn này cache bị bỏ và phải chờ gọi API.
+    try:
+        CACHE_TTL = int(os.getenv("MODEL_CACHE_TTL", "86400"))
+    except ValueError:
+        CACHE_TTL = 86400
+
+    # Sau CACHE_SOFT_TTL (mặc định 1h) cache vẫn được trả về ngay nhưng một thread
+    # nền sẽ gọi lại API để làm mới (stale-while-revalidate)
+    try:
+        CACHE_SOFT_TTL = int(os.getenv("MODEL_CACHE_SOFT_TTL", "3600"))
+    except ValueError:
+        CACHE_SOFT_TTL = 3600
+
+    # Các thread làm mới đang chạy: path cache -> Thread (tránh làm mới trùng)
+    _refreshing: Dict[str, threading.Thread] = {}
+    _refresh_lock = threading.Lock()
+
+    # Bản sao trong bộ nhớ của các file cache đã đọc: path -> (fetched_at, data)
+    _memory: Dict[str, Tuple[float, List]] = {}
+
     @staticmethod
-    def _cache_path(provider: str) -> str:
+    def _cache_path(provider: str, api_key: str = "") -> str:
         """
-        Trả về đường dẫn file cache cho provider (google hoặc openrouter).
+        Trả về đường dẫn file cache cho provider (google hoặc openrouter),
+        tách riêng theo mã băm của API key.
         """
-        return os.path.join(ModelFetcher.CACHE_DIR, f"{provider}_models.json")
+        digest = hashlib.sha256(f"{provider}:{api_key}".encode()).hexdigest()[:16]
+        return os.path.join(ModelFetcher.CACHE_DIR, f"{provider}_models_{digest}.json")
 
     @staticmethod
-    def _load_cache(provider: str) -> List:
+    def _load_cache(provider: str, api_key: str = "") -> List:
         """
-        Đọc cache từ file, trả về list nếu có.
-        Trả về [] nếu file không tồn tại hoặc lỗi parse.
+        Đọc cache (bộ nhớ rồi tới file), trả về list nếu còn trong TTL.
+        Trả về [] nếu không có, đã hết hạn hoặc lỗi parse.
         """
-        path = ModelFetcher._cache_path(provider)
-        if os.path.exists(path):
+        path = ModelFetcher._cache_path(provider, api_key)
+        entry = ModelFetcher._memory.get(path)
+        if entry is None and os.path.exists(path):
             try:
                 with open(path, "r", encoding="utf-8") as f:
-                    return json.load(f)
+                    payload = json.load(f)
+                entry = (float(payload["fetched_at"]), list(payload["models"]))
+                ModelFetcher._memory[path] = entry
             except Exception:
                 pass
+        if entry and time.time() - entry[0] < ModelFetcher.CACHE_TTL:
+            return entry[1]
         return []
 
     @staticmethod
-    def _save_cache(provider: str, data: List):
+    def _is_stale(provider: str, api_key: str = "") -> bool:
+        """True nếu cache trong bộ nhớ đã quá CACHE_SOFT_TTL (gọi sau _load_cache)."""
+        entry = ModelFetcher._memory.get(ModelFetcher._cache_path(provider, api_key))
+        return bool(entry) and time.time() - entry[0] >= ModelFetcher.CACHE_SOFT_TTL
+
+    @staticmethod
+    def _refresh_in_background(provider: str, api_key: str, fetch) -> None:
+        """
+        Gọi ``fetch()`` trong một thread daemon để làm mới cache cũ.
+        Mỗi file cache chỉ có một thread làm mới tại một thời điểm.
+        """
+        path = ModelFetcher._cache_path(provider, api_key)
+
+        def _run():
+            try:
+                fetch()
+            except Exception as e:
+                logger.warning("Không làm mới được cache models %s: %s", provider, e)
+            finally:
+                with ModelFetcher._refresh_lock:
+                    ModelFetcher._refreshing.pop(path, None)
+
+        with ModelFetcher._refresh_lock:
+            if path in ModelFetcher._refreshing:
+                return
+            thread = threading.Thread(target=_run, name=f"refresh-{provider}-models", daemon=True)
+            ModelFetcher._refreshing[path] = thread
+        thread.start()
+
+    @staticmethod
+    def _save_cache(provider: str, data: List, api_key: str = ""):
         """
-        Ghi dữ liệu danh sách models vào file cache dạng JSON.
+        Ghi dữ liệu danh sách models vào file cache dạng JSON kèm thời điểm lấy.
+        Ghi ra file tạm rồi os.replace để không bao giờ đọc phải file ghi dở.
         """
-        path = ModelFetcher._cache_path(provider)
+        path = ModelFetcher._cache_path(provider, api_key)
+        fetched_at = time.time()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": fetched_at, "models": data}, f, indent=2)
+            os.replace(tmp_path, path)
+            ModelFetcher._memory[path] = (fetched_at, data)
         except Exception:
             pass
 
@@ -59,87 +127,89 @@ class ModelFetcher:
     def get_google_models(api_key: str) -> List[str]:
         """
         Lấy danh sách model từ Google Gemini qua SDK.
-        - Kiểm tra cache trước, nếu có dùng luôn.
+        - Kiểm tra cache trước, nếu còn hạn (CACHE_TTL) dùng luôn; quá
+          CACHE_SOFT_TTL thì làm mới ở nền.
         - Nếu không, gọi genai.list_models(), lấy tất cả tên models.
         - Lưu kết quả vào cache và trả về.
         - Nếu lỗi, log và fallback về list cứng.
         """
-        # thử load từ cache trước
-        cached = ModelFetcher._load_cache("google")
+        # thử load từ cache trước; cache cũ vẫn dùng ngay và được làm mới ở nền
+        cached = ModelFetcher._load_cache("google", api_key)
         if cached:
+            if ModelFetcher._is_stale("google", api_key):
+                ModelFetcher._refresh_in_background(
+                    "google", api_key, lambda: ModelFetcher._fetch_google_models(api_key)
+                )
             return cached
 
         try:
-            genai.configure(api_key=api_key)           # cấu hình API key cho SDK
-            models = genai.list_models()               # gọi list_models()
-            # lấy tất cả tên model
-            names = [
-                m.name.split("/")[-1]
-                for m in models
-            ]
-            names = sorted(names)                      # sắp xếp alphabet
-            ModelFetcher._save_cache("google", names)  # lưu cache
-            return names
+            return ModelFetcher._fetch_google_models(api_key)
         except Exception as e:
-            logger.error(f"❌ Lỗi Google list_models: {e}")
+            logger.error("❌ Lỗi Google list_models: %s", e)
 
         # fallback cứng nếu không lấy được từ API
-        return [
-            "gemini-1.5-flash",
-            "gemini-1.5-flash-latest",
-            "gemini-1.5-pro",
-            "gemini-1.5-pro-latest",
-            "gemini-pro",
-            "gemini-pro-vision",
-        ]
+        return list(GOOGLE_FALLBACK_MODELS)
 
     @staticmethod
-    def get_openrouter_models(api_key: str) -> List[Dict]:
+    def _fetch_google_models(api_key: str) -> List[str]:
+        """Gọi genai.list_models(), lưu cache và trả về tên models (ném lỗi nếu thất bại)."""
+        # Import lười: SDK Google nặng, chỉ nạp khi thực sự cần gọi API
+        import google.generativeai as genai  # SDK Google Gemini để list models
+        genai.configure(api_key=api_key)           # cấu hình API key cho SDK
+        models = genai.list_models()               # gọi list_models()
+        # lấy tất cả tên model, sắp xếp alphabet
+        names = sorted(m.name.split("/")[-1] for m in models)
+        ModelFetcher._save_cache("google", names, api_key)  # lưu cache
+        return names
+
+    @staticmethod
+    def get_openrouter_models(api_key: str, session: Optional[requests.Session] = None) -> List[Dict]:
         """
         Lấy danh sách model từ OpenRouter qua HTTP GET.
-        - Kiểm tra cache trước, nếu có dùng luôn.
+        - Kiểm tra cache trước, nếu còn hạn (CACHE_TTL) dùng luôn; quá
+          CACHE_SOFT_TTL thì làm mới ở nền.
         - Nếu không, gọi API, parse JSON->data, sort theo id.
         - Lưu cache và trả về list dict.
         - Nếu lỗi, log và fallback về list cứng.
+        ``session`` (tuỳ chọn) cho phép tái sử dụng kết nối HTTP của caller.
         """
-        cached = ModelFetcher._load_cache("openrouter")
+        cached = ModelFetcher._load_cache("openrouter", api_key)
         if cached:
+            if ModelFetcher._is_stale("openrouter", api_key):
+                ModelFetcher._refresh_in_background(
+                    "openrouter", api_key,
+                    lambda: ModelFetcher._fetch_openrouter_models(api_key, session),
+                )
             return cached
 
         try:
-            res = requests.get(
-                "https://openrouter.ai/api/v1/models",
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=10
-            )
-            res.raise_for_status()                     # ném lỗi nếu status != 200
-            data = res.json().get("data", [])          # lấy trường data
-            # sắp xếp list dict theo key 'id'
-            models = sorted(data, key=lambda x: x.get("id", ""))
-            ModelFetcher._save_cache("openrouter", models)
-            return models
+            return ModelFetcher._fetch_openrouter_models(api_key, session)
         except Exception as e:
-            logger.error(f"❌ Lỗi OpenRouter list_models: {e}")
+            logger.error("❌ Lỗi OpenRouter list_models: %s", e)
 
         # fallback cứng nếu không lấy được
-        return [
-            {"id": "anthropic/claude-3.5-sonnet"},
-            {"id": "anthropic/claude-3-haiku"},
-            {"id": "openai/gpt-4o"},
-            {"id": "openai/gpt-4o-mini"},
-            {"id": "openai/gpt-3.5-turbo"},
-            {"id": "google/gemini-pro-1.5"},
-            {"id": "google/gemini-flash-1.5"},
-            {"id": "meta-llama/llama-3.1-8b-instruct"},
-            {"id": "meta-llama/llama-3.1-70b-instruct"},
-            {"id": "qwen/qwen-2.5-72b-instruct"},
-        ]
+        return [{"id": model_id} for model_id in OPENROUTER_FALLBACK_MODELS]
+
+    @staticmethod
+    def _fetch_openrouter_models(api_key: str, session: Optional[requests.Session] = None) -> List[Dict]:
+        """Gọi API OpenRouter, lưu cache và trả về list dict (ném lỗi nếu thất bại)."""
+        res = (session or requests).get(
+            "https://openrouter.ai/api/v1/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=10
+        )
+        res.raise_for_status()                     # ném lỗi nếu status != 200
+        data = res.json().get("data", [])          # lấy trường data
+        # sắp xếp list dict theo key 'id'
+        models = sorted(data, key=lambda x: x.get("id", ""))
+        ModelFetcher._save_cache("openrouter", models, api_key)
+        return models
 
     @staticmethod
-    def get_simple_openrouter_model_ids(api_key: str) -> List[str]:
+    def get_simple_openrouter_model_ids(api_key: str, session: Optional[requests.Session] = None) -> List[str]:
         """
         Trả về chỉ danh sách id của models OpenRouter.
         Sử dụng get_openrouter_models() rồi lấy trường 'id'.
         """
-        models = ModelFetcher.get_openrouter_models(api_key)
+        models = ModelFetcher.get_openrouter_models(api_key, session=session)
         return [m.get("id", "") for m in models]
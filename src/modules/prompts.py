@@ -21,3 +21,12 @@ CV_EXTRACTION_PROMPT = (
     "}\n"  # đóng object JSON
     "```"  # kết thúc code block
 )
+
+# Prompt khi gửi nhiều CV trong một request: mỗi CV bắt đầu bằng dòng "=== CV n ===",
+# kết quả là JSON array các object (cùng khóa như trên) theo đúng thứ tự CV
+CV_BATCH_EXTRACTION_PROMPT = (
+    CV_EXTRACTION_PROMPT
+    + "\nBên dưới có nhiều CV, mỗi CV bắt đầu bằng dòng \"=== CV n ===\". "  # định dạng đầu vào
+    "Hãy trả về MỘT JSON array, mỗi phần tử là object như ví dụ trên, "  # định dạng đầu ra
+    "theo đúng thứ tự CV và có số phần tử bằng số CV."  # ràng buộc số lượng/thứ tự
+)
@@ -25,6 +25,7 @@ class QAChatbot:
         question: str,
         df: pd.DataFrame,
         context: Optional[Dict[str, Any]] = None,
+        data_csv: Optional[str] = None,
     ) -> str:
         """Delegate answering to :func:`answer_question`."""
         return answer_question(
@@ -34,6 +35,7 @@ class QAChatbot:
             self.model,
             self.api_key,
             context=context,
+            data_csv=data_csv,
         )
 
 # Enhanced logging
@@ -125,8 +127,17 @@ def _is_time_question(question: str) -> bool:
     return any(re.search(p, question_lower) for p in patterns)
 
 
-def _create_enhanced_prompt(question: str, df: pd.DataFrame, context: Optional[Dict[str, Any]] = None) -> list:
-    """Create enhanced prompt with better context and instructions."""
+def _create_enhanced_prompt(
+    question: str,
+    df: pd.DataFrame,
+    context: Optional[Dict[str, Any]] = None,
+    data_csv: Optional[str] = None,
+) -> list:
+    """Create enhanced prompt with better context and instructions.
+
+    ``data_csv`` is the dataset already serialized as CSV; when given it is
+    used as-is instead of re-encoding ``df`` for every question.
+    """
     
     # Get data summary
     total_records = len(df)
@@ -154,7 +165,9 @@ QUY TẮC:
 - Sử dụng emoji để làm cho câu trả lời sinh động hơn"""
     
     # Data context - use entire dataset instead of a preview
-    data_context = f"Toàn bộ dữ liệu ({total_records} hồ sơ):\n\n{df.to_csv(index=False)}"
+    if data_csv is None:
+        data_csv = df.to_csv(index=False)
+    data_context = f"Toàn bộ dữ liệu ({total_records} hồ sơ):\n\n{data_csv}"
     
     # Question with context
     question_with_context = f"Câu hỏi: {question}"
@@ -165,7 +178,7 @@ QUY TẮC:
     return [system_prompt, data_context, question_with_context]
 
 
-def answer_question(question: str, df: pd.DataFrame, provider: str, model: str, api_key: str, context: Optional[Dict[str, Any]] = None) -> str:
+def answer_question(question: str, df: pd.DataFrame, provider: str, model: str, api_key: str, context: Optional[Dict[str, Any]] = None, data_csv: Optional[str] = None) -> str:
     """Enhanced question answering with better error handling and context."""
     
     # Input validation
@@ -190,7 +203,7 @@ def answer_question(question: str, df: pd.DataFrame, provider: str, model: str,
     
     try:
         # Create enhanced prompt
-        messages = _create_enhanced_prompt(question, df, context)
+        messages = _create_enhanced_prompt(question, df, context, data_csv=data_csv)
         
         # Generate response
         client = DynamicLLMClient(provider=provider, model=model, api_key=api_key)
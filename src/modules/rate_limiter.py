@@ -0,0 +1,36 @@
+"""Token bucket giới hạn tốc độ gọi API (dùng chung giữa các luồng)."""
+
+import threading  # khóa khi nhiều luồng cùng lấy token
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second.
+
+    ``capacity`` is the burst size. A ``rate`` of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available; return the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            # ngủ ngoài khóa để các luồng khác vẫn kiểm tra được bucket
+            time.sleep(wait)
+            waited += wait
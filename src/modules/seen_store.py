@@ -0,0 +1,49 @@
+"""Lưu mã băm nội dung các file đính kèm đã tải để bỏ qua bản trùng lặp."""
+
+import hashlib  # tính mã băm nội dung
+import sqlite3  # lưu trữ bền vững, tra cứu O(1) theo khóa chính
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def content_hasher():
+    """Return an incremental hasher whose ``hexdigest()`` matches :func:`content_hash`."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(data: bytes) -> str:
+    """Return a short blake2b digest of the attachment bytes."""
+    hasher = content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+class SeenStore:
+    """Persistent set of attachment content hashes backed by SQLite."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen(hash TEXT PRIMARY KEY, path TEXT, ts REAL)"
+        )
+        self._conn.commit()
+
+    def lookup(self, digest: str) -> Optional[str]:
+        """Return the path saved for ``digest`` or ``None`` if never seen."""
+        row = self._conn.execute("SELECT path FROM seen WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, digest: str, path: str) -> None:
+        """Remember that ``digest`` has been saved at ``path``."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO seen(hash, path, ts) VALUES (?, ?, ?)",
+            (digest, path, time.time()),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self._conn.close()
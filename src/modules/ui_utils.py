@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 # contextmanager giúp định nghĩa hàm với cú pháp 'with'
+from itertools import islice
 from typing import Iterable
 
 import streamlit as st
@@ -14,7 +15,8 @@ def display_logs(container: st.delta_generator.DeltaGenerator, max_lines: int =
         container.info("Chưa có log nào.")
         return
 
-    recent_logs: Iterable = logs[-max_lines:]
+    # Hỗ trợ cả list và deque (deque không cắt lát được)
+    recent_logs: Iterable = list(islice(reversed(logs), max_lines))[::-1]
     log_text = ""
     for entry in recent_logs:
         if isinstance(entry, dict):
@@ -6,6 +6,9 @@ import pytest
 def _install_dummy_pandas():
     class DummyDataFrame(list):
         def __init__(self, data=None, columns=None):
+            if isinstance(data, dict):
+                # dữ liệu theo cột -> list dict theo dòng
+                data = [dict(zip(data, values)) for values in zip(*data.values())]
             super().__init__(data or [])
 
         def to_csv(self, *args, **kwargs):
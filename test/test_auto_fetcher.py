@@ -0,0 +1,91 @@
+import sys
+import os
+import threading
+
+import importlib
+import pytest
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+
+class FakeFetcher:
+    def __init__(self, *args, stop_event=None, **kwargs):
+        self.mail = None
+        self.calls = 0
+        self.stop_event = stop_event
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def fetch_cv_attachments(self, **kwargs):
+        self.calls += 1
+        self.stop_event.set()
+        return []
+
+
+@pytest.fixture
+def auto_fetcher_module(mock_requests, monkeypatch):
+    import modules.auto_fetcher as auto_fetcher
+    importlib.reload(auto_fetcher)
+    return auto_fetcher
+
+
+def test_watch_loop_stops_on_event(auto_fetcher_module, monkeypatch):
+    stop = threading.Event()
+    created = []
+
+    def make_fetcher(*args, **kwargs):
+        fetcher = FakeFetcher(stop_event=stop)
+        created.append(fetcher)
+        return fetcher
+
+    monkeypatch.setattr(auto_fetcher_module, 'EmailFetcher', make_fetcher)
+
+    thread = threading.Thread(
+        target=auto_fetcher_module.watch_loop,
+        args=(600,),
+        kwargs={'stop_event': stop},
+        daemon=True,
+    )
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert created[0].calls == 1
+
+
+class FakeIdler:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def __enter__(self):
+        return iter(self.responses)
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeIdleMail:
+    def __init__(self, responses):
+        self.responses = responses
+        self.durations = []
+
+    def idle(self, duration=None):
+        self.durations.append(duration)
+        return FakeIdler(self.responses)
+
+
+def test_wait_for_mail_returns_on_exists(auto_fetcher_module):
+    mail = FakeIdleMail([('EXISTS', [b'5'])])
+    assert auto_fetcher_module._wait_for_mail(mail, 600, threading.Event()) is True
+    assert mail.durations == [auto_fetcher_module.IDLE_SLICE]
+
+
+def test_wait_for_mail_stops_without_idle_support(auto_fetcher_module):
+    stop = threading.Event()
+    stop.set()
+    assert auto_fetcher_module._wait_for_mail(object(), 600, stop) is False
@@ -26,7 +26,7 @@ class DummyGenAI:
 
 
 @pytest.fixture
-def cv_processor_class(mock_pandas, mock_requests, monkeypatch):
+def cv_processor_class(mock_pandas, mock_requests, monkeypatch, tmp_path):
     ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     sys.path.insert(0, ROOT)
     sys.path.insert(0, os.path.join(ROOT, "src"))
@@ -42,6 +42,8 @@ def cv_processor_class(mock_pandas, mock_requests, monkeypatch):
 
     if hasattr(cvp, "DynamicLLMClient"):
         monkeypatch.setattr(cvp, "DynamicLLMClient", DummyLLMClient)
+    # cache LLM mặc định của mỗi test nằm trong thư mục tạm riêng
+    monkeypatch.setattr(cvp, "CACHE_DIR", tmp_path / "cache")
     return cvp.CVProcessor
 
 
@@ -156,3 +158,330 @@ def test_process_filters_by_time(cv_processor_class, tmp_path, monkeypatch):
     end = datetime.datetime(2023, 9, 21, tzinfo=datetime.timezone.utc)
     df = processor.process(from_time=start, to_time=end)
     assert len(df) == 1
+
+
+def test_process_extracts_text_in_process_pool(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'ATTACHMENT_DIR', tmp_path)
+
+    mapped = []
+
+    class FakePool:
+        def __init__(self, max_workers=None, mp_context=None):
+            self.max_workers = max_workers
+            created.append(self)
+
+        def map(self, fn, items, cache_files):
+            mapped.extend(items)
+            cache_args.extend(cache_files)
+            return [f'text:{os.path.basename(i)}' for i in items]
+
+        def shutdown(self, **kwargs):
+            pass
+
+    created = []
+    cache_args = []
+    monkeypatch.setattr(cp_module, 'ProcessPoolExecutor', FakePool)
+    monkeypatch.setattr(cp_module, '_EXTRACT_POOL', None)
+    files = [str(tmp_path / f'cv{i}.pdf') for i in range(5)]
+    for i, path in enumerate(files):
+        with open(path, 'wb') as f:
+            f.write(f'cv{i}'.encode())
+    hashed = []
+    real_digest = cp_module._file_digest
+    monkeypatch.setattr(cp_module, '_file_digest', lambda p: hashed.append(p) or real_digest(p))
+    # cv0 đã có trong cache text: đọc ở tiến trình chính, không gửi sang pool
+    cached_file = cp_module._text_cache_file(files[0])
+    cached_file.parent.mkdir(parents=True)
+    cached_file.write_text('text:cached', encoding='utf-8')
+
+    class DummyFetcher:
+        last_fetch_info = []
+
+        def fetch_cv_attachments(self, unseen_only=True, since=None, before=None):
+            return files
+
+    processor = cp_module.CVProcessor(DummyFetcher(), extract_workers=4)
+    seen = []
+    monkeypatch.setattr(processor, 'extract_info_with_llm', lambda t: seen.append(t) or {})
+    df = processor.process()
+    processor.process()
+
+    assert mapped == files[1:] * 2
+    assert sorted(seen[:5]) == ['text:cached', 'text:cv1.pdf', 'text:cv2.pdf', 'text:cv3.pdf', 'text:cv4.pdf']
+    assert len(df) == 5
+    assert len(created) == 1  # pool được dùng lại giữa các lần process()
+    # File cache (kèm mã băm) tính ở tiến trình chính rồi truyền cho worker
+    assert cache_args == [cp_module._text_cache_file(p) for p in files[1:]] * 2
+    assert sorted(hashed) == sorted(files)  # mỗi file chỉ băm một lần
+
+
+def test_llm_results_cached(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'LLM_MIN_TEXT_CHARS', 0)  # text mẫu ngắn vẫn gửi LLM
+
+    class CountingLLM:
+        model = 'm'
+        calls = 0
+
+        def generate_content(self, messages):
+            CountingLLM.calls += 1
+            return '{"ten": "A"}'
+
+    cache = cp_module.LLMCache(tmp_path / 'llm.sqlite')
+    processor = cp_module.CVProcessor(llm_client=CountingLLM(), llm_cache=cache)
+    assert processor.extract_info_with_llm('cv text') == {'ten': 'A'}
+    assert processor.extract_info_with_llm('cv text') == {'ten': 'A'}
+    assert CountingLLM.calls == 1
+    cache.close()
+
+
+def test_aextract_many_bounded_and_ordered(cv_processor_class, monkeypatch):
+    import asyncio
+    import threading
+    import time
+
+    processor = cv_processor_class(max_workers=2)
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0}
+
+    def fake_extract(text):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.05)
+        with lock:
+            state['active'] -= 1
+        return {'ten': text}
+
+    monkeypatch.setattr(processor, 'extract_info_with_llm', fake_extract)
+    texts = [f'cv{i}' for i in range(6)]
+    results = asyncio.run(processor.aextract_many(texts))
+
+    assert results == [{'ten': t} for t in texts]
+    assert state['peak'] <= 2
+
+
+@pytest.mark.parametrize('response,expected', [
+    ('```json\n{"ten": "A"}\n```', {'ten': 'A'}),
+    ('Kết quả: {"ten": "A {B}", "x": {"y": "\\"}"}} và ghi chú {z}', {'ten': 'A {B}', 'x': {'y': '"}'}}),
+    ('{"ten": "A"}', {'ten': 'A'}),
+    ('Ghi chú {không phải JSON} rồi {"ten": "A"} hết', {'ten': 'A'}),
+    ('không có JSON', None),
+])
+def test_extract_json_from_response(cv_processor_class, response, expected):
+    assert cv_processor_class()._extract_json_from_response(response) == expected
+
+
+def test_extract_text_cached_by_content(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'ATTACHMENT_DIR', tmp_path)
+    calls = []
+    monkeypatch.setattr(cp_module, '_extract_text_uncached', lambda p: calls.append(p) or 'cv text')
+
+    first = tmp_path / 'a.pdf'
+    second = tmp_path / 'b.pdf'
+    first.write_bytes(b'same bytes')
+    second.write_bytes(b'same bytes')
+
+    assert cp_module.extract_text_from_file(str(first)) == 'cv text'
+    assert cp_module.extract_text_from_file(str(second)) == 'cv text'
+    assert calls == [str(first)]
+
+
+def test_extract_info_batch_single_request(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'LLM_MIN_TEXT_CHARS', 0)  # text mẫu ngắn vẫn gửi LLM
+
+    class BatchLLM:
+        model = 'm'
+        calls = []
+
+        def generate_content(self, messages):
+            BatchLLM.calls.append(messages)
+            return '```json\n[{"ten": "A"}, {"ten": "B"}, {"ten": "C"}]\n```'
+
+    cache = cp_module.LLMCache(tmp_path / 'llm.sqlite')
+    processor = cp_module.CVProcessor(llm_client=BatchLLM(), llm_cache=cache)
+    infos = processor.extract_info_batch(['cv a', 'cv b', 'cv c'])
+
+    assert infos == [{'ten': 'A'}, {'ten': 'B'}, {'ten': 'C'}]
+    assert len(BatchLLM.calls) == 1
+    # kết quả batch được cache theo từng CV
+    assert processor.extract_info_with_llm('cv b') == {'ten': 'B'}
+    assert len(BatchLLM.calls) == 1
+    cache.close()
+
+
+def test_extract_info_batch_falls_back_per_cv(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'LLM_MIN_TEXT_CHARS', 0)  # text mẫu ngắn vẫn gửi LLM
+
+    class ShortLLM:
+        def generate_content(self, messages):
+            return '[{"ten": "only one"}]'
+
+    cache = cp_module.LLMCache(tmp_path / 'llm.sqlite')
+    processor = cp_module.CVProcessor(llm_client=ShortLLM(), llm_cache=cache)
+    monkeypatch.setattr(processor, 'extract_info_with_llm', lambda t: {'ten': t})
+
+    assert processor.extract_info_batch(['x', 'y']) == [{'ten': 'x'}, {'ten': 'y'}]
+    cache.close()
+
+
+def test_extract_docx_fast_matches_python_docx(cv_processor_class, tmp_path):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    docx = pytest.importorskip('docx')
+    path = tmp_path / 'cv.docx'
+    document = docx.Document()
+    document.add_paragraph('Họ tên: Nguyen Van A')
+    paragraph = document.add_paragraph('Email: ')
+    paragraph.add_run('a@test.com')
+    document.add_paragraph('')
+    document.add_paragraph('Kỹ năng: Python')
+    document.save(str(path))
+
+    expected = '\n'.join(p.text for p in docx.Document(str(path)).paragraphs)
+    assert cp_module._extract_docx_fast(str(path)) == expected
+
+
+def test_save_to_csv_pandas_fallback(cv_processor_class, tmp_path, monkeypatch):
+    pd = pytest.importorskip('pandas')
+    if not hasattr(pd.DataFrame, 'to_csv'):
+        pytest.skip('cần pandas thật')
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'pacsv', None)
+    out = tmp_path / 'out.csv'
+    df = pd.DataFrame({'Họ tên': ['A', 'B, C'], 'Tuổi': ['30', '']})
+
+    cv_processor_class().save_to_csv(df, str(out))
+
+    assert out.read_bytes() == b'\xef\xbb\xbf' + 'Họ tên,Tuổi\nA,30\n"B, C",\n'.encode('utf-8')
+
+
+def test_complete_regex_skips_llm(cv_processor_class, tmp_path):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    calls = []
+
+    class RecordingLLM:
+        def generate_content(self, messages):
+            calls.append(messages)
+            return '{"ten": "LLM"}'
+
+    text = "Họ tên: Nguyen Van A\nTuổi: 30\nEmail: a@test.com\nĐiện thoại: +84987654321\nĐịa chỉ: 123 Street\nVị trí: Developer\nHọc vấn: University ABC\nKinh nghiệm: 5 năm\nKỹ năng: Python"
+    cache = cp_module.LLMCache(tmp_path / 'llm.sqlite')
+    processor = cv_processor_class(llm_client=RecordingLLM(), llm_cache=cache)
+
+    assert processor.extract_info_with_llm(text)['ten'] == 'Nguyen Van A'
+    assert calls == []
+    assert processor.extract_info_with_llm(text, force_llm=True) == {'ten': 'LLM'}
+    partial = 'Họ tên: B\nEmail: b@test.com\n' + 'Mô tả dự án. ' * 40
+    assert processor.extract_info_with_llm(partial) == {'ten': 'LLM'}
+    assert len(calls) == 2
+
+    # Text quá ngắn: chỉ dùng regex dù thiếu trường
+    short = processor.extract_info_with_llm('Họ tên: C\nEmail: c@test.com')
+    assert short['ten'] == 'C' and short['hoc_van'] == ''
+    assert len(calls) == 2
+    cache.close()
+
+
+def test_prune_text_for_llm_keeps_head_and_key_lines(cv_processor_class):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    assert cp_module._prune_text_for_llm('short cv') == 'short cv'
+
+    head = 'Họ tên: Nguyen Van A\n' + 'x' * 2000
+    filler = '\n'.join(f'Reference letter line {i}' for i in range(500))
+    text = f'{head}\n{filler}\nEmail: a@test.com\n{filler}\nKỹ năng: Python\n'
+    pruned = cp_module._prune_text_for_llm(text, max_chars=1500)
+
+    assert len(pruned) <= 1500
+    assert pruned.startswith('Họ tên: Nguyen Van A')
+    assert 'Email: a@test.com' in pruned
+    assert 'Kỹ năng: Python' in pruned
+    assert 'Reference letter' not in pruned
+
+
+def test_pdf_backend_selected_by_env(cv_processor_class, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    config = importlib.import_module('modules.config')
+    fake_pypdf2 = types.SimpleNamespace(PdfReader=lambda path: types.SimpleNamespace(
+        pages=[types.SimpleNamespace(extract_text=lambda: 'page text')]
+    ))
+    monkeypatch.setitem(sys.modules, 'PyPDF2', fake_pypdf2)
+    monkeypatch.setattr(config, 'CV_PDF_BACKEND', 'pypdf2')
+    try:
+        importlib.reload(cp_module)
+        # Thư viện PDF chỉ được import ở lần đọc PDF đầu tiên
+        assert cp_module._get_pdf_backend.cache_info().currsize == 0
+        assert cp_module._get_pdf_backend()[0] == 'pypdf2'
+        assert cp_module._extract_pdf('cv.pdf') == 'page text'
+    finally:
+        monkeypatch.undo()
+        importlib.reload(cp_module)
+
+
+def test_llm_cache_hits_reformatted_cv(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'LLM_MIN_TEXT_CHARS', 0)  # text mẫu ngắn vẫn gửi LLM
+    calls = []
+
+    class RecordingLLM:
+        model = 'm'
+
+        def generate_content(self, messages):
+            calls.append(messages)
+            return '{"ten": "A"}'
+
+    cache = cp_module.LLMCache(tmp_path / 'llm.sqlite')
+    processor = cp_module.CVProcessor(llm_client=RecordingLLM(), llm_cache=cache)
+    assert processor.extract_info_with_llm('Họ tên: Nguyen Van A\nPython') == {'ten': 'A'}
+    assert processor.extract_info_with_llm('  HỌ TÊN:  nguyen van a \r\n\r\npython ') == {'ten': 'A'}
+    assert processor.extract_info_with_llm('Họ tên: Tran Thi B') == {'ten': 'A'}
+    assert len(calls) == 2
+    cache.close()
+
+
+def test_file_digest_memoized_until_file_changes(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'ATTACHMENT_DIR', tmp_path)
+    monkeypatch.setattr(cp_module, '_extract_text_uncached', lambda p: 'cv text')
+    real_digest = cp_module._file_digest
+    hashed = []
+    monkeypatch.setattr(cp_module, '_file_digest', lambda p: hashed.append(p) or real_digest(p))
+    cp_module._cached_digest.cache_clear()
+
+    cv = tmp_path / 'a.pdf'
+    cv.write_bytes(b'v1')
+    cp_module.extract_text_from_file(str(cv))
+    cp_module.extract_text_from_file(str(cv))
+    assert hashed == [str(cv)]
+
+    cv.write_bytes(b'v2-longer')
+    cp_module.extract_text_from_file(str(cv))
+    assert hashed == [str(cv), str(cv)]
+
+
+def test_retry_after_honored(cv_processor_class, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module.random, 'uniform', lambda a, b: 0)
+
+    http_error = Exception('429 Too Many Requests')
+    http_error.response = types.SimpleNamespace(headers={'Retry-After': '7'})
+    assert cp_module._retry_after_seconds(http_error) == 7.0
+    google_error = Exception('429 Resource has been exhausted. Please retry in 12.5s.')
+    assert cp_module._retry_after_seconds(google_error) == 12.5
+    assert cp_module._retry_after_seconds(Exception('quota')) is None
+
+    # Có gợi ý của server thì chờ đúng chừng đó, ngược lại dùng backoff
+    assert cp_module._backoff_delay(1, 7.0) == 7.0
+    assert cp_module._backoff_delay(1) == cp_module.BACKOFF_INITIAL
+
+
+def test_default_llm_cache_outside_attachments(cv_processor_class, tmp_path, monkeypatch):
+    cp_module = importlib.import_module(cv_processor_class.__module__)
+    monkeypatch.setattr(cp_module, 'ATTACHMENT_DIR', tmp_path / 'attachments')
+    processor = cv_processor_class(llm_client=object())
+    cache = processor._get_llm_cache()
+    assert cache.db_path.parent == tmp_path / 'cache'
+    cache.close()
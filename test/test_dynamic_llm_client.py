@@ -55,7 +55,7 @@ def test_openrouter_unauthorized(monkeypatch):
     monkeypatch.setattr(dlc.requests, "get", lambda *a, **k: DummyResp())
     def fake_post(*a, **k):
         return DummyResp(status_code=401, data={"detail": "unauthorized"})
-    monkeypatch.setattr(dlc.requests, "post", fake_post)
+    monkeypatch.setattr(dlc.requests.Session, "post", fake_post)
     client = dlc.DynamicLLMClient(provider="openrouter", api_key="sk-or-key")
     with pytest.raises(ValueError):
         client.generate_content(["hi"])
@@ -66,3 +66,45 @@ def test_openrouter_missing_key(monkeypatch):
     with pytest.raises(ValueError):
         dlc.DynamicLLMClient(provider="openrouter", api_key="")
 
+
+
+def test_http_session_does_not_resend_post_after_read_timeout():
+    retry = dlc.make_http_session().get_adapter("https://openrouter.ai").max_retries
+    assert retry.read == 0
+    assert retry.connect == 3
+    assert 503 in retry.status_forcelist
+
+
+def test_openrouter_short_system_prompt_sent_as_plain_string(monkeypatch):
+    monkeypatch.setattr(dlc.requests, "get", lambda *a, **k: DummyResp())
+    sent = {}
+
+    class OkResp(DummyResp):
+        def raise_for_status(self):
+            pass
+
+    def fake_post(self, url, json=None, **k):
+        sent.update(json)
+        return OkResp(data={"choices": [{"message": {"content": "ok"}}]})
+
+    monkeypatch.setattr(dlc.requests.Session, "post", fake_post)
+    client = dlc.DynamicLLMClient(provider="openrouter", model="anthropic/claude-3.5-haiku", api_key="sk-or-key")
+    assert client.generate_content(["PROMPT", "cv text"]) == "ok"
+    # Prompt ngắn hơn ngưỡng cache: giữ định dạng chuỗi như mọi model khác
+    assert sent["messages"] == [
+        {"role": "system", "content": "PROMPT"},
+        {"role": "user", "content": "cv text"},
+    ]
+
+
+def test_long_system_prompt_cacheable_only_for_anthropic():
+    from modules.llm_client import PROMPT_CACHE_MIN_CHARS, format_openrouter_messages
+    prompt = "x" * PROMPT_CACHE_MIN_CHARS
+    system, user = format_openrouter_messages("anthropic/claude-sonnet-4", [prompt, "cv text"])
+    assert system["content"] == [
+        {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}
+    ]
+    assert user == {"role": "user", "content": "cv text"}
+    assert format_openrouter_messages("openai/gpt-4o-mini", [prompt, "cv text"])[0] == {
+        "role": "system", "content": prompt
+    }
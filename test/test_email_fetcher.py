@@ -76,13 +76,52 @@ def test_fetch_cv_attachments(email_fetcher_module, tmp_path):
     files = fetcher.fetch_cv_attachments(before=date(2023, 9, 21))
     expected = tmp_path / 'cv.pdf'
     assert files == [str(expected)]
-    assert expected.exists()
+    assert expected.read_bytes() == b'data'
     assert fetcher.last_fetch_info == [(str(expected), '2023-09-20T10:20:00-04:00')]
     assert 'BEFORE' in imap.last_criteria
     assert '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])' in imap.fetch_queries
     assert '(RFC822 INTERNALDATE)' in imap.fetch_queries
 
 
+
+def test_duplicate_content_skipped(email_fetcher_module, tmp_path):
+    email_fetcher = email_fetcher_module
+    EmailFetcher = email_fetcher.EmailFetcher
+    from modules.seen_store import SeenStore, content_hash
+
+    existing = tmp_path / 'old_cv.pdf'
+    existing.write_bytes(b'data')
+    store = SeenStore(tmp_path / '.seen.sqlite')
+    store.add(content_hash(b'data'), str(existing))
+    store.close()
+
+    msg = EmailMessage()
+    msg['Subject'] = 'CV Tran'
+    msg.set_content('body')
+    msg.add_attachment(b'data', maintype='application', subtype='pdf', filename='cv_copy.pdf')
+    raw = msg.as_bytes()
+
+    class FakeIMAP:
+        def uid(self, cmd, *args):
+            if cmd.lower() == 'search':
+                return 'OK', [b'1']
+            if cmd.lower() == 'fetch':
+                id_set, query = args[0], args[1]
+                if query == '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])':
+                    ids = id_set.split(b',') if isinstance(id_set, bytes) else [id_set]
+                    return 'OK', [(b'UID %s' % i, b'Subject: CV Tran\r\n') for i in ids]
+                return 'OK', [(None, raw)]
+            return 'NO', []
+
+        def store(self, *args, **kwargs):
+            pass
+
+    fetcher = EmailFetcher()
+    fetcher.mail = FakeIMAP()
+    files = fetcher.fetch_cv_attachments()
+    assert files == []
+    assert not (tmp_path / 'cv_copy.pdf').exists()
+
 def test_profile_file_processed(email_fetcher_module, tmp_path):
     email_fetcher = email_fetcher_module
     EmailFetcher = email_fetcher.EmailFetcher
@@ -125,3 +164,287 @@ def test_profile_file_processed(email_fetcher_module, tmp_path):
     assert files == []
     assert not expected.exists()
 
+
+
+def test_fetch_cv_parts_via_bodystructure(email_fetcher_module, tmp_path):
+    import re
+    email_fetcher = email_fetcher_module
+    EmailFetcher = email_fetcher.EmailFetcher
+
+    msg = EmailMessage()
+    msg['Subject'] = 'Ung tuyen'
+    msg.set_content('Gui anh chi CV cua em')
+    msg.add_attachment(b'\x89PNG' * 50, maintype='image', subtype='png', filename='logo.png')
+    msg.add_attachment(b'data', maintype='application', subtype='pdf', filename='hoso.pdf')
+    sections = {str(i): part.get_payload().encode() for i, part in enumerate(msg.get_payload(), start=1)}
+    structure = (
+        b'(("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 22 1 NIL NIL NIL NIL)'
+        b'("image" "png" NIL NIL NIL "base64" 272 NIL ("attachment" ("filename" "logo.png")) NIL NIL)'
+        b'("application" "pdf" NIL NIL NIL "base64" 8 NIL ("attachment" ("filename" "hoso.pdf")) NIL NIL)'
+        b' "mixed" ("boundary" "b") NIL NIL NIL)'
+    )
+
+    class FakeIMAP:
+        def __init__(self):
+            self.fetch_queries = []
+
+        def uid(self, cmd, *args):
+            if cmd.lower() == 'search':
+                return 'OK', [b'1']
+            query = args[1]
+            self.fetch_queries.append(query)
+            if query == '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])':
+                return 'OK', [(b'1 (UID 1 BODY[HEADER.FIELDS (SUBJECT)] {22}', b'Subject: Ung tuyen\r\n\r\n'), b')']
+            if query == '(BODYSTRUCTURE INTERNALDATE)':
+                return 'OK', [b'1 (UID 1 BODYSTRUCTURE ' + structure + b' INTERNALDATE "20-Sep-2023 10:20:00 -0400")']
+            data = [b'1 (UID 1']
+            for sec in re.findall(r'BODY\.PEEK\[([\d.]+)\]', query):
+                body = sections[sec]
+                data.append((b' BODY[%s] {%d}' % (sec.encode(), len(body)), body))
+            data.append(b')')
+            return 'OK', data
+
+        def store(self, *args, **kwargs):
+            pass
+
+    fetcher = EmailFetcher()
+    imap = FakeIMAP()
+    fetcher.mail = imap
+    files = fetcher.fetch_cv_attachments()
+
+    expected = tmp_path / 'hoso.pdf'
+    assert files == [str(expected)]
+    assert expected.read_bytes() == b'data'
+    assert fetcher.last_fetch_info == [(str(expected), '2023-09-20T10:20:00-04:00')]
+    assert '(RFC822 INTERNALDATE)' not in imap.fetch_queries
+    assert '(BODY.PEEK[1])' in imap.fetch_queries
+    assert '(BODY.PEEK[3])' in imap.fetch_queries
+    assert not any('[2]' in q for q in imap.fetch_queries)
+
+
+def test_keyword_search_single_or_expression(email_fetcher_module):
+    email_fetcher = email_fetcher_module
+    key = email_fetcher._keyword_search_key(['CV', 'Resume', 'Curriculum Vitae'])
+    assert key == (
+        '(OR (OR (OR SUBJECT "CV" BODY "CV") (OR SUBJECT "Resume" BODY "Resume"))'
+        ' (OR SUBJECT "Curriculum Vitae" BODY "Curriculum Vitae"))'
+    )
+    assert email_fetcher._keyword_search_key(['Hồ sơ']) is None
+
+    searches = []
+
+    class FakeIMAP:
+        def uid(self, cmd, *args):
+            if cmd.lower() == 'search':
+                searches.append(args)
+                return 'OK', [b'']
+            return 'NO', []
+
+    fetcher = email_fetcher.EmailFetcher()
+    fetcher.mail = FakeIMAP()
+    assert fetcher.fetch_cv_attachments(keywords=['CV'], unseen_only=True, keyword_search=True) == []
+    assert searches == [('UNSEEN', '(OR SUBJECT "CV" BODY "CV")')]
+
+
+def test_base64_attachment_decoded_in_chunks(email_fetcher_module):
+    import base64
+    email_fetcher = email_fetcher_module
+    data = os.urandom(200_000)
+    encoded = base64.b64encode(data)
+    # Dòng 50 ký tự (không chia hết cho 4) vẫn giải mã đúng qua ranh giới khối
+    raw = b'\r\n'.join(encoded[i:i + 50] for i in range(0, len(encoded), 50))
+    chunks = list(email_fetcher._iter_b64_decoded(raw))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == data
+
+
+def test_unpadded_base64_attachment_stored(email_fetcher_module, tmp_path):
+    import email
+    email_fetcher = email_fetcher_module
+    payload = b'JVBERi0xLjQgaGVsbG8hIQ'  # thiếu '==' ở cuối
+    msg = email.message_from_bytes(
+        b'Content-Type: application/pdf\r\nContent-Transfer-Encoding: base64\r\n\r\n' + payload + b'\r\n'
+    )
+    expected = msg.get_payload(decode=True)
+    assert expected == b'%PDF-1.4 hello!!'
+    assert b''.join(email_fetcher._iter_b64_decoded(payload)) == expected
+    assert email_fetcher._decode_transfer(payload, 'base64') == expected
+
+    fetcher = email_fetcher.EmailFetcher()
+    path = tmp_path / 'cv.pdf'
+    fetcher._store_attachment(str(path), msg.get_payload(decode=False).encode(), None, None, 'base64')
+    assert path.read_bytes() == expected
+
+
+def test_batch_fetched_with_one_sequence_set(email_fetcher_module, tmp_path):
+    import base64
+    email_fetcher = email_fetcher_module
+    structure = (
+        b'(("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 4 1 NIL NIL NIL NIL)'
+        b'("application" "pdf" NIL NIL NIL "base64" 8 NIL ("attachment" ("filename" "cv_%s.pdf")) NIL NIL)'
+        b' "mixed" ("boundary" "b") NIL NIL NIL)'
+    )
+
+    class FakeIMAP:
+        def __init__(self):
+            self.calls = []
+
+        def uid(self, cmd, *args):
+            self.calls.append((cmd.upper(), args[0] if args else None, args[1] if len(args) > 1 else None))
+            if cmd.lower() == 'search':
+                return 'OK', [b'1 2']
+            if cmd.upper() == 'STORE':
+                return 'OK', []
+            id_set, query = args[0], args[1]
+            if query == '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])':
+                return 'OK', [
+                    item
+                    for i in id_set.split(b',')
+                    for item in ((b'%s (UID %s BODY[HEADER.FIELDS (SUBJECT)] {13}' % (i, i), b'Subject: CV\r\n'), b')')
+                ]
+            if query == '(BODYSTRUCTURE INTERNALDATE)':
+                return 'OK', [
+                    b'%s (UID %s BODYSTRUCTURE %s INTERNALDATE "20-Sep-2023 10:20:00 -0400")' % (i, i, structure % i)
+                    for i in id_set.split(b',')
+                ]
+            data = []
+            for i in id_set.split(b','):
+                body = base64.b64encode(b'data' + i)
+                data += [(b'%s (UID %s BODY[2] {%d}' % (i, i, len(body)), body), b')']
+            return 'OK', data
+
+    fetcher = email_fetcher.EmailFetcher()
+    imap = FakeIMAP()
+    fetcher.mail = imap
+    files = fetcher.fetch_cv_attachments()
+
+    assert files == [str(tmp_path / 'cv_2.pdf'), str(tmp_path / 'cv_1.pdf')]
+    assert (tmp_path / 'cv_1.pdf').read_bytes() == b'data1'
+    queries = [(ids, q) for cmd, ids, q in imap.calls if cmd == 'FETCH']
+    assert (b'2,1', '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])') in queries
+    assert (b'2,1', '(BODYSTRUCTURE INTERNALDATE)') in queries
+    # Cùng section [2] ở cả hai email: tải đính kèm bằng một lệnh FETCH
+    assert (b'2,1', '(BODY.PEEK[2])') in queries
+    assert len(queries) == 3
+    assert [c for c in imap.calls if c[0] == 'STORE'] == [('STORE', '2,1', '+FLAGS')]
+
+
+def test_keyword_search_all_messages_uid_command(email_fetcher_module):
+    email_fetcher = email_fetcher_module
+    searches = []
+
+    class FakeIMAP:
+        def uid(self, cmd, *args):
+            if cmd.lower() == 'search':
+                searches.append(args)
+                return 'OK', [b'']
+            return 'NO', []
+
+    fetcher = email_fetcher.EmailFetcher()
+    fetcher.mail = FakeIMAP()
+    assert fetcher.fetch_cv_attachments(keywords=['CV'], unseen_only=False, keyword_search=True) == []
+    # uid() gửi nguyên tham số: đúng lệnh UID SEARCH ALL (OR ...), không kèm charset
+    assert searches == [('ALL', '(OR SUBJECT "CV" BODY "CV")')]
+
+
+def test_body_texts_fetched_once_per_batch(email_fetcher_module, tmp_path):
+    email_fetcher = email_fetcher_module
+    structure = (
+        b'(("text" "plain" ("charset" "utf-8") NIL NIL "7bit" %d 1 NIL NIL NIL NIL)'
+        b'("application" "pdf" NIL NIL NIL "base64" 8 NIL ("attachment" ("filename" "hoso_%s.pdf")) NIL NIL)'
+        b' "mixed" ("boundary" "b") NIL NIL NIL)'
+    )
+    texts = {b'1': b'Gui CV cua em', b'2': b'Thu moi hop'}
+
+    class FakeIMAP:
+        def __init__(self):
+            self.fetches = []
+
+        def uid(self, cmd, *args):
+            if cmd.lower() == 'search':
+                return 'OK', [b'1 2']
+            if cmd.upper() != 'FETCH':
+                return 'OK', []
+            id_set, query = args[0], args[1]
+            self.fetches.append((id_set, query))
+            ids = id_set.split(b',')
+            if query == '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])':
+                return 'OK', [(b'%s (UID %s BODY[HEADER.FIELDS (SUBJECT)] {14}' % (i, i), b'Subject: Hi\r\n\r\n') for i in ids]
+            if query == '(BODYSTRUCTURE INTERNALDATE)':
+                return 'OK', [
+                    b'%s (UID %s BODYSTRUCTURE %s INTERNALDATE "20-Sep-2023 10:20:00 -0400")'
+                    % (i, i, structure % (len(texts[i]), i)) for i in ids
+                ]
+            section = b'1' if query == '(BODY.PEEK[1])' else b'2'
+            data = []
+            for i in ids:
+                body = texts[i] if section == b'1' else b'ZGF0YQ=='
+                data += [(b'%s (UID %s BODY[%s] {%d}' % (i, i, section, len(body)), body), b')']
+            return 'OK', data
+
+    fetcher = email_fetcher.EmailFetcher()
+    imap = FakeIMAP()
+    fetcher.mail = imap
+    files = fetcher.fetch_cv_attachments()
+
+    # Chỉ email 1 có từ khóa trong nội dung; nội dung cả đợt tải bằng một lệnh
+    assert files == [str(tmp_path / 'hoso_1.pdf')]
+    assert (b'2,1', '(BODY.PEEK[1])') in imap.fetches
+    assert (b'1', '(BODY.PEEK[2])') in imap.fetches
+    assert len(imap.fetches) == 4
+
+
+def test_connection_reused_from_pool(email_fetcher_module, monkeypatch):
+    email_fetcher = email_fetcher_module
+    created = []
+
+    class FakeSSL:
+        def __init__(self, host, port):
+            self.alive = True
+            self.logged_out = False
+            created.append(self)
+
+        def login(self, user, password):
+            return 'OK', [b'']
+
+        def select(self, mailbox):
+            return 'OK', [b'3']
+
+        def noop(self):
+            if not self.alive:
+                raise email_fetcher.imaplib.IMAP4.abort('socket closed')
+            return 'OK', [b'']
+
+        def logout(self):
+            self.logged_out = True
+
+    monkeypatch.setattr(email_fetcher.imaplib, 'IMAP4_SSL', FakeSSL)
+    monkeypatch.setattr(email_fetcher, '_POOL', {})
+
+    first = email_fetcher.EmailFetcher('imap.test', 993, 'u@x.com', 'p')
+    first.connect()
+    first.close()
+    second = email_fetcher.EmailFetcher('imap.test', 993, 'u@x.com', 'p')
+    second.connect()
+    assert len(created) == 1 and second.mail is created[0]
+
+    # Kết nối trong pool đã chết: bỏ đi và đăng nhập lại
+    second.close()
+    created[0].alive = False
+    third = email_fetcher.EmailFetcher('imap.test', 993, 'u@x.com', 'p')
+    third.connect()
+    assert len(created) == 2 and created[0].logged_out
+
+    # Mật khẩu khác không dùng lại phiên của pool
+    third.close()
+    other = email_fetcher.EmailFetcher('imap.test', 993, 'u@x.com', 'wrong')
+    other.connect()
+    assert len(created) == 3
+
+
+def test_fetchers_share_one_logger_handler(email_fetcher_module):
+    email_fetcher = email_fetcher_module
+    before = len(email_fetcher.logger.handlers)
+    fetchers = [email_fetcher.EmailFetcher() for _ in range(3)]
+    assert all(f.logger is email_fetcher.logger for f in fetchers)
+    assert len(email_fetcher.logger.handlers) == before == 1
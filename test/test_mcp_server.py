@@ -39,6 +39,7 @@ def setup_app(monkeypatch, tmp_path):
     monkeypatch.setattr(mcp, "LLMClient", lambda: None)
     monkeypatch.setattr(mcp.settings, "attachment_dir", tmp_path)
     monkeypatch.setattr(mcp.settings, "output_csv", tmp_path / "out.csv")
+    monkeypatch.setattr(mcp.app.state, "processor", None, raising=False)
     return TestClient(mcp.app)
 
 
@@ -66,6 +67,20 @@ def test_process_single_cv(monkeypatch, tmp_path):
     assert res.json() == {"ok": True}
 
 
+def test_processor_shared_across_requests(monkeypatch, tmp_path):
+    created = []
+
+    class CountingProcessor(DummyProcessor):
+        def __init__(self, *a, **k):
+            created.append(self)
+
+    client = setup_app(monkeypatch, tmp_path)
+    monkeypatch.setattr(mcp, "CVProcessor", CountingProcessor)
+    client.post("/run-full-process")
+    client.post("/process-single-cv", files={"file": ("cv.pdf", b"data", "application/pdf")})
+    assert len(created) == 1
+
+
 def test_results_endpoint(monkeypatch, tmp_path):
     client = setup_app(monkeypatch, tmp_path)
     # not exists
@@ -71,3 +71,89 @@ def test_openrouter_models(model_fetcher_module, openrouter_key):
     assert isinstance(models, list), "Kết quả phải là list"
     # Kiểm tra mỗi phần tử phải chứa khóa 'id'
     assert all(isinstance(m, dict) and 'id' in m for m in models), "Mỗi model phải là dict có khóa 'id'"
+
+
+def test_model_cache_ttl(model_fetcher_module, monkeypatch, tmp_path):
+    """
+    Cache models được tách theo API key và hết hạn sau CACHE_TTL giây.
+    """
+    ModelFetcher = model_fetcher_module
+    monkeypatch.setattr(ModelFetcher, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(ModelFetcher, "_memory", {})
+    ModelFetcher._save_cache("openrouter", [{"id": "a/b"}], "key1")
+
+    assert ModelFetcher._load_cache("openrouter", "key1") == [{"id": "a/b"}]
+    assert ModelFetcher._load_cache("openrouter", "key2") == []
+
+    # Đọc lại từ file khi bộ nhớ trống
+    monkeypatch.setattr(ModelFetcher, "_memory", {})
+    assert ModelFetcher._load_cache("openrouter", "key1") == [{"id": "a/b"}]
+
+    monkeypatch.setattr(ModelFetcher, "CACHE_TTL", 0)
+    assert ModelFetcher._load_cache("openrouter", "key1") == []
+
+
+def test_available_models_single_flight(model_fetcher_module, monkeypatch):
+    """
+    Các thread gọi đồng thời với cùng provider/key chỉ tạo một request.
+    """
+    import threading
+    import time
+    import modules.config as config
+
+    calls = []
+
+    def slow_fetch(api_key, session=None):
+        calls.append(api_key)
+        time.sleep(0.2)
+        return ["a/b"]
+
+    monkeypatch.setattr(model_fetcher_module, "get_simple_openrouter_model_ids", staticmethod(slow_fetch))
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(config.get_available_models("openrouter", "k")))
+        for _ in range(3)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["k"]
+    assert results == [["a/b"]] * 3
+
+
+def test_stale_cache_refreshed_in_background(model_fetcher_module, monkeypatch, tmp_path):
+    """
+    Cache quá CACHE_SOFT_TTL được trả về ngay và làm mới bằng thread nền.
+    """
+    import time
+
+    ModelFetcher = model_fetcher_module
+    monkeypatch.setattr(ModelFetcher, "CACHE_DIR", str(tmp_path))
+    path = ModelFetcher._cache_path("openrouter", "k")
+    monkeypatch.setattr(ModelFetcher, "_memory", {path: (time.time() - 7200, [{"id": "old"}])})
+    monkeypatch.setattr(ModelFetcher, "CACHE_SOFT_TTL", 3600)
+
+    def fake_fetch(api_key, session=None):
+        ModelFetcher._save_cache("openrouter", [{"id": "new"}], api_key)
+        return [{"id": "new"}]
+
+    monkeypatch.setattr(ModelFetcher, "_fetch_openrouter_models", staticmethod(fake_fetch))
+
+    assert ModelFetcher.get_openrouter_models("k") == [{"id": "old"}]
+    thread = ModelFetcher._refreshing.get(path)
+    if thread is not None:
+        thread.join(timeout=5)
+    assert ModelFetcher.get_openrouter_models("k") == [{"id": "new"}]
+
+
+def test_reload_does_not_duplicate_handlers(model_fetcher_module):
+    """
+    Import lại module không gắn thêm handler cho logger.
+    """
+    import logging
+    mf = importlib.import_module('modules.model_fetcher')
+    before = len(logging.getLogger(mf.__name__).handlers)
+    importlib.reload(mf)
+    assert len(logging.getLogger(mf.__name__).handlers) == before == 1
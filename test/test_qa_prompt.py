@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'src'))
+
+import modules.qa_chatbot as qc
+
+
+def test_prompt_uses_precomputed_csv(monkeypatch):
+    class FailDF(pd.DataFrame):
+        def to_csv(self, *a, **k):
+            raise AssertionError('df should not be re-serialized')
+
+    df = FailDF([{'Họ tên': 'Alice', 'Nguồn': 'alice.pdf'}])
+    messages = qc._create_enhanced_prompt('Ai?', df, data_csv='Họ tên,Nguồn\nAlice,alice.pdf\n')
+    assert 'Alice,alice.pdf' in messages[1]
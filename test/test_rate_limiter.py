@@ -0,0 +1,20 @@
+import sys
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from modules.rate_limiter import TokenBucket
+
+
+def test_burst_then_wait():
+    bucket = TokenBucket(rate=100, capacity=2)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() > 0.0
+
+
+def test_zero_rate_disables_limit():
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert all(bucket.acquire() == 0.0 for _ in range(5))
@@ -4,6 +4,8 @@ import importlib
 import re
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 sys.path.insert(0, str(ROOT / 'src'))
@@ -48,6 +50,12 @@ def _dummy_streamlit(theme="dark"):
             pass
         def tabs(self, names):
             return [DummyCM() for _ in names]
+        def _cache(self, func=None, **kwargs):
+            if func is None:
+                return lambda f: f
+            return func
+        cache_data = _cache
+        cache_resource = _cache
         def __getattr__(self, name):
             return lambda *a, **k: None
 
@@ -113,3 +121,15 @@ def test_theme_forced_light(monkeypatch):
     expected = _css_light_values()
     for k, v in expected.items():
         assert app.st.session_state[k] == v
+
+
+def test_platform_probe_transient_failure_not_cached(monkeypatch):
+    app = _install_app(monkeypatch)
+    # Lỗi mạng: ném ngoại lệ để st.cache_data không lưu None
+    monkeypatch.setattr(app, "_probe", lambda platform, url, headers: (platform, None))
+    with pytest.raises(app._ProbeUnavailable):
+        app._probe_platform("unknown-key")
+    assert app.detect_platform("unknown-key") is None
+    # Key bị từ chối là kết quả dứt khoát: trả None (được cache)
+    monkeypatch.setattr(app, "_probe", lambda platform, url, headers: (platform, 401))
+    assert app._probe_platform("unknown-key") is None